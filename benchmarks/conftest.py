@@ -0,0 +1,36 @@
+import pytest
+
+from bonpy.data_dict import LazyDataDict
+from bonpy.synthetic import generate_session
+
+# Duration in seconds of the synthetic sessions for each benchmarked data size:
+DATA_SIZES = dict(small=60, large=600)
+
+
+@pytest.fixture(scope="session", params=DATA_SIZES.keys())
+def data_size(request):
+    return request.param
+
+
+@pytest.fixture(scope="session")
+def session_folder(data_size, tmp_path_factory):
+    return generate_session(
+        tmp_path_factory.mktemp(data_size), duration_s=DATA_SIZES[data_size]
+    )
+
+
+@pytest.fixture(scope="session")
+def session_files(session_folder):
+    data_dict = LazyDataDict(session_folder)
+    return {key: val["file"] for key, val in data_dict.files_dict.items()}
+
+
+@pytest.fixture(scope="session")
+def laser_v01_file(data_size, tmp_path_factory):
+    session_folder = generate_session(
+        tmp_path_factory.mktemp(data_size + "_v01"),
+        animal_id="M21",
+        duration_s=DATA_SIZES[data_size],
+        write_movies=False,
+    )
+    return LazyDataDict(session_folder).files_dict["laser-log_laser"]["file"]
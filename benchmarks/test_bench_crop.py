@@ -0,0 +1,18 @@
+import pytest
+
+from bonpy.crop_utils import smart_crop
+from bonpy.data_parsers import _load_ball_log_csv, _load_cube_log_csv
+
+
+@pytest.mark.parametrize(
+    "crop_kwargs",
+    [dict(), dict(view=True), dict(interpolate=True)],
+    ids=["default", "view", "interpolate"],
+)
+def test_smart_crop(benchmark, session_files, crop_kwargs):
+    ball_df = _load_ball_log_csv(session_files["ball-log_ball"])
+    ball_df = ball_df.drop(columns="timedelta")
+    trial_times = _load_cube_log_csv(session_files["cube-positions_cube"]).index.values
+
+    timebase, _ = benchmark(smart_crop, ball_df, trial_times, (-2, 5), **crop_kwargs)
+    assert len(timebase) > 0
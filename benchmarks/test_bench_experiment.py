@@ -0,0 +1,9 @@
+from bonpy.experiment import Experiment
+
+
+def test_trials_df(benchmark, session_folder):
+    exp = Experiment.load_112023(session_folder)
+    exp.preload(keys=["laser-log_laser", "cube-positions_cube"])
+
+    trials_df = benchmark(exp.compute_trials_df)
+    assert trials_df["laser"].all()
@@ -0,0 +1,27 @@
+import subprocess
+import sys
+
+import pytest
+
+# Backends that must not be imported by catalog or timestamp-only jobs:
+HEAVY_MODULES = ["cv2", "flammkuchen", "tqdm", "matplotlib", "tkinter"]
+
+
+def _import_modules(statement):
+    check = (
+        f"import sys; {statement}; "
+        f"print(sorted(m for m in {HEAVY_MODULES} if m in sys.modules))"
+    )
+    return subprocess.run(
+        [sys.executable, "-c", check], capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+
+@pytest.mark.parametrize(
+    "statement", ["import bonpy", "from bonpy import Catalog, Experiment"]
+)
+def test_import_time(benchmark, statement):
+    imported_heavy_modules = benchmark.pedantic(
+        _import_modules, args=(statement,), rounds=5
+    )
+    assert imported_heavy_modules == "[]"
@@ -0,0 +1,39 @@
+import pytest
+
+from bonpy.data_parsers import (
+    LOADER_DICT,
+    PUPIL_FEATURES,
+    load_pupil_dlc_h5_streaming,
+)
+
+# Key of the synthetic session file used to benchmark each loader category:
+CATEGORY_KEYS = dict(
+    csv="eye-cam_timestamps",
+    laser_csv="laser-log_laser",
+    ball_csv="ball-log_ball",
+    cube_csv="cube-positions_cube",
+    avi="eye-cam_video",
+    h5="eye-cam_video_eye",
+    DLC_h5="top-cam_video_top",
+    eye_DLC_h5="eye-cam_video_eye",
+    top_DLC_h5="top-cam_video_top",
+)
+
+
+@pytest.mark.parametrize("category", LOADER_DICT["v00"].keys())
+def test_loader_v00(benchmark, session_files, category):
+    loader = LOADER_DICT["v00"][category]
+    data = benchmark(loader, session_files[CATEGORY_KEYS[category]], None)
+    assert data is not None
+
+
+def test_laser_loader_v01(benchmark, laser_v01_file):
+    data = benchmark(LOADER_DICT["v01"]["laser_csv"], laser_v01_file, None)
+    assert "frequency" in data.columns
+
+
+def test_pupil_loader_streaming(benchmark, session_files):
+    data = benchmark(
+        load_pupil_dlc_h5_streaming, session_files[CATEGORY_KEYS["eye_DLC_h5"]]
+    )
+    assert data.columns.tolist() == PUPIL_FEATURES
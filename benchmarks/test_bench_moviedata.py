@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from bonpy.mjpeg import MJPEGMovieData
+from bonpy.moviedata import OpenCVMovieData
+
+N_READ_FRAMES = 100
+N_CHUNK_FRAMES = 25
+
+
+# Synthetic movies are MJPG, so that both backends can read them:
+@pytest.fixture(params=[OpenCVMovieData, MJPEGMovieData])
+def movie(request, session_files):
+    movie = request.param(session_files["eye-cam_video"])
+    movie.metadata  # exclude metadata probing from frame reads
+    return movie
+
+
+def test_sequential_frame_reads(benchmark, movie):
+    frames = benchmark(movie.__getitem__, slice(0, N_READ_FRAMES))
+    assert frames.shape[0] == N_READ_FRAMES
+
+
+def test_random_frame_reads(benchmark, movie):
+    rng = np.random.default_rng(0)
+    frame_idxs = rng.choice(movie.shape[0], N_READ_FRAMES, replace=False)
+
+    frames = benchmark(movie.__getitem__, frame_idxs)
+    assert frames.shape[0] == N_READ_FRAMES
+
+
+def test_metadata_probing(benchmark, session_files):
+    metadata = benchmark(
+        lambda: OpenCVMovieData(session_files["eye-cam_video"]).metadata
+    )
+    assert metadata.n_frames > 0
+
+
+@pytest.mark.parametrize("n_threads", [1, 2, 4])
+def test_concurrent_frame_reads(benchmark, session_files, n_threads):
+    movie = OpenCVMovieData(session_files["eye-cam_video"], max_captures=n_threads)
+    chunks = [
+        slice(start, start + N_CHUNK_FRAMES)
+        for start in range(0, N_READ_FRAMES * n_threads, N_CHUNK_FRAMES)
+    ]
+
+    def _read_chunks():
+        with ThreadPoolExecutor(max_workers=n_threads) as pool:
+            return list(pool.map(movie.__getitem__, chunks))
+
+    # Same frames per thread: time should stay flat as threads increase
+    chunks_frames = benchmark(_read_chunks)
+    assert len(chunks_frames) == len(chunks)
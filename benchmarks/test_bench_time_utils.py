@@ -0,0 +1,22 @@
+import pandas as pd
+
+from bonpy.data_parsers import _load_ball_log_csv
+from bonpy.time_utils import inplace_time_cols_fix_and_resample, interpolate_df
+
+
+def test_inplace_time_cols_fix_and_resample(benchmark, session_files):
+    raw_df = pd.read_csv(session_files["ball-log_ball"])
+
+    benchmark.pedantic(
+        inplace_time_cols_fix_and_resample,
+        setup=lambda: ((raw_df.copy(),), dict()),
+        rounds=10,
+    )
+
+
+def test_interpolate_df(benchmark, session_files):
+    ball_df = _load_ball_log_csv(session_files["ball-log_ball"])
+    ball_df = ball_df.drop(columns="timedelta")
+
+    resampled_df = benchmark(interpolate_df, ball_df, new_timebin="10ms")
+    assert resampled_df.shape[1] == ball_df.shape[1]
@@ -1,7 +1,32 @@
 __author__ = "Luigi Petrucco @ Iurilli lab"
 __version__ = "0.0.1"
 
+import importlib
 
-from bonpy.data_parsers import load_dlc_csv, load_dlc_h5
-from bonpy.experiment import Experiment
-from bonpy.moviedata import DLCTrackedMovieData, OpenCVMovieData
+# Public API, imported lazily on first access so that `import bonpy` stays fast
+# and jobs that never touch movies do not pay for OpenCV:
+_LAZY_ATTRIBUTES = dict(
+    load_trials_batch="bonpy.batch",
+    Catalog="bonpy.catalog",
+    load_dlc_csv="bonpy.data_parsers",
+    load_dlc_h5="bonpy.data_parsers",
+    Experiment="bonpy.experiment",
+    DLCTrackedMovieData="bonpy.moviedata",
+    OpenCVMovieData="bonpy.moviedata",
+    MJPEGMovieData="bonpy.mjpeg",
+    open_movie="bonpy.mjpeg",
+)
+
+__all__ = list(_LAZY_ATTRIBUTES.keys())
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module 'bonpy' has no attribute '{name}'")
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + __all__)
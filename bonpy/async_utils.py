@@ -0,0 +1,90 @@
+"""Utilities for the asyncio loading API (LazyDataDict.aget, Experiment.atrials_df,
+MovieData.aread): blocking loads run in an executor, and concurrent requests
+for the same data share a single in-flight load.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+
+_DEFAULT_EXECUTOR = None
+_DEFAULT_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_default_executor():
+    """Executor used by the async API when none is specified (a shared thread pool)."""
+    global _DEFAULT_EXECUTOR
+    with _DEFAULT_EXECUTOR_LOCK:
+        if _DEFAULT_EXECUTOR is None:
+            _DEFAULT_EXECUTOR = ThreadPoolExecutor(thread_name_prefix="bonpy-async")
+        return _DEFAULT_EXECUTOR
+
+
+def set_default_executor(executor):
+    """Set the executor used by the async API when none is specified."""
+    global _DEFAULT_EXECUTOR
+    with _DEFAULT_EXECUTOR_LOCK:
+        _DEFAULT_EXECUTOR = executor
+
+
+class InFlightCalls:
+    """Run calls in an executor, deduplicating concurrent calls with the same key
+    into a single execution whose result is shared."""
+
+    def __init__(self) -> None:
+        self._futures = dict()
+        # Reentrant, as done callbacks run immediately on already finished futures:
+        self._lock = threading.RLock()
+
+    def submit(self, key, func, *args, executor=None):
+        """Submit func(*args), unless a call with the same key is in flight.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Future of the (possibly shared) call.
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None:
+                executor = executor if executor is not None else get_default_executor()
+                future = executor.submit(func, *args)
+                self._futures[key] = future
+                future.add_done_callback(partial(self._forget, key))
+            return future
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+    async def run(self, key, func, *args, executor=None):
+        """Await func(*args) run in the executor, sharing in-flight calls."""
+        future = asyncio.wrap_future(self.submit(key, func, *args, executor=executor))
+        # Shielded, so that a cancelled client does not cancel the shared call:
+        return await asyncio.shield(future)
+
+    def __len__(self):
+        return len(self._futures)
+
+    def __getstate__(self):
+        # In-flight calls are not transferred when pickling
+        return dict()
+
+    def __setstate__(self, state):
+        self.__init__()
+
+
+def hashable_index(idx):
+    """Hashable version of a numpy-style index, used as key of in-flight reads."""
+    if isinstance(idx, tuple):
+        return tuple(hashable_index(i) for i in idx)
+    if isinstance(idx, slice):
+        return ("slice", idx.start, idx.stop, idx.step)
+    if isinstance(idx, (list, range, np.ndarray)):
+        idx = np.asarray(idx)
+        return ("array", str(idx.dtype), idx.tobytes())
+    return idx
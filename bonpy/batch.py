@@ -0,0 +1,98 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, wait
+from dataclasses import asdict
+from pathlib import Path
+
+import pandas as pd
+
+from bonpy.data_dict import EXECUTORS_DICT
+from bonpy.experiment import LASER_PAD_WND_S, Experiment
+
+
+def _to_session_paths(sessions):
+    """Normalize the sessions specification to a list of session folders."""
+    if isinstance(sessions, pd.DataFrame):
+        # Results of a Catalog query:
+        return [Path(p) for p in sessions["session_path"]]
+
+    return [
+        session.root_path if isinstance(session, Experiment) else Path(session)
+        for session in sessions
+    ]
+
+
+def _session_trials_df(session_path, laser_pad_s):
+    """Load the trials table of a session, returning it with the session metadata.
+    Module-level to be usable in a process pool."""
+    exp = Experiment.load_112023(session_path)
+    trials_df = exp.compute_trials_df(laser_pad_s=laser_pad_s)
+
+    return asdict(exp.metadata), trials_df
+
+
+def load_trials_batch(
+    sessions,
+    workers=None,
+    max_pending=None,
+    executor="process",
+    laser_pad_s=LASER_PAD_WND_S,
+):
+    """Build the trials table of many sessions in parallel and concatenate them.
+
+    Parameters
+    ----------
+    sessions : list or pd.DataFrame
+        Session folders, Experiment objects, or the result of Catalog.sessions.
+    workers : int, optional
+        Number of parallel workers, by default the number of CPUs.
+    max_pending : int, optional
+        Maximum number of sessions submitted to the pool at the same time,
+        by default twice the number of workers.
+    executor : str, optional
+        Either "process" or "thread", by default "process".
+    laser_pad_s : tuple, optional
+        Laser search window padding, see Experiment.compute_trials_df.
+
+    Returns
+    -------
+    trials_df : pd.DataFrame
+        Concatenated trials of all sessions, with the trial time in the "time"
+        column and one column for each ExperimentMetadata field.
+    failures : dict
+        Error message for each session folder that could not be loaded.
+    """
+    session_paths = _to_session_paths(sessions)
+    workers = workers if workers is not None else os.cpu_count()
+    max_pending = max_pending if max_pending is not None else 2 * workers
+
+    results, failures = dict(), dict()
+    with EXECUTORS_DICT[executor](max_workers=workers) as pool:
+        pending = dict()
+        to_submit = list(enumerate(session_paths))[::-1]
+        while to_submit or pending:
+            # Keep a bounded number of sessions in flight:
+            while to_submit and len(pending) < max_pending:
+                session_n, session_path = to_submit.pop()
+                future = pool.submit(_session_trials_df, session_path, laser_pad_s)
+                pending[future] = session_n
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                session_n = pending.pop(future)
+                try:
+                    results[session_n] = future.result()
+                except Exception as e:
+                    failures[session_paths[session_n]] = f"{type(e).__name__}: {e}"
+
+    session_dfs = []
+    for session_n in sorted(results.keys()):
+        metadata, trials_df = results[session_n]
+        trials_df = trials_df.reset_index()
+        for field, value in metadata.items():
+            trials_df[field] = value
+        session_dfs.append(trials_df)
+
+    if len(session_dfs) == 0:
+        return pd.DataFrame(), failures
+
+    return pd.concat(session_dfs, ignore_index=True), failures
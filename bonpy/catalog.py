@@ -0,0 +1,409 @@
+import hashlib
+import os
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from bonpy.data_dict import classify_filename, compile_category_table
+from bonpy.data_parsers import MOUSE_LOADER_DICT
+from bonpy.experiment import Experiment
+from bonpy.timestamp_diagnostics import timestamps_qc
+
+# Default folder of the index files, on the local disk rather than on the (possibly
+# network) data root; one index file per data root, named after its resolved path:
+CATALOG_CACHE_SUBDIR = Path("bonpy") / "catalogs"
+
+# Sessions are organized as <root>/<animal_id>/<YYYYMMDD>/<HHMMSS>/:
+DATE_PATTERN = re.compile(r"^\d{8}$")
+SESSION_PATTERN = re.compile(r"^\d{6}$")
+
+READ_CHUNK_BYTES = 1 << 20  # chunk size for counting lines in csv files
+
+FILES_TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    session_path TEXT NOT NULL,
+    animal_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    session TEXT NOT NULL,
+    key TEXT NOT NULL,
+    category TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    n_rows INTEGER
+);
+CREATE INDEX IF NOT EXISTS files_session ON files (session_path);
+CREATE INDEX IF NOT EXISTS files_animal ON files (animal_id);
+CREATE INDEX IF NOT EXISTS files_key ON files (key);
+"""
+FILES_COLUMNS = (
+    "path",
+    "session_path",
+    "animal_id",
+    "date",
+    "session",
+    "key",
+    "category",
+    "size",
+    "mtime",
+    "n_rows",
+)
+
+
+def default_index_path(root_path):
+    """Path of the local SQLite index of a data root, in the user cache folder
+    ($XDG_CACHE_HOME, %LOCALAPPDATA% on Windows, or ~/.cache)."""
+    cache_root = os.environ.get("XDG_CACHE_HOME") or os.environ.get("LOCALAPPDATA")
+    cache_root = Path(cache_root) if cache_root else Path.home() / ".cache"
+
+    root_path = Path(root_path).resolve()
+    root_hash = hashlib.sha1(str(root_path).encode()).hexdigest()[:16]
+    return cache_root / CATALOG_CACHE_SUBDIR / f"{root_path.name}_{root_hash}.sqlite"
+
+
+def _count_csv_rows(path):
+    """Count the data rows of a csv file (excluding the header) without parsing it."""
+    n_lines = 0
+    last_chunk = b""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            n_lines += chunk.count(b"\n")
+            last_chunk = chunk
+
+    # Last line might not be terminated by a newline:
+    if last_chunk and not last_chunk.endswith(b"\n"):
+        n_lines += 1
+
+    return max(n_lines - 1, 0)
+
+
+def _list_animal_sessions(animal_path):
+    """List all session folders of an animal."""
+    session_paths = []
+    with os.scandir(animal_path) as date_entries:
+        for date_entry in date_entries:
+            if not (date_entry.is_dir() and DATE_PATTERN.match(date_entry.name)):
+                continue
+            with os.scandir(date_entry.path) as session_entries:
+                for session_entry in session_entries:
+                    if session_entry.is_dir() and SESSION_PATTERN.match(
+                        session_entry.name
+                    ):
+                        session_paths.append(session_entry.path)
+    return session_paths
+
+
+def _scan_session(session_path, category_table, known_files):
+    """Scan a session folder, returning records for new or modified files and the
+    list of all files found.
+
+    Files whose size and modification time match the ones in known_files are not
+    re-classified nor re-read.
+    """
+    session_path = Path(session_path)
+    animal_id = session_path.parent.parent.name
+    date = session_path.parent.name
+
+    records = []
+    found_paths = []
+    with os.scandir(session_path) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            found_paths.append(entry.path)
+            if known_files.get(entry.path) == (stat.st_size, stat.st_mtime):
+                continue
+
+            key, category = classify_filename(entry.name, category_table)
+            n_rows = (
+                _count_csv_rows(entry.path) if entry.name.endswith(".csv") else None
+            )
+            records.append(
+                (
+                    entry.path,
+                    str(session_path),
+                    animal_id,
+                    date,
+                    session_path.name,
+                    key,
+                    category,
+                    stat.st_size,
+                    stat.st_mtime,
+                    n_rows,
+                )
+            )
+
+    return records, found_paths
+
+
+class Catalog:
+    """Index of all the sessions in a data root, stored in a local SQLite file.
+
+    The data root is expected to be organized as
+    <root>/<animal_id>/<YYYYMMDD>/<HHMMSS>/.
+    Only animals with a loader dictionary defined in MOUSE_LOADER_DICT are indexed,
+    and files are classified with the same rules as LazyDataDict.
+
+    Args:
+        root_path (str or Path): Root folder of the dataset.
+        index_path (str or Path, optional): Path of the SQLite index, by default
+            a file in the local user cache folder, see default_index_path.
+        workers (int, optional): Number of threads used to scan the folders.
+
+    Methods:
+        scan(): Update the index, re-reading only new or modified files.
+        sessions(...): Query sessions from the index as a DataFrame.
+        files(...): Query indexed files as a DataFrame.
+        experiments(...): Query sessions and return Experiment objects.
+        timestamps_qc(...): Diagnose in parallel the timestamps of queried sessions.
+    """
+
+    def __init__(self, root_path, index_path=None, workers=None) -> None:
+        self.root_path = Path(root_path)
+        self.index_path = (
+            Path(index_path)
+            if index_path is not None
+            else default_index_path(self.root_path)
+        )
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self.workers = workers
+
+        self._connection = sqlite3.connect(str(self.index_path))
+        with self._connection:
+            self._connection.executescript(FILES_TABLE_SCHEMA)
+
+        self._category_tables = {
+            mouse_id: compile_category_table(loader_dict)
+            for mouse_id, loader_dict in MOUSE_LOADER_DICT.items()
+        }
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __len__(self):
+        return self._connection.execute(
+            "SELECT COUNT(DISTINCT session_path) FROM files"
+        ).fetchone()[0]
+
+    def __repr__(self) -> str:
+        return f"Catalog of {self.root_path} ({len(self)} sessions)"
+
+    def scan(self):
+        """Walk the data root and update the index.
+
+        Returns
+        -------
+        dict
+            Number of files updated (new or modified) and removed from the index.
+        """
+        with os.scandir(self.root_path) as entries:
+            animal_paths = [
+                entry.path
+                for entry in entries
+                if entry.is_dir() and entry.name in self._category_tables
+            ]
+
+        known_files = {
+            path: (size, mtime)
+            for path, size, mtime in self._connection.execute(
+                "SELECT path, size, mtime FROM files"
+            )
+        }
+
+        records = []
+        found_paths = set()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            session_paths = [
+                session_path
+                for animal_sessions in pool.map(_list_animal_sessions, animal_paths)
+                for session_path in animal_sessions
+            ]
+            category_tables = [
+                self._category_tables[Path(session_path).parent.parent.name]
+                for session_path in session_paths
+            ]
+            for session_records, session_found in pool.map(
+                _scan_session,
+                session_paths,
+                category_tables,
+                [known_files] * len(session_paths),
+            ):
+                records.extend(session_records)
+                found_paths.update(session_found)
+
+        removed_paths = [(path,) for path in known_files if path not in found_paths]
+
+        placeholders = ", ".join("?" * len(FILES_COLUMNS))
+        with self._connection:
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO files VALUES ({placeholders})", records
+            )
+            self._connection.executemany(
+                "DELETE FROM files WHERE path = ?", removed_paths
+            )
+
+        return dict(updated=len(records), removed=len(removed_paths))
+
+    @staticmethod
+    def _session_filters(
+        animals=None, dates=None, has_keys=None, has_categories=None, min_rows=None
+    ):
+        """Build the WHERE clause selecting sessions matching all the criteria."""
+        conditions, params = [], []
+        if animals is not None:
+            animals = [animals] if isinstance(animals, str) else list(animals)
+            conditions.append(f"animal_id IN ({', '.join('?' * len(animals))})")
+            params.extend(animals)
+
+        if dates is not None:
+            if isinstance(dates, str) or len(dates) != 2:
+                raise ValueError(
+                    f"dates must be a (first, last) pair of YYYYMMDD dates, "
+                    f"got {dates!r}."
+                )
+            conditions.append("date BETWEEN ? AND ?")
+            params.extend(dates)
+
+        session_subquery = "session_path IN (SELECT session_path FROM files WHERE {})"
+        for key in has_keys or []:
+            conditions.append(session_subquery.format("key = ?"))
+            params.append(key)
+
+        for category in has_categories or []:
+            conditions.append(session_subquery.format("category = ?"))
+            params.append(category)
+
+        for key, n_rows in (min_rows or dict()).items():
+            conditions.append(session_subquery.format("key = ? AND n_rows >= ?"))
+            params.extend([key, n_rows])
+
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return where, params
+
+    def files(self, **query):
+        """Query indexed files of the sessions matching the query.
+
+        Parameters
+        ----------
+        **query
+            Session selection criteria, see Catalog.sessions.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per file, with the indexed information.
+        """
+        where, params = self._session_filters(**query)
+        return pd.read_sql_query(
+            f"SELECT * FROM files{where} ORDER BY path", self._connection, params=params
+        )
+
+    def sessions(
+        self,
+        animals=None,
+        dates=None,
+        has_keys=None,
+        has_categories=None,
+        min_rows=None,
+    ):
+        """Query sessions from the index, without accessing the filesystem.
+
+        Parameters
+        ----------
+        animals : str or list of str, optional
+            Animal ids to include, by default all.
+        dates : tuple of str, optional
+            (first, last) dates to include, in YYYYMMDD format, by default all.
+        has_keys : list of str, optional
+            Data keys (as in LazyDataDict) that must be present in the session.
+        has_categories : list of str, optional
+            Loader categories (e.g. "eye_DLC_h5") that must be present in the session.
+        min_rows : dict, optional
+            Minimum number of data rows for csv data keys, e.g.
+            {"eye-cam_timestamps": 50000} to select movies with at least 50k frames.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per session, with animal, date, session, number of files and
+            total size in bytes.
+        """
+        where, params = self._session_filters(
+            animals=animals,
+            dates=dates,
+            has_keys=has_keys,
+            has_categories=has_categories,
+            min_rows=min_rows,
+        )
+        return pd.read_sql_query(
+            "SELECT session_path, animal_id, date, session, COUNT(*) AS n_files, "
+            f"SUM(size) AS size FROM files{where} "
+            "GROUP BY session_path ORDER BY animal_id, date, session",
+            self._connection,
+            params=params,
+        )
+
+    def experiments(self, **query):
+        """Query sessions from the index and return them as Experiment objects.
+
+        Parameters
+        ----------
+        **query
+            Session selection criteria, see Catalog.sessions.
+
+        Returns
+        -------
+        list of Experiment
+            Experiments matching the query.
+        """
+        return [
+            Experiment.load_112023(session_path)
+            for session_path in self.sessions(**query)["session_path"]
+        ]
+
+    def timestamps_qc(
+        self, expected_dt=None, workers=None, executor="process", **query
+    ):
+        """Diagnose in parallel all timestamps files of the sessions matching
+        the query, see bonpy.timestamp_diagnostics.timestamps_qc.
+
+        Parameters
+        ----------
+        expected_dt : float, optional
+            Nominal sampling interval, by default the median interval of each file.
+        workers : int, optional
+            Number of parallel workers, by default the executor default.
+        executor : str, optional
+            Either "process" or "thread", by default "process".
+        **query
+            Session selection criteria, see Catalog.sessions.
+
+        Returns
+        -------
+        report_df : pd.DataFrame
+            One row per timestamps file, with its key, session and diagnostics.
+        failures : dict
+            Error message for each file that could not be diagnosed.
+        """
+        files_df = self.files(**query)
+        report_df, failures = timestamps_qc(
+            files_df, expected_dt=expected_dt, workers=workers, executor=executor
+        )
+        if len(report_df) > 0:
+            report_df = files_df[
+                ["path", "session_path", "animal_id", "date", "session", "key"]
+            ].merge(report_df, on="path")
+        return report_df, failures
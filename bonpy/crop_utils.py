@@ -1,8 +1,20 @@
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 
+from bonpy.precision import float_dtype
+
+EVENT_AVERAGE_STATS = ("mean", "std", "sem", "n")
+
+
+def crop_around_idxs(
+    trace, idxs, window, out_of_range_fill=np.nan, view=False, precision=None
+):
+    if view:
+        return _crop_around_idxs_view(
+            trace, idxs, window, out_of_range_fill, precision=precision
+        )
 
-def crop_around_idxs(trace, idxs, window, out_of_range_fill=np.nan):
     window_idxs = np.arange(window[0], window[1], dtype=int)
     idxs_mat = idxs + window_idxs[:, np.newaxis]
     idxs_mat[idxs_mat >= len(trace)] = -1  # set to negative for filling in next step
@@ -11,13 +23,307 @@ def crop_around_idxs(trace, idxs, window, out_of_range_fill=np.nan):
 
     # if filling with eg nan, first convert to float:
     if cropped.dtype is not type(out_of_range_fill):
-        cropped = cropped.astype(type(out_of_range_fill))
+        cropped = cropped.astype(float_dtype(type(out_of_range_fill), precision))
 
     cropped[idxs_mat < 0] = out_of_range_fill
 
     return cropped
 
 
+def _crop_around_idxs_view(
+    trace, idxs, window, out_of_range_fill=np.nan, precision=None
+):
+    """Crop trace around idxs using a sliding window view instead of an index matrix.
+
+    If all windows are in range and evenly spaced, the result is a read-only view
+    of the trace and nothing is copied; if they are in range but unevenly spaced, the
+    windows are gathered in a single copy. Only if some windows are out of range
+    the result is cast to the type of out_of_range_fill, and only those windows
+    are built with a padded copy. Views keep the dtype of trace whatever the
+    precision, as they do not copy it.
+    """
+    trace = np.asarray(trace)
+    idxs = np.asarray(idxs, dtype=int)
+    window_len = window[1] - window[0]
+    start_idxs = idxs + window[0]
+    if len(idxs) == 0:
+        return np.empty((window_len, 0) + trace.shape[1:], dtype=trace.dtype)
+
+    inrange = (start_idxs >= 0) & (start_idxs + window_len <= len(trace))
+    if window_len <= len(trace):
+        # Shape (window_len, n_windows, ...), sharing memory with trace:
+        windows = np.moveaxis(sliding_window_view(trace, window_len, axis=0), -1, 0)
+
+    if inrange.all():
+        steps = np.diff(start_idxs)
+        if len(steps) == 0 or (steps[0] > 0 and np.all(steps == steps[0])):
+            step = steps[0] if len(steps) > 0 else 1
+            return windows[:, start_idxs[0] : start_idxs[-1] + 1 : step]
+
+        return windows[:, start_idxs]
+
+    cropped = np.empty(
+        (window_len, len(idxs)) + trace.shape[1:],
+        dtype=float_dtype(
+            np.result_type(trace.dtype, type(out_of_range_fill)), precision
+        ),
+    )
+    if inrange.any():
+        cropped[:, inrange] = windows[:, start_idxs[inrange]]
+
+    # Padded copy for the events at the edges:
+    edge_idxs_mat = start_idxs[~inrange] + np.arange(window_len)[:, np.newaxis]
+    valid_idxs = (edge_idxs_mat >= 0) & (edge_idxs_mat < len(trace))
+    edge_cropped = np.full(
+        edge_idxs_mat.shape + trace.shape[1:], out_of_range_fill, dtype=cropped.dtype
+    )
+    edge_cropped[valid_idxs] = trace[edge_idxs_mat[valid_idxs]]
+    cropped[:, ~inrange] = edge_cropped
+
+    return cropped
+
+
+def _closest_idxs(time_arr, times):
+    """Find the indexes of the values in the sorted time_arr closest to times."""
+    searchsorted = np.clip(np.searchsorted(time_arr, times), 1, len(time_arr) - 1)
+    # for each searchsorted idx, the closest time could be either the one before or after.
+    # Figure out which one is closer:
+    # TODO: this might be configurable
+    before = np.abs(time_arr[searchsorted - 1] - times)
+    after = np.abs(time_arr[searchsorted] - times)
+    return np.where(before < after, searchsorted - 1, searchsorted)
+
+
+def _frame_runs(frame_idxs):
+    """Merge sorted unique frame indexes in runs of consecutive frames.
+
+    Returns
+    -------
+    list of tuple
+        (start, stop) for each run, with stop excluded.
+    """
+    if len(frame_idxs) == 0:
+        return []
+    breaks = np.nonzero(np.diff(frame_idxs) > 1)[0]
+    starts = np.concatenate([frame_idxs[:1], frame_idxs[breaks + 1]])
+    stops = np.concatenate([frame_idxs[breaks], frame_idxs[-1:]]) + 1
+    return list(zip(starts.tolist(), stops.tolist()))
+
+
+def _iter_window_frames(movie, idxs_mat, chunk_frames):
+    """Decode once, in sorted sequential order, all frames needed by the windows
+    in idxs_mat (negative or too large indexes are ignored).
+
+    Yields
+    ------
+    tuple
+        (window positions, event positions, frames) for each chunk of decoded
+        frames, where frames[i] is the frame at
+        idxs_mat[window_positions[i], event_positions[i]].
+    """
+    valid_idxs = (idxs_mat >= 0) & (idxs_mat < movie.shape[0])
+    window_pos, event_pos = np.nonzero(valid_idxs)
+    frame_pos = idxs_mat[window_pos, event_pos]
+
+    sorting_idxs = np.argsort(frame_pos, kind="stable")
+    window_pos = window_pos[sorting_idxs]
+    event_pos = event_pos[sorting_idxs]
+    frame_pos = frame_pos[sorting_idxs]
+
+    for run_start, run_stop in _frame_runs(np.unique(frame_pos)):
+        for chunk_start, frames in movie.iter_chunks(
+            run_start, run_stop, chunk_frames=chunk_frames
+        ):
+            first, last = np.searchsorted(
+                frame_pos, [chunk_start, chunk_start + len(frames)]
+            )
+            yield (
+                window_pos[first:last],
+                event_pos[first:last],
+                frames[frame_pos[first:last] - chunk_start],
+            )
+
+
+def _to_array_and_time(data, dt=None, time_arr=None):
+    """Convert data to array, returning it with its time array and columns (if any)."""
+    assert not (
+        dt is not None and time_arr is not None
+    ), "Only one of dt and time_arr can be provided"
+
+    columns = None
+    if type(data) in [pd.Series, pd.DataFrame]:
+        # Use index of the dataframe if no time info is provided:
+        if time_arr is None and dt is None:
+            time_arr = data.index.values
+
+        if type(data) == pd.DataFrame:
+            columns = data.columns
+    else:
+        assert (
+            dt is not None or time_arr is not None
+        ), "Either dt or time_arr must be provided if data is numpy array"
+
+    data = np.asarray(data)
+
+    # If we just provided dt and there is no index to be used:
+    if time_arr is None and dt is not None:
+        time_arr = np.arange(data.shape[0]) * dt
+
+    return data, time_arr, columns
+
+
+class _RunningStats:
+    """NaN-aware running count, mean and sum of squared deviations for each window
+    offset, updated with batches of values by merging Welford accumulators
+    (Chan et al. parallel algorithm)."""
+
+    def __init__(self, shape):
+        self.n = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+
+    def update(self, values, idx=slice(None), axis=1):
+        """Add a batch of values to the stats at idx; axis is the batch axis."""
+        values = np.asarray(values, dtype=float)
+        valid = ~np.isnan(values)
+        n_batch = valid.sum(axis=axis)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_batch = np.where(valid, values, 0).sum(axis=axis) / n_batch
+            deviations = np.where(valid, values - np.expand_dims(mean_batch, axis), 0)
+            m2_batch = (deviations**2).sum(axis=axis)
+
+            n_prev = self.n[idx]
+            n_tot = n_prev + n_batch
+            has_new = n_batch > 0
+            delta = np.where(has_new, mean_batch - self.mean[idx], 0)
+            batch_fraction = np.where(has_new, n_batch / n_tot, 0)
+
+            self.mean[idx] = self.mean[idx] + delta * batch_fraction
+            self.m2[idx] = self.m2[idx] + np.where(
+                has_new, m2_batch + delta**2 * n_prev * batch_fraction, 0
+            )
+        self.n[idx] = n_tot
+
+    def results(self, stats, ddof=1):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(self.m2 / (self.n - ddof))
+            std[self.n <= ddof] = np.nan
+            all_stats = dict(
+                mean=np.where(self.n > 0, self.mean, np.nan),
+                std=std,
+                sem=std / np.sqrt(self.n),
+                n=self.n,
+            )
+        return {stat: all_stats[stat] for stat in stats}
+
+
+def event_average(
+    data,
+    crop_events,
+    window,
+    stats=EVENT_AVERAGE_STATS,
+    dt=None,
+    time_arr=None,
+    ddof=1,
+    chunk_events=64,
+    chunk_frames=256,
+    precision=None,
+):
+    """Compute event-triggered statistics without building the whole crop tensor.
+
+    Statistics are accumulated for each window offset over chunks of events
+    (for arrays and DataFrames) or chunks of decoded frames (for movies), so memory
+    scales with the size of a single window. Values out of range or NaN are ignored.
+
+    Parameters
+    ----------
+    data : np.ndarray or pd.Series or pd.DataFrame or MovieData
+        Data to average; the first dimension is assumed to be time.
+    crop_events : np.ndarray
+        Times of the events, in seconds.
+    window : tuple
+        Window to crop around, in seconds
+    stats : tuple of str, optional
+        Statistics to compute among "mean", "std", "sem" and "n", by default all.
+    dt : float, optional
+        Sampling interval, if data has no time information.
+    time_arr : np.ndarray, optional
+        Time of each sample, by default the DataFrame index or movie timestamps.
+    ddof : int, optional
+        Delta degrees of freedom for std and sem, by default 1.
+    chunk_events : int, optional
+        Number of events cropped at once for arrays and DataFrames, by default 64.
+    chunk_frames : int, optional
+        Number of frames decoded at once for movies, by default 256.
+    precision : str, optional
+        Either "full" or "compact"; with compact precision statistics are
+        accumulated in float64 but returned as float32. By default the global
+        precision (see bonpy.precision).
+
+    Returns
+    -------
+    timebase : np.ndarray
+        Timebase of the windows
+    event_stats : dict
+        Array with shape (window, ...) for each statistic; for DataFrames,
+        a DataFrame with timebase as index and data columns as columns.
+    """
+    assert all(
+        stat in EVENT_AVERAGE_STATS for stat in stats
+    ), f"stats must be among {EVENT_AVERAGE_STATS}"
+
+    columns = None
+    is_movie = hasattr(data, "iter_chunks")
+    if is_movie:
+        if time_arr is None and dt is None:
+            time_arr = data.timestamps.index.values
+        elif time_arr is None:
+            time_arr = np.arange(data.shape[0]) * dt
+    else:
+        data, time_arr, columns = _to_array_and_time(data, dt=dt, time_arr=time_arr)
+
+    crop_events = np.array(crop_events)
+    assert crop_events.ndim == 1, "crop_events must be 1D"
+    closest_idxs = _closest_idxs(time_arr, crop_events)
+
+    if dt is None:
+        dt = np.mean(np.diff(time_arr))
+    window_pts = np.round(np.array(window) / dt).astype(int)
+    window_len = window_pts[1] - window_pts[0]
+
+    running_stats = _RunningStats((window_len,) + data.shape[1:])
+    if is_movie:
+        idxs_mat = closest_idxs + np.arange(window_pts[0], window_pts[1])[:, np.newaxis]
+        for window_pos, _, frames in _iter_window_frames(data, idxs_mat, chunk_frames):
+            for window_idx in np.unique(window_pos):
+                running_stats.update(
+                    frames[window_pos == window_idx], idx=window_idx, axis=0
+                )
+    else:
+        for chunk_start in range(0, len(closest_idxs), chunk_events):
+            cropped = crop_around_idxs(
+                data,
+                closest_idxs[chunk_start : chunk_start + chunk_events],
+                window_pts,
+                view=True,
+            )
+            running_stats.update(cropped, axis=1)
+
+    timebase = np.arange(window_pts[0], window_pts[1]) * dt
+    event_stats = {
+        stat: values.astype(float_dtype(values.dtype, precision), copy=False)
+        for stat, values in running_stats.results(stats, ddof=ddof).items()
+    }
+
+    if columns is not None:
+        event_stats = {
+            stat: pd.DataFrame(values, index=timebase, columns=columns)
+            for stat, values in event_stats.items()
+        }
+
+    return timebase, event_stats
+
+
 def crop_around_times(trace, times, window, fs):
     idxs = (times * fs).astype(int)
     window = (np.array(window) * fs).astype(int)
@@ -34,6 +340,10 @@ def smart_crop(
     out_of_range_fill=np.nan,
     out_of_range_drop=False,
     max_jitter_fraction=0.1,
+    view=False,
+    interpolate=False,
+    precision=None,
+    gap_index=None,
 ):
     """Crop data around times, using a window.
 
@@ -49,46 +359,77 @@ def smart_crop(
         Whether to drop events that are too close to the edges, by default False.
     max_jitter_fraction : float, optional
         Maximum temporal jitter fraction allowed, by default 0.1
+    view : bool, optional
+        If True, avoid copying data when possible (see crop_around_idxs) and return
+        the stacked (window, events, columns) array also for DataFrames, instead
+        of a dictionary of columns. By default False.
+    interpolate : bool, optional
+        If True, evaluate each window exactly on the timebase by linear interpolation
+        of the samples around it, instead of taking the samples closest to the
+        events. No jitter check is done, and the result is always float. If dt is
+        passed together with time_arr (or a pd.DataFrame), it is used as step of the
+        output timebase. By default False.
+    precision : str, optional
+        Either "full" or "compact"; with compact precision crops that are cast to
+        float (e.g. to fill out of range values with NaN) are float32 instead of
+        float64. The timebase is always float64. By default the global precision
+        (see bonpy.precision).
+    gap_index : GapIndex, optional
+        Gap index of the data samples (e.g. MovieData.gap_index, or from
+        bonpy.timestamp_diagnostics.diagnose_timestamps). If provided, windows are
+        built on the regular clock of the gap index, so that dropped samples are
+        filled with out_of_range_fill instead of shifting the windows; dt and
+        time_arr are not used. Not compatible with interpolate. By default None.
 
     Returns
     -------
     timebase : np.ndarray
         Timebase of the cropped data
-    cropped_data : np.ndarray
-        Cropped data
+    cropped_data : np.ndarray or dict
+        Cropped data; for DataFrames, a dictionary with one entry per column
+        unless view is True
     """
-    assert not (
-        dt is not None and time_arr is not None
-    ), "Only one of dt and time_arr can be provided"
-
-    columns = None
-    if type(data) in [pd.Series, pd.DataFrame]:
-        # Use index of the dataframe if no time info is provided:
-        if time_arr is None and dt is None:
-            time_arr = data.index.values
-
-        if type(data) == pd.DataFrame:
-            columns = data.columns
-    else:
-        assert (
-            dt is not None or time_arr is not None
-        ), "Either dt or time_arr must be provided if data is numpy array"
+    if gap_index is not None:
+        if interpolate:
+            raise ValueError("gap_index cannot be used with interpolate")
+        return _gap_index_crop(
+            data,
+            crop_events,
+            window,
+            gap_index,
+            out_of_range_fill=out_of_range_fill,
+            out_of_range_drop=out_of_range_drop,
+            view=view,
+            precision=precision,
+        )
 
-    data = np.array(data)
+    timebase_dt = None
+    if interpolate and dt is not None:
+        if time_arr is not None or type(data) in [pd.Series, pd.DataFrame]:
+            timebase_dt, dt = dt, None
 
-    # If we just provided dt and there is no index to be used:
-    if time_arr is None and dt is not None:
-        time_arr = np.arange(data.shape[0]) * dt
+    data, time_arr, columns = _to_array_and_time(data, dt=dt, time_arr=time_arr)
 
     crop_events = np.array(crop_events)
     assert crop_events.ndim == 1, "crop_events must be 1D"
-    searchsorted = np.searchsorted(time_arr, crop_events)
-    # for each searchsorted idx, the closest time could be either the one before or after.
-    # Figure out which one is closer:
-    # TODO: this might be configurable
-    before = np.abs(time_arr[searchsorted - 1] - crop_events)
-    after = np.abs(time_arr[searchsorted] - crop_events)
-    closest_idxs = np.where(before < after, searchsorted - 1, searchsorted)
+
+    if interpolate:
+        timebase, cropped_data = _interpolated_crop(
+            data,
+            time_arr,
+            crop_events,
+            window,
+            dt=timebase_dt if timebase_dt is not None else dt,
+            out_of_range_fill=out_of_range_fill,
+            out_of_range_drop=out_of_range_drop,
+            precision=precision,
+        )
+        if columns is not None and not view:
+            cropped_data = {key: cropped_data[..., i] for i, key in enumerate(columns)}
+
+        return timebase, cropped_data
+
+    closest_idxs = _closest_idxs(time_arr, crop_events)
 
     if dt is None:
         timedelta = np.diff(time_arr)
@@ -118,10 +459,352 @@ def smart_crop(
 
     timebase = np.arange(window_pts[0], window_pts[1]) * dt
     cropped_data = crop_around_idxs(
-        data, closest_idxs, window_pts, out_of_range_fill=out_of_range_fill
+        data,
+        closest_idxs,
+        window_pts,
+        out_of_range_fill=out_of_range_fill,
+        view=view,
+        precision=precision,
     )
 
-    if columns is not None:
+    if columns is not None and not view:
+        cropped_data = {key: cropped_data[..., i] for i, key in enumerate(columns)}
+
+    return timebase, cropped_data
+
+
+def _gap_index_window_frames(gap_index, crop_events, window, out_of_range_drop=False):
+    """Sample indexes of windows around events on the clock of a gap index
+    (-1 for dropped or out of range samples)."""
+    crop_events = np.array(crop_events)
+    assert crop_events.ndim == 1, "crop_events must be 1D"
+
+    window_pts, idxs_mat = gap_index.window_frames(crop_events, window)
+    if out_of_range_drop:
+        event_slots = gap_index.time_to_slot(crop_events)
+        inrange_selection = (event_slots + window_pts[0] >= 0) & (
+            event_slots + window_pts[1] <= gap_index.n_slots
+        )
+        idxs_mat = idxs_mat[:, inrange_selection]
+
+    return window_pts, idxs_mat
+
+
+def _gap_index_crop(
+    data,
+    crop_events,
+    window,
+    gap_index,
+    out_of_range_fill=np.nan,
+    out_of_range_drop=False,
+    view=False,
+    precision=None,
+):
+    """Crop data around events on the regular clock of a gap index."""
+    data, _, columns = _to_array_and_time(data, dt=gap_index.dt)
+    assert (
+        len(data) == gap_index.n_frames
+    ), "Data and gap index have different number of samples!"
+
+    window_pts, idxs_mat = _gap_index_window_frames(
+        gap_index, crop_events, window, out_of_range_drop=out_of_range_drop
+    )
+    valid = idxs_mat >= 0
+    cropped_data = data[idxs_mat]
+    if not valid.all():
+        cropped_data = cropped_data.astype(
+            float_dtype(np.result_type(data.dtype, type(out_of_range_fill)), precision)
+        )
+        cropped_data[~valid] = out_of_range_fill
+
+    timebase = np.arange(window_pts[0], window_pts[1]) * gap_index.dt
+    if columns is not None and not view:
         cropped_data = {key: cropped_data[..., i] for i, key in enumerate(columns)}
 
     return timebase, cropped_data
+
+
+def _interp_weights(time_arr, target_times):
+    """Find the samples of the sorted time_arr around each target time and the
+    linear interpolation weight of the second one.
+
+    Returns
+    -------
+    idxs_before : np.ndarray
+        Index of the sample before each target time.
+    weights : np.ndarray
+        Weight of the sample after each target time (the one before has 1 - weights).
+    valid : np.ndarray
+        Whether each target time is within the range of time_arr.
+    """
+    idxs_after = np.clip(
+        np.searchsorted(time_arr, target_times, side="right"), 1, len(time_arr) - 1
+    )
+    idxs_before = idxs_after - 1
+    time_before = time_arr[idxs_before]
+    intervals = time_arr[idxs_after] - time_before
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weights = np.where(intervals > 0, (target_times - time_before) / intervals, 0)
+    valid = (target_times >= time_arr[0]) & (target_times <= time_arr[-1])
+
+    return idxs_before, weights, valid
+
+
+def _apply_interp_weights(
+    data, idxs_before, weights, valid, out_of_range_fill=np.nan, precision=None
+):
+    """Interpolate data using weights from _interp_weights; the output has the shape
+    of the target times, plus the non-time dimensions of data."""
+    dtype = float_dtype(np.result_type(data.dtype, weights.dtype), precision)
+    weights = weights.astype(dtype, copy=False)
+    weights = weights.reshape(weights.shape + (1,) * (data.ndim - 1))
+    interpolated = (
+        data[idxs_before].astype(dtype, copy=False) * (1 - weights)
+        + data[idxs_before + 1].astype(dtype, copy=False) * weights
+    )
+    interpolated[~valid] = out_of_range_fill
+
+    return interpolated
+
+
+def _interpolated_crop(
+    data,
+    time_arr,
+    crop_events,
+    window,
+    dt=None,
+    out_of_range_fill=np.nan,
+    out_of_range_drop=False,
+    precision=None,
+):
+    """Crop data around events interpolating it at the exact window times.
+    Only the samples falling inside the windows are used."""
+    if dt is None:
+        dt = np.mean(np.diff(time_arr))
+    window_pts = np.round(np.array(window) / dt).astype(int)
+    timebase = np.arange(window_pts[0], window_pts[1]) * dt
+
+    if out_of_range_drop:
+        crop_events = crop_events[
+            (crop_events + timebase[0] >= time_arr[0])
+            & (crop_events + timebase[-1] <= time_arr[-1])
+        ]
+
+    target_times = crop_events + timebase[:, np.newaxis]
+    idxs_before, weights, valid = _interp_weights(time_arr, target_times)
+    cropped_data = _apply_interp_weights(
+        data,
+        idxs_before,
+        weights,
+        valid,
+        out_of_range_fill=out_of_range_fill,
+        precision=precision,
+    )
+
+    return timebase, cropped_data
+
+
+def _stream_array_and_time(stream):
+    """Parse a stream for multi_crop: either a pd.Series / pd.DataFrame indexed by time,
+    or a (data, time_arr) tuple."""
+    if isinstance(stream, tuple):
+        data, time_arr = stream
+        return _to_array_and_time(data, time_arr=np.asarray(time_arr))
+    return _to_array_and_time(stream)
+
+
+def multi_crop(
+    streams,
+    crop_events,
+    window,
+    dt=None,
+    interpolate=False,
+    out_of_range_fill=np.nan,
+    precision=None,
+):
+    """Crop multiple streams with different time bases around the same events,
+    on a shared peri-event timebase.
+
+    The mapping from event windows to samples is computed only once for each
+    distinct time array, and shared by all the streams using it.
+
+    Parameters
+    ----------
+    streams : dict
+        Streams to crop, by name. Each can be a pd.Series or pd.DataFrame indexed by
+        time, or a (data, time_arr) tuple.
+    crop_events : np.ndarray
+        Times of the events, in seconds.
+    window : tuple
+        Window to crop around, in seconds
+    dt : float, optional
+        Step of the shared timebase, by default the smallest median sampling
+        interval across streams.
+    interpolate : bool, optional
+        If True, linearly interpolate streams at the timebase times, otherwise
+        take the closest sample. By default False.
+    out_of_range_fill : int or float, optional
+        Value filling parts of the windows that are out of range, by default np.nan.
+    precision : str, optional
+        Either "full" or "compact" (float32 instead of float64 crops), by default
+        the global precision (see bonpy.precision).
+
+    Returns
+    -------
+    timebase : np.ndarray
+        Shared timebase of the cropped data
+    cropped_streams : dict
+        Cropped data with shape (window, events, ...) for each stream; for
+        DataFrames, a dictionary with one entry per column as in smart_crop.
+    """
+    crop_events = np.array(crop_events)
+    assert crop_events.ndim == 1, "crop_events must be 1D"
+
+    parsed_streams = dict()
+    time_bases = []  # distinct time arrays across streams
+    for name, stream in streams.items():
+        data, time_arr, columns = _stream_array_and_time(stream)
+        for time_base_n, time_base in enumerate(time_bases):
+            if time_base is time_arr or (
+                len(time_base) == len(time_arr) and np.array_equal(time_base, time_arr)
+            ):
+                break
+        else:
+            time_base_n = len(time_bases)
+            time_bases.append(time_arr)
+        parsed_streams[name] = (data, time_base_n, columns)
+
+    if dt is None:
+        dt = min(np.median(np.diff(time_base)) for time_base in time_bases)
+    window_pts = np.round(np.array(window) / dt).astype(int)
+    timebase = np.arange(window_pts[0], window_pts[1]) * dt
+    target_times = crop_events + timebase[:, np.newaxis]
+
+    # Map windows to samples once per time base:
+    samples_mappings = []
+    for time_base in time_bases:
+        if interpolate:
+            samples_mappings.append(_interp_weights(time_base, target_times))
+        else:
+            half_dt = np.mean(np.diff(time_base)) / 2
+            valid = (target_times >= time_base[0] - half_dt) & (
+                target_times <= time_base[-1] + half_dt
+            )
+            samples_mappings.append((_closest_idxs(time_base, target_times), valid))
+
+    cropped_streams = dict()
+    for name, (data, time_base_n, columns) in parsed_streams.items():
+        if interpolate:
+            cropped = _apply_interp_weights(
+                data,
+                *samples_mappings[time_base_n],
+                out_of_range_fill=out_of_range_fill,
+                precision=precision,
+            )
+        else:
+            idxs_mat, valid = samples_mappings[time_base_n]
+            cropped = data[idxs_mat].astype(
+                float_dtype(
+                    np.result_type(data.dtype, type(out_of_range_fill)), precision
+                )
+            )
+            cropped[~valid] = out_of_range_fill
+
+        if columns is not None:
+            cropped = {key: cropped[..., i] for i, key in enumerate(columns)}
+        cropped_streams[name] = cropped
+
+    return timebase, cropped_streams
+
+
+def crop_movie(
+    movie,
+    crop_events,
+    window,
+    time_arr=None,
+    out_of_range_fill=0,
+    out_of_range_drop=False,
+    chunk_frames=256,
+    memmap_filename=None,
+    gap_index=None,
+):
+    """Crop clips of a movie around event times, without loading the whole movie.
+
+    The frames needed by all the windows are merged in runs of consecutive frames
+    and decoded only once, in sorted order.
+
+    Parameters
+    ----------
+    movie : MovieData
+        Movie to crop.
+    crop_events : np.ndarray
+        Times of the events, in seconds.
+    window : tuple
+        Window to crop around, in seconds
+    time_arr : np.ndarray, optional
+        Time of each frame, by default the movie timestamps.
+    out_of_range_fill : int or float, optional
+        Value filling frames that are out of range, by default 0.
+    out_of_range_drop : bool, optional
+        Whether to drop events that are too close to the edges, by default False.
+    chunk_frames : int, optional
+        Maximum number of frames decoded at once, by default 256.
+    memmap_filename : str or Path, optional
+        If provided, clips are written to a memory-mapped .npy file at this path
+        instead of being kept in memory. By default None.
+    gap_index : GapIndex, optional
+        Gap index of the movie frames (e.g. movie.gap_index). If provided, windows
+        are built on the regular frame clock and dropped frames are filled with
+        out_of_range_fill; time_arr is not used. By default None.
+
+    Returns
+    -------
+    timebase : np.ndarray
+        Timebase of the cropped clips
+    cropped_data : np.ndarray
+        Clips, with shape (window, events, height, width[, channels])
+    """
+    if gap_index is not None:
+        dt = gap_index.dt
+        window_pts, idxs_mat = _gap_index_window_frames(
+            gap_index, crop_events, window, out_of_range_drop=out_of_range_drop
+        )
+    else:
+        if time_arr is None:
+            assert (
+                movie.has_timestamps
+            ), "time_arr must be provided if movie has no timestamps"
+            time_arr = movie.timestamps.index.values
+
+        crop_events = np.array(crop_events)
+        assert crop_events.ndim == 1, "crop_events must be 1D"
+        closest_idxs = _closest_idxs(time_arr, crop_events)
+
+        dt = np.mean(np.diff(time_arr))
+        window_pts = np.round(np.array(window) / dt).astype(int)
+
+        if out_of_range_drop:
+            inrange_selection = (closest_idxs + window_pts[0] >= 0) & (
+                closest_idxs + window_pts[1] < movie.shape[0]
+            )
+            closest_idxs = closest_idxs[inrange_selection]
+
+        idxs_mat = closest_idxs + np.arange(window_pts[0], window_pts[1])[:, np.newaxis]
+
+    output_shape = idxs_mat.shape + movie.shape[1:]
+    if memmap_filename is not None:
+        cropped_data = np.lib.format.open_memmap(
+            memmap_filename, mode="w+", dtype=movie.dtype, shape=output_shape
+        )
+        cropped_data[...] = out_of_range_fill
+    else:
+        cropped_data = np.full(output_shape, out_of_range_fill, dtype=movie.dtype)
+
+    for window_pos, event_pos, frames in _iter_window_frames(
+        movie, idxs_mat, chunk_frames
+    ):
+        cropped_data[window_pos, event_pos] = frames
+
+    timebase = np.arange(window_pts[0], window_pts[1]) * dt
+
+    return timebase, cropped_data
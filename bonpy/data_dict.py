@@ -1,10 +1,25 @@
+import os
+import time
 from collections import UserDict
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from functools import partial
 from pathlib import Path
-from tkinter import N
-
-from matplotlib.dates import MO
 
+from bonpy.async_utils import InFlightCalls
 from bonpy.data_parsers import LOADER_DICT, MOUSE_LOADER_DICT
+from bonpy.instrumentation import recording
+from bonpy.precision import get_precision
+
+# Executors that can be used to preload data in parallel:
+EXECUTORS_DICT = dict(thread=ThreadPoolExecutor, process=ProcessPoolExecutor)
+
+# split over beginning of timestamp, assuming convention _YYYY...
+# as default in BonsaiRX
+SPLIT_PATTERN = "_202"
 
 # FILETSTAMP_LENGTH = 19  # length of the file timestamp
 # FILETSTAMP_PARSER = "%Y-%m-%dT%H_%M_%S"  # pattern of the file timestamp
@@ -12,7 +27,11 @@ from bonpy.data_parsers import LOADER_DICT, MOUSE_LOADER_DICT
 
 
 class LazyDataDict(UserDict):
-    """Dictionary that loads data on demand using a dictionary of loaders."""
+    """Dictionary that loads data on demand using a dictionary of loaders.
+
+    Data is loaded with the precision passed at creation, or with the global
+    precision at loading time if None (see bonpy.precision).
+    """
 
     # Dictionary defining loading functions for different file types.
     # By default only extention is used to identify the loader, but
@@ -26,55 +45,38 @@ class LazyDataDict(UserDict):
     # for new data compositions.
     mouse_loaders_dict = MOUSE_LOADER_DICT
 
-    def __init__(self, path, timestamp_begin=None, mouse_id=None):
+    def __init__(self, path, timestamp_begin=None, mouse_id=None, precision=None):
         self.root_path = Path(path)
         if mouse_id is None:
             mouse_id = self.root_path.parent.parent.name
-        self.loader_dict = self.mouse_loaders_dict[mouse_id]
-        self.loader_dict.update({"-": lambda x, _: None})
+        # Copy, to avoid modifying the shared loaders dictionary:
+        self.loader_dict = dict(self.mouse_loaders_dict[mouse_id])
+        # Unknown file types will be loaded with this function (module-level,
+        # so that it can be pickled when preloading with processes):
+        self.loader_dict.update({"-": _load_none})
 
         self.files_dict = self._discover_files(self.root_path, mouse_id=mouse_id)
 
         self.timestamp_begin = timestamp_begin
+        self.precision = None if precision is None else get_precision(precision)
+        self._in_flight = InFlightCalls()
 
         super().__init__()
 
     def keys(self):
         return self.files_dict.keys()
 
-    # @staticmethod
     def _discover_files(self, path, mouse_id):
-        # loader_dict = LazyDataDict.mouse_loaders_dict[mouse_id]
-            # Unknown file types will be loaded with this function:
-        categories_to_discover = self.loader_dict.keys()
-
-        # split over beginning of timestamp, assuming convention _YYYY...
-        # as default in BonsaiRX
-        SPLIT_PATTERN = "_202"
+        category_table = compile_category_table(self.loader_dict)
 
-        # Loop over all categories that have a parser defined.
-        # For each, make a dictionary of dictionaries
+        # Loop over all files and classify each with the precompiled categories:
         files_dict = dict()
-        for file in path.glob("*"):
-            name = file.stem
-            name.replace("__", "_")  # fix for double underscores in filenames
-            file_dict = dict(file=file, category="-")
-            for category in categories_to_discover:
-                extension = category.split("_")[-1]
-                pattern = category.split("_")[0] if "_" in category else ""
-
-                if file.suffix[1:] == extension and pattern in file.stem:
-                    name = file.stem
-                    if SPLIT_PATTERN in file.stem:
-                        name = name.split(SPLIT_PATTERN)[0]
-
-                    # If we omplement a specific loader, add to the name:
-                    if "_" in category:
-                        name = name + "_" + category.split("_")[0]
-
-                    file_dict = dict(file=file, category=category)
-
-            files_dict[name] = file_dict
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                name, category = classify_filename(entry.name, category_table)
+                files_dict[name] = dict(file=Path(entry.path), category=category)
 
         return files_dict
 
@@ -109,10 +111,200 @@ class LazyDataDict(UserDict):
         file = self.files_dict[key]["file"]
         category = self.files_dict[key]["category"]
         if key not in self.data:
-            self.data[key] = self.loader_dict[category](file, self.timestamp_begin)
+            with recording("LazyDataDict.__getitem__", key=key):
+                self.data[key] = self.loader_dict[category](
+                    file, self.timestamp_begin, precision=get_precision(self.precision)
+                )
+
+        return self.data[key]
+
+    async def aget(self, key, executor=None):
+        """Awaitable counterpart of __getitem__, loading the data in an executor.
+        Concurrent requests for the same key share a single load.
+
+        Parameters
+        ----------
+        key : str
+            Key to load.
+        executor : Executor, optional
+            Executor running the loader (threads or processes), by default
+            the one of bonpy.async_utils.get_default_executor.
+
+        Returns
+        -------
+        The loaded data.
+        """
+        if key not in self.data:
+            file_info = self.files_dict[key]
+            data = await self._in_flight.run(
+                key,
+                partial(
+                    self.loader_dict[file_info["category"]],
+                    precision=get_precision(self.precision),
+                ),
+                file_info["file"],
+                self.timestamp_begin,
+                executor=executor,
+            )
+            self.data.setdefault(key, data)
 
         return self.data[key]
 
+    def _loading_tasks(self, keys=None):
+        """List (key, loader, file) for all the keys to load that are not loaded yet."""
+        keys = self.keys() if keys is None else keys
+        tasks = []
+        for key in keys:
+            if key in self.data:
+                continue
+            file_info = self.files_dict[key]
+            tasks.append(
+                (key, self.loader_dict[file_info["category"]], file_info["file"])
+            )
+        return tasks
+
+    def preload(self, keys=None, workers=None, executor="thread"):
+        """Load eagerly and in parallel the data for multiple keys.
+
+        Parameters
+        ----------
+        keys : list of str, optional
+            Keys to load, by default all keys that are not loaded yet.
+        workers : int, optional
+            Number of parallel workers, by default the executor default.
+        executor : str, optional
+            Either "thread" or "process", by default "thread".
+
+        Returns
+        -------
+        dict
+            Loading time in seconds for each loaded key.
+        """
+        return preload([self], keys=keys, workers=workers, executor=executor)[0]
+
+
+def compile_category_table(loader_dict):
+    """Precompile the categories of a loader dictionary for file classification.
+
+    Parameters
+    ----------
+    loader_dict : dict
+        Dictionary of loaders, with keys in the form [pattern_]extension.
+
+    Returns
+    -------
+    dict
+        For each extension, list of (category, name pattern) tuples, in the
+        order of the loader dictionary.
+    """
+    category_table = dict()
+    for category in loader_dict.keys():
+        extension = category.split("_")[-1]
+        pattern = category.split("_")[0] if "_" in category else ""
+        category_table.setdefault(extension, []).append((category, pattern))
+
+    return category_table
+
+
+def classify_filename(filename, category_table):
+    """Find data key and loader category of a file from its name.
+
+    If a file matches multiple categories, the last one is used.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the file (without parent folders).
+    category_table : dict
+        Table of categories, as returned by compile_category_table.
+
+    Returns
+    -------
+    tuple
+        (key, category) for the file; category is "-" if no loader matches.
+    """
+    stem, extension = os.path.splitext(filename)
+    name, category = stem, "-"
+    for candidate, pattern in category_table.get(extension[1:], []):
+        if pattern in stem:
+            name = stem.split(SPLIT_PATTERN)[0]
+
+            # If we implement a specific loader, add to the name:
+            if pattern:
+                name = name + "_" + pattern
+            category = candidate
+
+    return name, category
+
+
+def _load_none(*_, **__):
+    return None
+
+
+def _timed_load(loader, file, timestamp_begin, precision=None):
+    """Run a loader and measure the time it took. Module-level to be picklable."""
+    t_start = time.perf_counter()
+    data = loader(file, timestamp_begin, precision=precision)
+    return data, time.perf_counter() - t_start
+
+
+def preload(data_dicts, keys=None, workers=None, executor="thread"):
+    """Load in parallel the data of one or more LazyDataDict objects.
+
+    All loading tasks from all the dictionaries are scheduled in the same pool,
+    so that many sessions can be preloaded at once in batch jobs.
+
+    Parameters
+    ----------
+    data_dicts : list of LazyDataDict
+        Dictionaries to fill.
+    keys : list of str, optional
+        Keys to load for each dictionary, by default all keys that are not loaded yet.
+        Keys missing from a dictionary are skipped.
+    workers : int, optional
+        Number of parallel workers, by default the executor default.
+    executor : str, optional
+        Either "thread" or "process", by default "thread". Data loaded in
+        processes is pickled back to the main process.
+
+    Returns
+    -------
+    list of dict
+        For each dictionary, the loading time in seconds for each loaded key.
+    """
+    if executor not in EXECUTORS_DICT:
+        raise ValueError(
+            f"Unknown executor {executor}; options are {list(EXECUTORS_DICT.keys())}"
+        )
+
+    timings = [dict() for _ in data_dicts]
+    with EXECUTORS_DICT[executor](max_workers=workers) as pool:
+        futures = dict()
+        for dict_n, data_dict in enumerate(data_dicts):
+            dict_keys = None
+            if keys is not None:
+                dict_keys = [k for k in keys if k in data_dict.files_dict]
+
+            for key, loader, file in data_dict._loading_tasks(dict_keys):
+                # Precision is resolved here, as the global one is not set in
+                # worker processes:
+                future = pool.submit(
+                    _timed_load,
+                    loader,
+                    file,
+                    data_dict.timestamp_begin,
+                    get_precision(data_dict.precision),
+                )
+                futures[future] = (dict_n, key)
+
+        for future in as_completed(futures):
+            dict_n, key = futures[future]
+            data, elapsed = future.result()
+            data_dicts[dict_n].data[key] = data
+            timings[dict_n][key] = elapsed
+
+    return timings
+
 
 if __name__ == "__main__":
 
@@ -1,45 +1,81 @@
+import warnings
 from pathlib import Path
-from re import M
 
-import flammkuchen as fl
 import numpy as np
 import pandas as pd
 
 # from bonpy.df_parsers import parse_ball_log, parse_stim_log
-from bonpy.moviedata import OpenCVMovieData
+from bonpy.instrumentation import instrumented
+from bonpy.precision import compact_dtypes, is_compact
 from bonpy.time_utils import inplace_time_cols_fix_and_resample
 
 BALL_SMOOOTH_WND = 200
-
-
-def _load_csv(filename, timestamp_begin=None):
+BALL_OFFSET = 127  # origin of the ball counts, logged as uint8
+LASER_CONTENTS = ["frequency", "pulse_width", "stim_duration"]
+DLC_BLOCK_ROWS = 10000  # rows of DLC files read at once by streaming loaders
+
+# Pupil features computed from eye DLC tracking:
+PUPIL_FEATURES = [
+    "pupil_likelihood",
+    "avg_pupil_diameter",
+    "avg_pupil_x",
+    "avg_pupil_y",
+    "main_ax_proj",
+    "sec_ax_proj",
+]
+
+
+@instrumented
+def _load_csv(filename, timestamp_begin=None, precision=None):
     """Load a csv file and parse the timestamp column."""
     df = pd.read_csv(filename)
-    inplace_time_cols_fix_and_resample(df, timestamp_begin=timestamp_begin)
+    inplace_time_cols_fix_and_resample(
+        df, timestamp_begin=timestamp_begin, precision=precision
+    )
+    return compact_dtypes(df, precision=precision)
+
+
+def _parse_laser_messages(df, message_col):
+    """Split in place the laser messages ("frequency;pulse_width;stim_duration")
+    in separate columns. Shared by the loaders and the live followers of logs."""
+    for i, content in enumerate(LASER_CONTENTS):
+        df[content] = df[message_col].apply(lambda x: x.split(";")[i])
     return df
 
 
-def _load_laser_log_csv(file, timestamp_begin=None):
-    df = _load_csv(file, timestamp_begin=timestamp_begin)
+def _ball_data_cols(df):
+    return [c for c in df.columns if c not in ["time", "timedelta"]]
 
-    # df.reset_index(drop=True, inplace=True)
-    for i, content in enumerate(["frequency", "pulse_width", "stim_duration"]):
-        df[content] = df["LaserSerialMex"].apply(lambda x: x.split(";")[i])
 
+def _center_ball_counts(df, data_cols, precision=None):
+    """Convert in place the ball counts to integers centered on 0. Shared by the
+    loaders and the live followers of logs."""
+    # Counts are uint8 centered on BALL_OFFSET, so once centered they fit in int16:
+    counts_dtype = np.int16 if is_compact(precision) else int
+    for c in data_cols:
+        df[c] = df[c].apply(lambda x: int(x)).astype(counts_dtype)
+    df[data_cols] -= BALL_OFFSET  # set actual origin (original number is uint8)
     return df
 
-def _load_laser_log_v01_csv(file, timestamp_begin=None):
-    df = _load_csv(file, timestamp_begin=timestamp_begin)
+
+@instrumented
+def _load_laser_log_csv(file, timestamp_begin=None, precision=None):
+    df = _load_csv(file, timestamp_begin=timestamp_begin, precision=precision)
 
     # df.reset_index(drop=True, inplace=True)
-    for i, content in enumerate(["frequency", "pulse_width", "stim_duration"]):
-        df[content] = df["Value"].apply(lambda x: x.split(";")[i])
+    return _parse_laser_messages(df, "LaserSerialMex")
 
-    return df
+@instrumented
+def _load_laser_log_v01_csv(file, timestamp_begin=None, precision=None):
+    df = _load_csv(file, timestamp_begin=timestamp_begin, precision=precision)
+
+    # df.reset_index(drop=True, inplace=True)
+    return _parse_laser_messages(df, "Value")
 
 
-def _load_ball_log_csv(file, timestamp_begin=None, smooth_wnd=None):
-    df = _load_csv(file, timestamp_begin=timestamp_begin)
+@instrumented
+def _load_ball_log_csv(file, timestamp_begin=None, smooth_wnd=None, precision=None):
+    df = _load_csv(file, timestamp_begin=timestamp_begin, precision=precision)
 
     # if n_log_cols== 3:
     #     columns = ["pitch", "yaw", "timestamp"]
@@ -50,24 +86,21 @@ def _load_ball_log_csv(file, timestamp_begin=None, smooth_wnd=None):
     # df.columns = columns
     # df = df[1:].reset_index()
     # inplace_time_cols_fix(df)
-    data_cols = [c for c in df.columns if c not in ["time", "timedelta"]]
-
-    for c in data_cols:
-        df[c] = df[c].apply(lambda x: int(x))
-    df[data_cols] -= 127  # set actual origin (original number is uint8)
+    data_cols = _ball_data_cols(df)
+    _center_ball_counts(df, data_cols, precision=precision)
 
     if smooth_wnd is not None:
-        df.loc[:, data_cols] = (
-            df.loc[:, data_cols].rolling(smooth_wnd, center=True).median()
-        )
+        df[data_cols] = df[data_cols].rolling(smooth_wnd, center=True).median()
+        compact_dtypes(df, precision=precision)
 
     return df
 
 
-def _load_cube_log_csv(file, timestamp_begin=None):
+@instrumented
+def _load_cube_log_csv(file, timestamp_begin=None, precision=None):
     MIN_DURATION = 1
 
-    df = _load_csv(file, timestamp_begin=timestamp_begin)
+    df = _load_csv(file, timestamp_begin=timestamp_begin, precision=precision)
     # Exclude initial centering of position:
     df = df.iloc[1:]
     COLUMN_OPTIONS_DICT = {
@@ -91,24 +124,45 @@ def _load_cube_log_csv(file, timestamp_begin=None):
         actual_movements_df["hold_time"] > MIN_DURATION
     ]
     # df.reset_index(drop=True, inplace=True)
-    return actual_movements_df
+    return compact_dtypes(actual_movements_df, precision=precision)
+
 
+@instrumented
+def _load_avi(filename, timestamp_begin=None, precision=None):
+    # Deferred import, to avoid loading OpenCV unless movies are opened:
+    from bonpy.mjpeg import open_movie
 
-def _load_avi(filename, timestamp_begin=None):
-    return OpenCVMovieData(filename, timestamp_begin=timestamp_begin)
+    return open_movie(filename, timestamp_begin=timestamp_begin)
 
 
-def _load_h5(filename, _=None):
+@instrumented
+def _load_h5(filename, _=None, precision=None):
+    import flammkuchen as fl
+
     return fl.load(filename)
 
 
-def load_dlc_h5(file, timestamp_begin=None):
+@instrumented
+def load_dlc_h5(file, timestamp_begin=None, precision=None):
     file = Path(file)
 
     df = pd.read_hdf(file)
     # remove first level of columns multiindex:
     df.columns = df.columns.droplevel(0)
 
+    timestamps_index = _dlc_timestamps_index(file, timestamp_begin=timestamp_begin)
+    if timestamps_index is not None:
+        assert (
+            len(timestamps_index) == df.shape[0]
+        ), "Timestamps and DLC dataframes have different lengths!"
+
+        df.index = timestamps_index
+
+    return compact_dtypes(df, precision=precision)
+
+
+def _dlc_timestamps_index(file, timestamp_begin=None):
+    """Time index from the timestamps of the video tracked in a DLC file, if any."""
     # Check if there are timestamps for the video:
     candidate_timestamps_name = file.parent / (
         file.name.split("DLC")[0].replace("video", "timestamps") + ".csv"
@@ -119,16 +173,13 @@ def load_dlc_h5(file, timestamp_begin=None):
         inplace_time_cols_fix_and_resample(
             timestamps_df, timestamp_begin=timestamp_begin
         )
-        assert (
-            timestamps_df.shape[0] == df.shape[0]
-        ), "Timestamps and DLC dataframes have different lengths!"
-
-        df.index = timestamps_df.index
+        return timestamps_df.index
 
-    return df
+    return None
 
 
-def load_dlc_csv(file, timestamp_begin=None):
+@instrumented
+def load_dlc_csv(file, timestamp_begin=None, precision=None):
     file = Path(file)
 
     df = pd.read_csv(file)
@@ -151,7 +202,7 @@ def load_dlc_csv(file, timestamp_begin=None):
 
         df.index = timestamps_df.index
 
-    return df
+    return compact_dtypes(df, precision=precision)
 
 
 def _project_points_onto_line(points):
@@ -169,12 +220,10 @@ def _project_points_onto_line(points):
     # print(b, m)
 
     # Project each point onto the line
-    projected_points = np.zeros_like(points)
-    for i, (x, y) in enumerate(points):
-        x_proj = (x + m * y - m * b) / (1 + m**2)
-        y_proj = (m * x + (m**2) * y - (m**2) * b) / (1 + m**2) + b
-        projected_points[i] = [x_proj, y_proj]
-    # print(np.nansum(np.isnan(projected_points)))
+    x, y = points[:, 0], points[:, 1]
+    projected_points = np.empty_like(points)
+    projected_points[:, 0] = (x + m * y - m * b) / (1 + m**2)
+    projected_points[:, 1] = (m * x + (m**2) * y - (m**2) * b) / (1 + m**2) + b
 
     return projected_points
 
@@ -231,8 +280,10 @@ def _compute_mean_pupil_diameter(df):
     return pd.concat(all_pupil_diameters, axis=1).mean(axis=1)
 
 
-def _load_pupil_dlc_h5(file, timestamp_begin=None):
-    df = load_dlc_h5(file, timestamp_begin=timestamp_begin)
+@instrumented
+def _load_pupil_dlc_h5(file, timestamp_begin=None, precision=None):
+    # Features are computed in full precision, and downcast at the end:
+    df = load_dlc_h5(file, timestamp_begin=timestamp_begin, precision="full")
 
     df = _remove_low_likelyhood(df)
     avg_eyelid_abs = _compute_avg_bodypart_position(df, "eyelid")
@@ -253,11 +304,215 @@ def _load_pupil_dlc_h5(file, timestamp_begin=None):
     eye_df["main_ax_proj"] = projections[:, 0]
     eye_df["sec_ax_proj"] = projections[:, 1]
 
-    return eye_df
+    return compact_dtypes(eye_df, precision=precision)
+
+
+class _StreamingInterpolator:
+    """Linear interpolation of missing values over consecutive blocks of rows,
+    giving the same result of DataFrame.interpolate(method="linear") on the whole
+    table: leading NaNs are kept, and trailing ones take the last valid value.
+    Rows that need values from following blocks to be interpolated are held back
+    and returned when those blocks are pushed.
+    """
+
+    def __init__(self, n_columns):
+        self._pending = np.empty((0, n_columns))
+        # Last valid value before the pending rows, and its position relative to them:
+        self._last_values = np.full(n_columns, np.nan)
+        self._last_positions = np.full(n_columns, np.nan)
+
+    def push(self, values, final=False):
+        """Add a block of rows, returning all the rows that can be interpolated."""
+        buffer = np.concatenate([self._pending, values])
+        n_rows = buffer.shape[0]
+        positions = np.arange(n_rows)
+        interpolated = buffer.copy()
+        n_ready = n_rows
+
+        for col_n in range(buffer.shape[1]):
+            valid = ~np.isnan(buffer[:, col_n])
+            anchor_positions = positions[valid]
+            anchor_values = buffer[valid, col_n]
+            if not np.isnan(self._last_values[col_n]):
+                anchor_positions = np.r_[self._last_positions[col_n], anchor_positions]
+                anchor_values = np.r_[self._last_values[col_n], anchor_values]
+            if len(anchor_positions) == 0:
+                continue  # leading NaNs, that stay NaN
+
+            to_fill = ~valid & (positions > anchor_positions[0])
+            interpolated[to_fill, col_n] = np.interp(
+                positions[to_fill], anchor_positions, anchor_values
+            )
+            if not final and anchor_positions[-1] < n_rows - 1:
+                n_ready = min(n_ready, max(int(anchor_positions[-1]) + 1, 0))
+
+        # Move the last valid values to the new beginning of the pending rows:
+        for col_n in range(buffer.shape[1]):
+            ready_valid = np.flatnonzero(~np.isnan(buffer[:n_ready, col_n]))
+            if len(ready_valid) > 0:
+                self._last_values[col_n] = buffer[ready_valid[-1], col_n]
+                self._last_positions[col_n] = ready_valid[-1] - n_ready
+            else:
+                self._last_positions[col_n] -= n_ready
+        self._pending = buffer[n_ready:]
+
+        return interpolated[:n_ready]
+
+
+def _iter_dlc_blocks(file, block_rows):
+    """Read a DLC h5 file in blocks of rows."""
+    with pd.HDFStore(file, mode="r") as store:
+        key = store.keys()[0]
+        start = 0
+        while True:
+            block = store.select(key, start=start, stop=start + block_rows)
+            if len(block) > 0:
+                block.columns = block.columns.droplevel(0)
+                yield block
+            if len(block) < block_rows:
+                return
+            start += block_rows
+
+
+def _pupil_block_features(values, columns_idxs):
+    """Pupil features of a block of interpolated DLC values, as array of
+    (likelihood, diameter, x, y) columns."""
+    with warnings.catch_warnings():
+        # Rows with all points missing give NaN, as in DataFrame.mean:
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        avg_pupil_x = np.nanmean(values[:, columns_idxs["pupil_x"]], axis=1)
+        avg_pupil_y = np.nanmean(values[:, columns_idxs["pupil_y"]], axis=1)
+        avg_eyelid_x = np.nanmean(values[:, columns_idxs["eyelid_x"]], axis=1)
+        avg_eyelid_y = np.nanmean(values[:, columns_idxs["eyelid_y"]], axis=1)
+
+        pupil_x = values[:, columns_idxs["pupil_n_x"]]
+        pupil_y = values[:, columns_idxs["pupil_n_y"]]
+        diameters = np.sqrt(
+            (pupil_x[:, :3] - pupil_x[:, 1:4]) ** 2
+            + (pupil_y[:, :3] - pupil_y[:, 1:4]) ** 2
+        )
+        avg_pupil_diameter = np.nanmean(diameters, axis=1)
+
+    pupil_likelihood = values[:, columns_idxs["pupil_n_likelihood"]].sum(axis=1) / 6
+
+    return np.stack(
+        [
+            pupil_likelihood,
+            avg_pupil_diameter,
+            avg_pupil_x - avg_eyelid_x,
+            avg_pupil_y - avg_eyelid_y,
+        ],
+        axis=1,
+    )
+
+
+def _pupil_columns_idxs(columns):
+    bodyparts = columns.get_level_values(0)
+    coords = columns.get_level_values(1)
+
+    def _idxs(bodypart_check, coord):
+        return np.flatnonzero(
+            [bodypart_check(b) and c == coord for b, c in zip(bodyparts, coords)]
+        )
+
+    columns_idxs = dict()
+    for coord in ["x", "y"]:
+        columns_idxs[f"pupil_{coord}"] = _idxs(lambda b: "pupil" in b, coord)
+        columns_idxs[f"eyelid_{coord}"] = _idxs(lambda b: "eyelid" in b, coord)
+    for coord in ["x", "y", "likelihood"]:
+        columns_idxs[f"pupil_n_{coord}"] = [
+            columns.get_loc((f"pupil_{i + 1}", coord)) for i in range(6)
+        ]
+
+    return columns_idxs
+
+
+@instrumented
+def load_pupil_dlc_h5_streaming(
+    file,
+    timestamp_begin=None,
+    block_rows=DLC_BLOCK_ROWS,
+    likelihood_threshold=0.95,
+    precision=None,
+):
+    """Compute the pupil features of an eye DLC file reading it in blocks of rows,
+    with peak memory independent from the file size.
+
+    Gives the derived columns of _load_pupil_dlc_h5 (without the DLC points):
+    low likelihood points are interpolated, and the pupil position relative to the
+    eyelid is projected on its main axis of movement, fit on the whole session.
+
+    Parameters
+    ----------
+    file : str or Path
+        DLC h5 file of the eye camera.
+    timestamp_begin : datetime, optional
+        Beginning of the experiment, for the timestamps of the video.
+    block_rows : int, optional
+        Number of rows read at once, by default DLC_BLOCK_ROWS.
+    likelihood_threshold : float, optional
+        Points with lower likelihood are interpolated, by default 0.95.
+    precision : str, optional
+        Either "full" or "compact" (float32 features), by default the global
+        precision (see bonpy.precision).
+
+    Returns
+    -------
+    pd.DataFrame
+        Dataframe with the PUPIL_FEATURES columns.
+    """
+    file = Path(file)
+
+    interpolator, columns_idxs = None, None
+    features_blocks = []
+    for block in _iter_dlc_blocks(file, block_rows):
+        if interpolator is None:
+            interpolator = _StreamingInterpolator(block.shape[1])
+            columns_idxs = _pupil_columns_idxs(block.columns)
+            likelihood_cols = block.columns.get_level_values(1) == "likelihood"
+            label_cols = block.columns.get_level_values(0)
+
+        values = block.values.astype(float)
+        # Set x and y to NaN where likelihood is low, for all labels:
+        likelihoods = values[:, likelihood_cols]
+        low_likelihood = likelihoods < likelihood_threshold
+        for label_n, label in enumerate(label_cols[likelihood_cols]):
+            for coord in ["x", "y"]:
+                col_n = block.columns.get_loc((label, coord))
+                values[low_likelihood[:, label_n], col_n] = np.nan
+
+        features_blocks.append(
+            _pupil_block_features(interpolator.push(values), columns_idxs)
+        )
+
+    if interpolator is not None:
+        features_blocks.append(
+            _pupil_block_features(
+                interpolator.push(np.empty((0, len(label_cols))), final=True),
+                columns_idxs,
+            )
+        )
+    features = np.concatenate(features_blocks) if features_blocks else np.empty((0, 4))
+
+    # Projection on the main axis, fit on the features of the whole session:
+    projections = _project_points_onto_line(features[:, 2:4])
+    eye_df = pd.DataFrame(
+        np.concatenate([features, projections], axis=1), columns=PUPIL_FEATURES
+    )
+
+    timestamps_index = _dlc_timestamps_index(file, timestamp_begin=timestamp_begin)
+    if timestamps_index is not None:
+        assert len(timestamps_index) == len(
+            eye_df
+        ), "Timestamps and DLC dataframes have different lengths!"
+        eye_df.index = timestamps_index
+
+    return compact_dtypes(eye_df, precision=precision)
 
 
-def _load_top_dlc_h5(file, timestamp_begin=None):
-    df = load_dlc_h5(file, timestamp_begin=timestamp_begin)
+@instrumented
+def _load_top_dlc_h5(file, timestamp_begin=None, precision=None):
+    df = load_dlc_h5(file, timestamp_begin=timestamp_begin, precision=precision)
     df["centered_nose"] = (
         df[("nose", "x")] - (df[("nose-l", "x")] + df[("nose-r", "x")]) / 2
     )
@@ -0,0 +1,191 @@
+"""Derivative movies: cropped, binned and re-encoded copies of a movie, that are
+cheaper to read in repeated analyses of a region of interest.
+
+Derived movies are written in an intra-frame format (MJPG by default), where every
+frame is decoded independently and seeking is fast, next to a copy of the
+timestamps file named with the usual convention; they can be opened as the original
+movies, and MJPG ones are read with direct random access (see bonpy.mjpeg).
+"""
+
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from bonpy.data_dict import EXECUTORS_DICT
+from bonpy.mjpeg import open_movie
+
+DERIVED_FOLDER = "derived"  # default subfolder of the source for derived movies
+DEFAULT_CODEC = "MJPG"
+DEFAULT_FPS = 30  # used if the source does not report its frame rate
+DERIVE_CHUNK_FRAMES = 256
+
+
+def _to_slice(idx):
+    """Slice from None, a (start, stop) tuple or a slice."""
+    if idx is None:
+        return slice(None)
+    if isinstance(idx, slice):
+        return idx
+    return slice(*idx)
+
+
+def _bin_frames(frames, binning):
+    """Average frames over binning x binning pixel blocks, trimming the borders
+    that do not fill a whole block."""
+    if binning == 1:
+        return frames
+
+    n_frames, height, width = frames.shape[:3]
+    height, width = height // binning, width // binning
+    frames = frames[:, : height * binning, : width * binning]
+    blocks = frames.reshape(
+        (n_frames, height, binning, width, binning) + frames.shape[3:]
+    )
+    binned = blocks.mean(axis=(2, 4))
+    return np.round(binned).astype(frames.dtype)
+
+
+def _source_fps(source):
+    import cv2
+
+    cap = cv2.VideoCapture(str(source))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return fps if fps > 0 else DEFAULT_FPS
+
+
+def derive_movie(
+    source,
+    rows=None,
+    cols=None,
+    binning=1,
+    codec=DEFAULT_CODEC,
+    out=None,
+    grayscale=False,
+    chunk_frames=DERIVE_CHUNK_FRAMES,
+):
+    """Write a cropped, binned and re-encoded copy of a movie, decoding it once.
+
+    Parameters
+    ----------
+    source : str or Path
+        Movie to derive.
+    rows, cols : tuple or slice, optional
+        (start, stop) range of rows and columns to keep, by default all.
+    binning : int, optional
+        Size of the square pixel blocks averaged in the output, by default 1
+        (no binning). Borders not filling a whole block are trimmed.
+    codec : str, optional
+        FourCC of the output codec, by default "MJPG" (intra-frame, fast seeking).
+    out : str or Path, optional
+        Output movie, by default a file with the same name in a DERIVED_FOLDER
+        subfolder of the source folder (so that it does not add keys to the
+        source session).
+    grayscale : bool, optional
+        If True, convert color movies to grayscale, by default False.
+    chunk_frames : int, optional
+        Number of frames decoded at once, by default DERIVE_CHUNK_FRAMES.
+
+    Returns
+    -------
+    OpenCVMovieData
+        The derived movie (opened with open_movie), with a copy of the source
+        timestamps if any.
+    """
+    import cv2
+
+    source = Path(source)
+    out = Path(out) if out is not None else source.parent / DERIVED_FOLDER / source.name
+    assert out.resolve() != source.resolve(), "Cannot overwrite the source movie"
+    out.parent.mkdir(parents=True, exist_ok=True)
+
+    movie = open_movie(source, verbose=False)
+    rows, cols = _to_slice(rows), _to_slice(cols)
+    is_color = not (movie.is_bw or grayscale)
+
+    writer = None
+    try:
+        for chunk_start in range(0, movie.shape[0], chunk_frames):
+            # Frames are cropped as soon as they are decoded:
+            frames = movie[chunk_start : chunk_start + chunk_frames, rows, cols]
+            if not movie.is_bw and grayscale:
+                frames = np.stack(
+                    [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in frames]
+                )
+            frames = _bin_frames(frames, binning)
+
+            if writer is None:
+                writer = cv2.VideoWriter(
+                    str(out),
+                    cv2.VideoWriter_fourcc(*codec),
+                    _source_fps(source),
+                    (frames.shape[2], frames.shape[1]),
+                    is_color,
+                )
+                assert writer.isOpened(), f"Could not open a {codec} writer for {out}"
+            for frame in frames:
+                writer.write(np.ascontiguousarray(frame))
+    finally:
+        if writer is not None:
+            writer.release()
+        movie.close()
+
+    derived = open_movie(out, timestamp_begin=movie.timestamp_begin)
+    if movie.has_timestamps:
+        shutil.copyfile(movie.timestamp_filename, derived.timestamp_filename)
+
+    return derived
+
+
+def _derive_movie_file(source, out, kwargs):
+    """Derive a movie returning its filename. Module-level to be usable in a
+    process pool."""
+    return derive_movie(source, out=out, **kwargs).source_filename
+
+
+def derive_movies(sources, out_folder=None, workers=None, executor="process", **kwargs):
+    """Derive several movies in parallel, see derive_movie.
+
+    Parameters
+    ----------
+    sources : list of str or Path
+        Movies to derive.
+    out_folder : str or Path, optional
+        Folder of the derived movies, by default a DERIVED_FOLDER subfolder of
+        each source folder.
+    workers : int, optional
+        Number of parallel workers, by default the number of CPUs.
+    executor : str, optional
+        Either "process" or "thread", by default "process".
+    **kwargs
+        Other arguments of derive_movie (rows, cols, binning, codec, grayscale).
+
+    Returns
+    -------
+    derived : dict
+        Derived movie filename for each source.
+    failures : dict
+        Error message for each source that could not be derived.
+    """
+    sources = [Path(source) for source in sources]
+    outs = [
+        Path(out_folder) / source.name if out_folder is not None else None
+        for source in sources
+    ]
+    workers = workers if workers is not None else os.cpu_count()
+
+    derived, failures = dict(), dict()
+    with EXECUTORS_DICT[executor](max_workers=workers) as pool:
+        futures = [
+            pool.submit(_derive_movie_file, source, out, kwargs)
+            for source, out in zip(sources, outs)
+        ]
+        for source, future in zip(sources, futures):
+            try:
+                derived[source] = future.result()
+            except Exception as e:
+                failures[source] = f"{type(e).__name__}: {e}"
+
+    return derived, failures
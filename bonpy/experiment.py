@@ -1,3 +1,4 @@
+import asyncio
 import os
 from datetime import datetime
 from functools import cached_property
@@ -6,19 +7,39 @@ from pathlib import Path
 import numpy as np
 import pandas as pd
 
+from bonpy.async_utils import InFlightCalls
 from bonpy.custom_dc import ExperimentMetadata
-from bonpy.data_dict import LazyDataDict
+from bonpy.data_dict import LazyDataDict, preload
+from bonpy.pack import PackedDataDict, read_manifest, write_pack
+from bonpy.time_utils import match_events_to_intervals
+
+# Default window (before trial start, after trial end) to look for laser events:
+LASER_PAD_WND_S = (2, 0)
 
 
 class Experiment:
-    def __init__(self, root_path, session_id, timestamp, animal_id, paradigm_id):
+    def __init__(
+        self,
+        root_path,
+        session_id,
+        timestamp,
+        animal_id,
+        paradigm_id,
+        data_dict=None,
+        precision=None,
+    ):
         self.root_path = root_path
         # self.session_id = session_id
 
         self.files_dict = dict()
         # self._discover_files()
 
-        self.data_dict = LazyDataDict(self.root_path, timestamp_begin=timestamp)
+        if data_dict is None:
+            data_dict = LazyDataDict(
+                self.root_path, timestamp_begin=timestamp, precision=precision
+            )
+        self.data_dict = data_dict
+        self._in_flight = InFlightCalls()
 
         self.metadata = ExperimentMetadata(
             timestamp=timestamp,
@@ -35,36 +56,72 @@ class Experiment:
                 total_size += os.path.getsize(file)
         return total_size / 1e9
 
-    # TODO make this configurable
+    def preload(self, keys=None, workers=None, executor="thread"):
+        """Load eagerly and in parallel the experiment data, see
+        LazyDataDict.preload."""
+        return self.data_dict.preload(keys=keys, workers=workers, executor=executor)
+
     @cached_property
     def trials_df(self):
-        # Window from trial start to look for laser happening:
-        LASER_PAD_WND_S = 2
-        # Merge cube and laser logs:
-        laser_df = self.data_dict["laser-log_laser"].copy()
-        cube_df = self.data_dict["cube-positions_cube"].copy()
-
-        trials_df = cube_df
-        stim_ranges = trials_df.index + trials_df["hold_time"]
-        has_laser = [
-            len(laser_df.loc[idx - LASER_PAD_WND_S : val])
-            for idx, val in stim_ranges.items()
-        ]
-        trials_df["laser"] = np.array(has_laser, dtype=bool)
-
-        to_add_laser = ["frequency", "pulse_width", "laser_off_t", "laser_on_t"]
-        for k in to_add_laser:
+        if isinstance(self.data_dict, PackedDataDict) and self.data_dict.has_trials:
+            return self.data_dict.load_trials()
+        return self.compute_trials_df()
+
+    async def atrials_df(self, executor=None):
+        """Awaitable counterpart of trials_df: logs are loaded with data_dict.aget in
+        the executor, and the table is built in a thread of the default executor.
+        Concurrent requests share a single computation."""
+        if "trials_df" not in self.__dict__:
+            if isinstance(self.data_dict, LazyDataDict):
+                await asyncio.gather(
+                    self.data_dict.aget("laser-log_laser", executor=executor),
+                    self.data_dict.aget("cube-positions_cube", executor=executor),
+                )
+            await self._in_flight.run("trials_df", getattr, self, "trials_df")
+
+        return self.trials_df
+
+    def compute_trials_df(self, laser_pad_s=LASER_PAD_WND_S):
+        """Merge cube and laser logs in a dataframe with one row per trial.
+
+        Parameters
+        ----------
+        laser_pad_s : tuple, optional
+            Padding (before trial start, after trial end) in seconds of the window
+            where laser events are looked for, by default LASER_PAD_WND_S.
+
+        Returns
+        -------
+        pd.DataFrame
+            Cube log with laser information for each trial.
+        """
+        laser_df = self.data_dict["laser-log_laser"]
+        trials_df = self.data_dict["cube-positions_cube"].copy()
+
+        trial_starts = trials_df.index.values
+        trial_ends = trial_starts + trials_df["hold_time"].values
+        laser_idxs, _ = match_events_to_intervals(
+            laser_df.index.values,
+            trial_starts - laser_pad_s[0],
+            trial_ends + laser_pad_s[1],
+        )
+        # Each laser event is assigned to at most one trial, the first one with
+        # the event in its window:
+        has_laser = laser_idxs >= 0
+        laser_idxs = laser_idxs[has_laser]
+        trials_df["laser"] = has_laser
+
+        laser_on_t = laser_df.index.values[laser_idxs]
+        stim_duration = laser_df["stim_duration"].values[laser_idxs].astype(float)
+        laser_values = dict(
+            frequency=laser_df["frequency"].values[laser_idxs].astype(float),
+            pulse_width=laser_df["pulse_width"].values[laser_idxs].astype(float),
+            laser_off_t=laser_on_t + stim_duration / 1000,
+            laser_on_t=laser_on_t,
+        )
+        for k, values in laser_values.items():
             trials_df[k] = np.nan
-
-        for laser_event_n, laser_idx in enumerate(laser_df.index):
-            trial_idx = trials_df.loc[trials_df["laser"], :].iloc[laser_event_n].name
-            for k in "frequency", "pulse_width":
-                trials_df.loc[trial_idx, k] = float(laser_df.loc[laser_idx, k])
-
-            trials_df.loc[trial_idx, "laser_on_t"] = laser_idx
-            trials_df.loc[trial_idx, "laser_off_t"] = (
-                laser_idx + int(laser_df.loc[laser_idx, "stim_duration"]) / 1000
-            )
+            trials_df.loc[has_laser, k] = values
 
         return trials_df
 
@@ -85,6 +142,36 @@ class Experiment:
             timestamp=datetime.strptime(date + time, "%Y%m%d%H%M%S"),
         )
 
+    def pack(self, path, keys=None, **kwargs):
+        """Write all parsed tabular streams and the trials table in a single
+        compressed HDF5 file, see bonpy.pack.write_pack.
+
+        Returns
+        -------
+        dict
+            The manifest of the pack.
+        """
+        return write_pack(self, path, keys=keys, **kwargs)
+
+    @classmethod
+    def from_pack(cls, path):
+        """Open an experiment from a pack written with Experiment.pack. Streams are
+        read lazily from the pack, without parsing the original files."""
+        metadata = read_manifest(path)["metadata"]
+        timestamp = datetime.fromisoformat(metadata["timestamp"])
+        data_dict = PackedDataDict(
+            path, timestamp_begin=timestamp, mouse_id=metadata["animal_id"]
+        )
+
+        return cls(
+            root_path=Path(data_dict.manifest["root_path"]),
+            animal_id=metadata["animal_id"],
+            paradigm_id=metadata["paradigm_id"],
+            session_id=metadata["session_id"],
+            timestamp=timestamp,
+            data_dict=data_dict,
+        )
+
     def __repr__(self) -> str:
         return f"Experiment {self.metadata.paradigm_id} on animal: {self.metadata.animal_id} ({self.metadata.timestamp})"
 
@@ -125,6 +212,23 @@ class Experiment:
     #         setattr(self, key, load_func(filename))
 
 
+def preload_experiments(experiments, keys=None, workers=None, executor="thread"):
+    """Load in parallel the data of many experiments at once, scheduling all the
+    loading tasks in the same pool. See bonpy.data_dict.preload for the arguments.
+
+    Returns
+    -------
+    list of dict
+        For each experiment, the loading time in seconds for each loaded key.
+    """
+    return preload(
+        [exp.data_dict for exp in experiments],
+        keys=keys,
+        workers=workers,
+        executor=executor,
+    )
+
+
 if __name__ == "__main__":
     path = "/Users/vigji/Desktop/eye-response/M13/20231115/145913"
 
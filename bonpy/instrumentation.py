@@ -0,0 +1,234 @@
+"""Opt-in instrumentation of data loading and movie reading.
+
+When disabled (the default), instrumented functions only pay for a global flag check.
+When enabled, each instrumented call is recorded with its wall time, bytes read,
+rows parsed, frames decoded, seeks performed and (optionally) peak memory allocation.
+
+Example:
+    with instrument() as stats:
+        exp.data_dict["eye-cam_video_eye"]
+    print(stats.summary())
+    stats.to_json("load_report.json")
+
+Calls made in other processes (e.g. preloading with a process executor) are not
+recorded.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, fields
+
+import pandas as pd
+
+_ENABLED = False
+_TRACE_MEMORY = False
+_LOCAL = threading.local()  # stack of the active records of each thread
+
+
+@dataclass
+class CallRecord:
+    name: str
+    key: str = None
+    depth: int = 0
+    wall_time_s: float = 0.0
+    bytes_read: int = None
+    rows: int = None
+    frames_decoded: int = None
+    seeks: int = None
+    peak_alloc_bytes: int = None
+
+
+class LoadStats:
+    """Collection of the records of instrumented calls.
+
+    Methods:
+        to_dataframe(): All records, one row per call.
+        summary(): Number of calls and totals for each instrumented function.
+        to_json(filename): Save (or return as string) all records as JSON.
+    """
+
+    def __init__(self) -> None:
+        self.records = []
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.records.append(record)
+
+    def clear(self):
+        with self._lock:
+            self.records = []
+
+    def __len__(self):
+        return len(self.records)
+
+    def __repr__(self) -> str:
+        return f"LoadStats with {len(self)} records"
+
+    def to_dataframe(self):
+        return pd.DataFrame(
+            [asdict(record) for record in self.records],
+            columns=[field.name for field in fields(CallRecord)],
+        )
+
+    def summary(self):
+        records_df = self.to_dataframe()
+        summary_df = records_df.groupby("name").agg(
+            n_calls=("wall_time_s", "size"),
+            wall_time_s=("wall_time_s", "sum"),
+            bytes_read=("bytes_read", "sum"),
+            rows=("rows", "sum"),
+            frames_decoded=("frames_decoded", "sum"),
+            seeks=("seeks", "sum"),
+            peak_alloc_bytes=("peak_alloc_bytes", "max"),
+        )
+        return summary_df.sort_values("wall_time_s", ascending=False)
+
+    def to_json(self, filename=None):
+        report = json.dumps([asdict(record) for record in self.records], indent=2)
+        if filename is not None:
+            with open(filename, "w") as f:
+                f.write(report)
+        return report
+
+
+STATS = LoadStats()  # collector used while instrumentation is enabled
+
+
+def is_enabled():
+    return _ENABLED
+
+
+def enable(stats=None, trace_memory=False):
+    """Enable instrumentation, recording calls in stats (by default the global STATS).
+    If trace_memory is True, peak allocations are measured with tracemalloc,
+    which slows down execution."""
+    global _ENABLED, _TRACE_MEMORY, STATS
+    if stats is not None:
+        STATS = stats
+    _ENABLED = True
+    _TRACE_MEMORY = trace_memory
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    global _ENABLED, _TRACE_MEMORY
+    if _TRACE_MEMORY and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _ENABLED = False
+    _TRACE_MEMORY = False
+
+
+@contextmanager
+def instrument(trace_memory=False):
+    """Context manager enabling instrumentation and yielding a new LoadStats."""
+    global STATS
+    previous_stats, previous_enabled = STATS, _ENABLED
+    stats = LoadStats()
+    enable(stats, trace_memory=trace_memory)
+    try:
+        yield stats
+    finally:
+        disable()
+        STATS = previous_stats
+        if previous_enabled:
+            enable(previous_stats)
+
+
+def _active_records():
+    if not hasattr(_LOCAL, "records"):
+        _LOCAL.records = []
+    return _LOCAL.records
+
+
+@contextmanager
+def _recording(name, key=None):
+    active_records = _active_records()
+    record = CallRecord(name=name, key=key, depth=len(active_records))
+
+    if _TRACE_MEMORY:
+        current, peak = tracemalloc.get_traced_memory()
+        if active_records:
+            # Keep track of the peak of the enclosing call before resetting:
+            parent = active_records[-1]
+            parent._abs_peak = max(parent._abs_peak, peak)
+        tracemalloc.reset_peak()
+        record._start_memory = record._abs_peak = current
+
+    active_records.append(record)
+    t_start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.wall_time_s = time.perf_counter() - t_start
+        active_records.pop()
+
+        if _TRACE_MEMORY:
+            record._abs_peak = max(record._abs_peak, tracemalloc.get_traced_memory()[1])
+            record.peak_alloc_bytes = record._abs_peak - record._start_memory
+            if active_records:
+                parent = active_records[-1]
+                parent._abs_peak = max(parent._abs_peak, record._abs_peak)
+
+        STATS.add(record)
+
+
+def recording(name, key=None):
+    """Context manager recording a block as an instrumented call; does nothing
+    if instrumentation is disabled."""
+    if not _ENABLED:
+        return nullcontext()
+    return _recording(name, key=key)
+
+
+def count(**counters):
+    """Add counters (e.g. frames_decoded, seeks) to the innermost active record."""
+    if not _ENABLED:
+        return
+    active_records = _active_records()
+    if active_records:
+        record = active_records[-1]
+        for counter, value in counters.items():
+            setattr(record, counter, (getattr(record, counter) or 0) + value)
+
+
+def _n_rows(data):
+    """Rows of a DataFrame or Series, None for any other data (including None)."""
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        return len(data)
+    return None
+
+
+def instrumented(func):
+    """Decorator recording calls of a function when instrumentation is enabled.
+
+    If the first argument is an existing file, its size is recorded as bytes read;
+    if the function returns a DataFrame (or modifies one passed as first argument),
+    its length is recorded as rows parsed.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _ENABLED:
+            return func(*args, **kwargs)
+
+        with _recording(func.__qualname__) as record:
+            first_arg = args[0] if args else None
+            if isinstance(first_arg, (str, os.PathLike)):
+                try:
+                    if os.path.isfile(first_arg):
+                        record.bytes_read = os.path.getsize(first_arg)
+                except (OSError, ValueError):
+                    pass  # removed meanwhile, or not a valid path
+            result = func(*args, **kwargs)
+            record.rows = _n_rows(result if result is not None else first_arg)
+
+        return result
+
+    return wrapper
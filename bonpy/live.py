@@ -0,0 +1,490 @@
+"""Live monitoring of Bonsai logs that are still being written during acquisition.
+
+A LogFollower remembers how far a csv log has been read, and on each poll parses
+only the newly appended complete lines, with the same semantics of the bonpy
+loaders (time origin, ball offset and smoothing, laser message parsing).
+
+A LiveMovieData gives access to the frames of a movie still being recorded,
+counting them from the growing timestamps csv.
+
+Example:
+    follower = tail(ball_log_file, loader="ball_csv", smooth_wnd=200)
+    movie = LiveMovieData(eye_movie_file)
+    while acquiring:
+        new_rows_df = follower.poll()
+        times, frames = movie.latest(10)
+        ...
+    ball_df = follower.data
+"""
+
+import io
+import threading
+from collections import deque
+from dataclasses import replace
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from bonpy.data_parsers import (
+    _ball_data_cols,
+    _center_ball_counts,
+    _load_ball_log_csv,
+    _load_csv,
+    _load_laser_log_csv,
+    _load_laser_log_v01_csv,
+    _parse_laser_messages,
+)
+from bonpy.instrumentation import count, instrumented
+from bonpy.moviedata import OpenCVMovieData
+from bonpy.precision import compact_dtypes, float_dtype, get_precision
+from bonpy.time_utils import (
+    _is_timestamp_column,
+    inplace_time_cols_fix_and_resample,
+    time_origin,
+)
+
+INITIAL_BUFFER_ROWS = 4096
+LIVE_MAX_LATEST = 64  # number of most recent frames kept by LiveMovieData
+LASER_COLUMNS = ["LaserSerialMex", "Value"]  # laser message column in v00 / v01 logs
+
+# Live parsing is available for loaders that do not need the whole file:
+LIVE_LOADERS = dict(
+    csv=_load_csv,
+    laser_csv=_load_laser_log_csv,
+    ball_csv=_load_ball_log_csv,
+)
+_LOADER_CATEGORIES = {
+    _load_csv: "csv",
+    _load_laser_log_csv: "laser_csv",
+    _load_laser_log_v01_csv: "laser_csv",
+    _load_ball_log_csv: "ball_csv",
+}
+
+
+def _missing_value(dtype):
+    """Dtype able to represent missing values, and the missing value, for columns
+    of the given dtype (integers and booleans are upcast to float, as in pandas)."""
+    if dtype.kind in "iub":
+        dtype = np.result_type(dtype, np.float64)
+    if dtype.kind in "fc":
+        return dtype, np.nan
+    if dtype.kind in "mM":
+        return dtype, dtype.type("NaT")
+    return np.dtype(object), None
+
+
+class _GrowableBuffer:
+    """Column arrays with preallocated capacity, doubled when full.
+
+    Columns are upcast when new rows do not fit their dtype (e.g. floats or NaN in
+    an integer column), and rows missing a column get missing values.
+    """
+
+    def __init__(self, capacity=INITIAL_BUFFER_ROWS):
+        self.capacity = capacity
+        self.n_rows = 0
+        self.index = None
+        self.columns = dict()
+
+    def _resized(self, values, capacity):
+        new_values = np.empty(capacity, dtype=values.dtype)
+        if values.dtype.kind == "f":
+            new_values[:] = np.nan
+        n_copy = min(self.n_rows, len(values))
+        new_values[:n_copy] = values[:n_copy]
+        return new_values
+
+    def _upcast(self, values, dtype):
+        return values if dtype == values.dtype else values.astype(dtype)
+
+    def append(self, df):
+        if self.index is None:
+            self.index = np.empty(self.capacity, dtype=df.index.dtype)
+
+        n_new = len(df)
+        if self.n_rows + n_new > self.capacity:
+            self.capacity = max(2 * self.capacity, self.n_rows + n_new)
+            self.index = self._resized(self.index, self.capacity)
+            self.columns = {
+                col: self._resized(values, self.capacity)
+                for col, values in self.columns.items()
+            }
+
+        rows = slice(self.n_rows, self.n_rows + n_new)
+        index_values = df.index.to_numpy()
+        self.index = self._upcast(self.index, np.result_type(self.index, index_values))
+        self.index[rows] = index_values
+
+        for col in df.columns:
+            values = df[col].to_numpy()
+            if col not in self.columns:
+                self.columns[col] = np.empty(self.capacity, dtype=values.dtype)
+                if self.n_rows > 0:
+                    # Columns appearing in later rows are missing in the previous ones:
+                    dtype, missing = _missing_value(values.dtype)
+                    self.columns[col] = self.columns[col].astype(dtype)
+                    self.columns[col][: self.n_rows] = missing
+            else:
+                self.columns[col] = self._upcast(
+                    self.columns[col], np.result_type(self.columns[col], values)
+                )
+            self.columns[col][rows] = values
+
+        for col in [col for col in self.columns if col not in df.columns]:
+            dtype, missing = _missing_value(self.columns[col].dtype)
+            self.columns[col] = self._upcast(self.columns[col], dtype)
+            self.columns[col][rows] = missing
+
+        self.n_rows += n_new
+
+    def to_dataframe(self, index_name="time"):
+        if self.index is None:
+            return pd.DataFrame()
+        return pd.DataFrame(
+            {col: values[: self.n_rows] for col, values in self.columns.items()},
+            index=pd.Index(self.index[: self.n_rows], name=index_name),
+            columns=list(self.columns.keys()),
+        )
+
+
+class LogFollower:
+    """Incremental parser of a growing Bonsai csv log, see tail().
+
+    Attributes:
+        offset (int): Byte offset up to which the file has been parsed.
+        time_offset (pd.Timestamp): Time origin of the log, fixed at the first poll.
+        n_rows (int): Number of rows parsed so far.
+        precision (str): Precision of the parsed rows, resolved at creation so
+            that all polls use the same dtypes.
+    """
+
+    def __init__(
+        self,
+        path,
+        loader="csv",
+        timestamp_begin=None,
+        smooth_wnd=None,
+        initial_capacity=INITIAL_BUFFER_ROWS,
+        precision=None,
+    ):
+        self.path = Path(path)
+        self.category = _LOADER_CATEGORIES.get(loader, loader)
+        if self.category not in LIVE_LOADERS:
+            raise ValueError(
+                f"Live parsing is not supported for loader {loader}; "
+                f"supported loaders: {list(LIVE_LOADERS.keys())}."
+            )
+        self.timestamp_begin = timestamp_begin
+        self.smooth_wnd = smooth_wnd if self.category == "ball_csv" else None
+        self.precision = get_precision(precision)
+
+        self.offset = 0
+        self.time_offset = None
+        self._header = None
+        self._buffer = _GrowableBuffer(initial_capacity)
+        self._raw = _GrowableBuffer(initial_capacity)  # ball values before smoothing
+        self._data_cols = None
+        self._n_smoothed = 0  # rows with final smoothed values
+
+    @property
+    def n_rows(self):
+        return self._buffer.n_rows
+
+    @property
+    def data(self):
+        """All the rows parsed so far, as from the loader on the whole file.
+        With smoothing, the last (smooth_wnd - 1) // 2 rows are NaN until following
+        rows are logged."""
+        return self._buffer.to_dataframe()
+
+    def _read_new_lines(self):
+        """Read the complete lines appended since the last poll."""
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read()
+
+        # Leave incomplete lines, still being written, for the next poll:
+        chunk_end = chunk.rfind(b"\n") + 1
+        self.offset += chunk_end
+        chunk = chunk[:chunk_end]
+
+        if self._header is None and chunk_end > 0:
+            header_end = chunk.find(b"\n") + 1
+            self._header = pd.read_csv(io.BytesIO(chunk[:header_end])).columns
+            chunk = chunk[header_end:]
+
+        if len(chunk) == 0:
+            return None
+        return pd.read_csv(io.BytesIO(chunk), header=None, names=self._header)
+
+    def _fix_times(self, df):
+        if self.time_offset is None:
+            is_timestamp = df.head().apply(_is_timestamp_column)
+            if is_timestamp.any():
+                first_timestamps = pd.to_datetime(df[is_timestamp.idxmax()].iloc[:1])
+                self.time_offset = time_origin(first_timestamps, self.timestamp_begin)
+
+        inplace_time_cols_fix_and_resample(
+            df, time_offset=self.time_offset, precision=self.precision
+        )
+
+    def _parse(self, df):
+        """Parse new rows with the semantics of the loader."""
+        self._fix_times(df)
+        compact_dtypes(df, precision=self.precision)
+
+        if self.category == "laser_csv":
+            laser_col = [c for c in LASER_COLUMNS if c in df.columns][0]
+            _parse_laser_messages(df, laser_col)
+
+        elif self.category == "ball_csv":
+            if self._data_cols is None:
+                self._data_cols = _ball_data_cols(df)
+            _center_ball_counts(df, self._data_cols, precision=self.precision)
+            if self.smooth_wnd is not None:
+                df[self._data_cols] = df[self._data_cols].astype(
+                    float_dtype(np.float64, precision=self.precision)
+                )
+
+        return df
+
+    def _smooth_new_rows(self):
+        """Fill smoothed ball values for rows whose centered window is complete,
+        using the raw values of previous rows as context."""
+        n_rows = self.n_rows
+        context_start = max(self._n_smoothed - self.smooth_wnd, 0)
+        # Centered windows extend (smooth_wnd - 1) // 2 rows after each row:
+        n_final = max(n_rows - (self.smooth_wnd - 1) // 2, self._n_smoothed)
+
+        for c in self._data_cols:
+            raw = self._raw.columns[c][context_start:n_rows]
+            smoothed = (
+                pd.Series(raw).rolling(self.smooth_wnd, center=True).median().values
+            )
+            self._buffer.columns[c][self._n_smoothed : n_final] = smoothed[
+                self._n_smoothed - context_start : n_final - context_start
+            ]
+        self._n_smoothed = n_final
+
+    def poll(self):
+        """Parse the lines appended since the last poll.
+
+        Returns:
+            pd.DataFrame: The new rows (before smoothing, if smooth_wnd is set).
+        """
+        new_df = self._read_new_lines()
+        if new_df is None or len(new_df) == 0:
+            return self._buffer.to_dataframe().iloc[:0]
+
+        new_df = self._parse(new_df)
+
+        if self.smooth_wnd is not None:
+            # Keep raw values for the windows of later rows, and buffer NaNs
+            # until the smoothing window of each row is complete:
+            self._raw.append(new_df[self._data_cols])
+            buffer_df = new_df.copy()
+            buffer_df[self._data_cols] = np.nan
+            compact_dtypes(buffer_df, precision=self.precision)
+            self._buffer.append(buffer_df)
+            self._smooth_new_rows()
+        else:
+            self._buffer.append(new_df)
+
+        return new_df
+
+
+def tail(path, loader="csv", timestamp_begin=None, smooth_wnd=None, precision=None):
+    """Follow a Bonsai csv log that is still being written.
+
+    Parameters
+    ----------
+    path : str or Path
+        Log file.
+    loader : str or function, optional
+        Loader category ("csv", "laser_csv" or "ball_csv") or loader function
+        whose semantics are reproduced, by default "csv".
+    timestamp_begin : datetime, optional
+        Beginning of the experiment, used as time origin; by default the first
+        timestamp of the log.
+    smooth_wnd : int, optional
+        For ball logs, window of the centered rolling median, by default None.
+    precision : str, optional
+        Either "full" or "compact", by default the global precision (see
+        bonpy.precision).
+
+    Returns
+    -------
+    LogFollower
+        Follower, parsing new lines at each call of its poll() method.
+    """
+    return LogFollower(
+        path,
+        loader=loader,
+        timestamp_begin=timestamp_begin,
+        smooth_wnd=smooth_wnd,
+        precision=precision,
+    )
+
+
+class LiveMovieData(OpenCVMovieData):
+    """OpenCVMovieData for movies that are still being recorded.
+
+    The number of frames comes from the growing timestamps csv, followed with a
+    LogFollower, and it is updated by refresh(). latest(n) decodes sequentially
+    only the frames recorded since its last call, keeping the most recent ones.
+
+    Args:
+        source_filename (str): Path to the movie file.
+        max_latest (int): Maximum number of recent frames that latest() can return.
+    """
+
+    def __init__(
+        self,
+        source_filename,
+        timestamp_begin=None,
+        verbose=False,
+        max_captures=None,
+        max_latest=LIVE_MAX_LATEST,
+    ) -> None:
+        super().__init__(
+            source_filename,
+            timestamp_begin=timestamp_begin,
+            verbose=verbose,
+            max_captures=max_captures,
+        )
+        self._timestamps_follower = LogFollower(
+            self.timestamp_filename, "csv", timestamp_begin=timestamp_begin
+        )
+        self._n_frames = 0
+        self._live_lock = threading.RLock()
+        self._live_capture = None
+        self._live_next_idx = 0
+        self._recent_frames = deque(maxlen=max_latest)  # (frame index, frame)
+
+    @property
+    def timestamps(self):
+        return self._timestamps_follower.data
+
+    @property
+    def n_frames(self):
+        return self._n_frames
+
+    def refresh(self):
+        """Update the number of frames with the new lines of the timestamps file.
+
+        Returns:
+            int: Number of new frames.
+        """
+        with self._live_lock:
+            if self.has_timestamps:
+                self._timestamps_follower.poll()
+
+            n_new_frames = self._timestamps_follower.n_rows - self._n_frames
+            if n_new_frames > 0:
+                self._n_frames += n_new_frames
+                if self._metadata is not None:
+                    self._metadata = replace(self._metadata, n_frames=self._n_frames)
+                # Captures opened on the shorter file are reopened by next reads:
+                self._release_idle_captures()
+
+        return n_new_frames
+
+    def _read_metadata(self):
+        self.refresh()
+        if self._n_frames == 0:
+            raise ValueError(f"No frames recorded yet in {self.source_filename}.")
+
+        return replace(super()._read_metadata(), n_frames=self._n_frames)
+
+    def _decode_new_frames(self, is_bw):
+        import cv2
+
+        # Skip frames that would not be kept anyway:
+        first_needed = max(
+            self._n_frames - self._recent_frames.maxlen, self._live_next_idx
+        )
+        if self._live_capture is None:
+            self._live_capture = cv2.VideoCapture(str(self.source_filename))
+            capture_idx = 0
+        else:
+            capture_idx = self._live_next_idx
+
+        n_seeks, n_decoded = 0, 0
+        if first_needed != capture_idx:
+            self._live_capture.set(cv2.CAP_PROP_POS_FRAMES, first_needed)
+            n_seeks += 1
+        self._live_next_idx = first_needed
+
+        while self._live_next_idx < self._n_frames:
+            ret, frame = self._live_capture.read()
+            if not ret:
+                # Frame not written yet: a capture that reached the end of the
+                # growing file may not see new frames, so it is reopened and
+                # positioned again at the next call:
+                self._live_capture.release()
+                self._live_capture = None
+                break
+            if is_bw:
+                frame = frame[:, :, 0]
+            self._recent_frames.append((self._live_next_idx, frame))
+            self._live_next_idx += 1
+            n_decoded += 1
+
+        count(frames_decoded=n_decoded, seeks=n_seeks)
+
+    @instrumented
+    def latest(self, n=1):
+        """Most recent frames, decoding only the ones recorded since the last call.
+
+        Args:
+            n (int): Number of frames, between 1 and max_latest.
+
+        Returns:
+            tuple: (array of frame times, array of frames), with less than n frames
+                (or empty arrays) if they are not available yet.
+        """
+        if not 1 <= n <= self._recent_frames.maxlen:
+            raise ValueError(
+                f"n must be between 1 and {self._recent_frames.maxlen}, the number "
+                "of latest frames kept."
+            )
+
+        self.refresh()
+        if self._n_frames == 0:
+            return np.array([]), np.array([])
+        is_bw = self.is_bw  # read metadata before locking, as it refreshes too
+
+        with self._live_lock:
+            self._decode_new_frames(is_bw)
+            recent_frames = list(self._recent_frames)[-n:]
+
+        if len(recent_frames) == 0:
+            # Timestamps are logged, but frames are not written yet:
+            return np.array([]), np.empty((0,) + self.shape[1:], dtype=self.dtype)
+
+        frame_idxs = [frame_idx for frame_idx, _ in recent_frames]
+        frames = np.stack([frame for _, frame in recent_frames])
+        return self.timestamps.index.values[frame_idxs], frames
+
+    def close(self):
+        super().close()
+        with self._live_lock:
+            if self._live_capture is not None:
+                self._live_capture.release()
+                self._live_capture = None
+                self._live_next_idx = 0
+                self._recent_frames.clear()
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        for attr in ["_live_lock", "_live_capture"]:
+            del state[attr]
+        state["_live_next_idx"] = 0
+        state["_recent_frames"] = deque(maxlen=self._recent_frames.maxlen)
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self._live_lock = threading.RLock()
+        self._live_capture = None
@@ -0,0 +1,403 @@
+"""Direct random access to MJPEG AVI movies.
+
+In MJPEG movies every frame is an independent JPEG image, stored as a chunk of the
+AVI container. The container index (the OpenDML indx/ix## chunks, or the legacy
+idx1 chunk) is parsed once, giving the exact number of frames and the byte range
+of each of them; frames are then read from a memory map of the file and decoded
+with cv2.imdecode, without seeking a capture. Reads cost the same in any order, and
+the frames of a read are decoded in parallel threads.
+
+Use open_movie to open any movie with the fastest available backend: movies with
+inter-frame codecs (e.g. MPEG-4) are opened with OpenCVMovieData.
+"""
+
+import mmap
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from bonpy.instrumentation import count, instrumented
+from bonpy.moviedata import MovieMetadata, OpenCVMovieData
+
+MJPEG_FOURCCS = ("MJPG", "AVRN", "LJPG", "JPGL", "DMB1")
+
+AVI_IDX1_DTYPE = np.dtype(
+    [("ckid", "S4"), ("flags", "<u4"), ("offset", "<u4"), ("size", "<u4")]
+)
+# OpenDML indexes: a super index (indx, in the stream header) lists the standard
+# indexes (ix##, in the movie data), each listing the frames of a part of the movie:
+AVI_SUPER_INDEX_DTYPE = np.dtype(
+    [("offset", "<u8"), ("size", "<u4"), ("duration", "<u4")]
+)
+AVI_STD_INDEX_DTYPE = np.dtype([("offset", "<u4"), ("size", "<u4")])
+AVI_INDEX_HEADER_SIZE = 24
+AVI_INDEX_OF_INDEXES = 0x00
+AVI_INDEX_OF_CHUNKS = 0x01
+AVI_SIZE_MASK = 0x7FFFFFFF  # the highest bit of standard index sizes flags delta frames
+
+
+@dataclass
+class AviIndex:
+    """Location of the frames of the first video stream of an AVI file.
+
+    Attributes
+    ----------
+    codec : str
+        FourCC of the video codec.
+    offsets : np.ndarray
+        Position in the file of the data of each frame.
+    sizes : np.ndarray
+        Size in bytes of the data of each frame.
+    """
+
+    codec: str
+    offsets: np.ndarray
+    sizes: np.ndarray
+
+    @property
+    def n_frames(self):
+        return len(self.offsets)
+
+    @property
+    def is_mjpeg(self):
+        return self.codec.upper() in MJPEG_FOURCCS
+
+
+def _iter_chunks(f, start, end):
+    """Iterate over the (chunk id, list type, position, size) of the RIFF chunks
+    between start and end. The list type is None for chunks that are not lists."""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(12)
+        if len(header) < 8:
+            break
+        chunk_id, size = struct.unpack("<4sI", header[:8])
+        list_type = header[8:12] if chunk_id in (b"RIFF", b"LIST") else None
+        yield chunk_id, list_type, pos, size
+        pos += 8 + size + (size & 1)  # chunks are padded to even sizes
+
+
+def _read_stream_headers(f, hdrl_pos, hdrl_size):
+    """Type, handler, compression and super index position of each stream."""
+    streams = []
+    for _, list_type, strl_pos, strl_size in _iter_chunks(
+        f, hdrl_pos + 12, hdrl_pos + 8 + hdrl_size
+    ):
+        if list_type != b"strl":
+            continue
+
+        stream = dict(type=None, handler=b"", compression=b"", indx=None)
+        for chunk_id, _, pos, size in _iter_chunks(
+            f, strl_pos + 12, strl_pos + 8 + strl_size
+        ):
+            f.seek(pos + 8)
+            if chunk_id == b"strh":
+                stream["type"], stream["handler"] = struct.unpack("<4s4s", f.read(8))
+            elif chunk_id == b"strf" and size >= 20:
+                # BITMAPINFOHEADER, biCompression after size, width, height, planes
+                # and bit count:
+                stream["compression"] = f.read(20)[16:20]
+            elif chunk_id == b"indx":
+                stream["indx"] = (pos, size)
+        streams.append(stream)
+    return streams
+
+
+def _read_std_index(data):
+    """Offsets and sizes of the frames listed in the data of a standard index."""
+    _, _, index_type, n_entries, _, base_offset = struct.unpack_from("<HBBI4sQ", data)
+    if index_type != AVI_INDEX_OF_CHUNKS:
+        raise ValueError(f"Unsupported AVI index type {index_type}")
+    entries = np.frombuffer(
+        data, dtype=AVI_STD_INDEX_DTYPE, count=n_entries, offset=AVI_INDEX_HEADER_SIZE
+    )
+    offsets = base_offset + entries["offset"].astype(np.int64)
+    return offsets, (entries["size"] & AVI_SIZE_MASK).astype(np.int64)
+
+
+def _read_opendml_index(f, indx_pos, indx_size):
+    f.seek(indx_pos + 8)
+    data = f.read(indx_size)
+    _, _, index_type, n_entries = struct.unpack_from("<HBBI", data)
+    if index_type == AVI_INDEX_OF_CHUNKS:
+        return _read_std_index(data)
+
+    entries = np.frombuffer(
+        data,
+        dtype=AVI_SUPER_INDEX_DTYPE,
+        count=n_entries,
+        offset=AVI_INDEX_HEADER_SIZE,
+    )
+    offsets, sizes = [], []
+    for ix_pos in entries["offset"]:
+        f.seek(int(ix_pos))
+        _, ix_size = struct.unpack("<4sI", f.read(8))
+        ix_offsets, ix_sizes = _read_std_index(f.read(ix_size))
+        offsets.append(ix_offsets)
+        sizes.append(ix_sizes)
+    return np.concatenate(offsets), np.concatenate(sizes)
+
+
+def _read_idx1(f, idx1_pos, idx1_size, movi_pos, stream_n):
+    f.seek(idx1_pos + 8)
+    n_entries = idx1_size // AVI_IDX1_DTYPE.itemsize
+    idx1 = np.frombuffer(f.read(n_entries * AVI_IDX1_DTYPE.itemsize), AVI_IDX1_DTYPE)
+    frame_ckids = [f"{stream_n:02d}dc".encode(), f"{stream_n:02d}db".encode()]
+    entries = idx1[np.isin(idx1["ckid"], frame_ckids)]
+    if len(entries) == 0:
+        raise ValueError("No video frames in the AVI index")
+
+    # Offsets can be relative to the movi list type, or absolute in the file; check
+    # which one points to the first frame chunk:
+    f.seek(movi_pos + int(entries["offset"][0]))
+    base = movi_pos if f.read(4) == entries["ckid"][0] else 0
+    offsets = base + entries["offset"].astype(np.int64) + 8  # skip chunk headers
+    return offsets, entries["size"].astype(np.int64)
+
+
+def read_avi_index(filename):
+    """Parse the index of the first video stream of an AVI file.
+
+    Parameters
+    ----------
+    filename : str or Path
+        AVI file.
+
+    Returns
+    -------
+    AviIndex
+        Codec, and position and size of the data of each frame. Empty index entries
+        (frames repeated by the recording software) point to the previous frame.
+
+    Raises
+    ------
+    ValueError
+        If the file is not an AVI, it has no video index (e.g. the recording
+        was interrupted), or the index entry of the first frame is empty.
+    """
+    with open(filename, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        riff_id, riff_size, form = struct.unpack("<4sI4s", f.read(12))
+        if riff_id != b"RIFF" or form != b"AVI ":
+            raise ValueError(f"{filename} is not an AVI file")
+
+        streams, movi_pos, idx1 = [], None, None
+        for chunk_id, list_type, pos, size in _iter_chunks(
+            f, 12, min(8 + riff_size, file_size)
+        ):
+            if list_type == b"hdrl":
+                streams = _read_stream_headers(f, pos, size)
+            elif list_type == b"movi" and movi_pos is None:
+                movi_pos = pos + 8
+            elif chunk_id == b"idx1":
+                idx1 = (pos, size)
+
+        stream_n = next(
+            (n for n, stream in enumerate(streams) if stream["type"] == b"vids"), None
+        )
+        if stream_n is None:
+            raise ValueError(f"No video stream in {filename}")
+        stream = streams[stream_n]
+        codec = stream["compression"] or stream["handler"]
+
+        if stream["indx"] is not None:
+            offsets, sizes = _read_opendml_index(f, *stream["indx"])
+        elif idx1 is not None and movi_pos is not None:
+            offsets, sizes = _read_idx1(f, *idx1, movi_pos, stream_n)
+        else:
+            raise ValueError(f"No index in {filename}")
+
+    # Empty entries repeat the previous frame:
+    is_empty = sizes == 0
+    if len(sizes) == 0 or is_empty[0]:
+        raise ValueError(
+            f"The first frame of {filename} has no data, so it cannot be decoded "
+            "nor repeat a previous frame."
+        )
+    if is_empty.any():
+        previous_frames = np.maximum.accumulate(
+            np.where(is_empty, 0, np.arange(len(sizes)))
+        )
+        offsets, sizes = offsets[previous_frames], sizes[previous_frames]
+
+    return AviIndex(
+        codec=codec.decode("ascii", errors="replace").strip("\x00 "),
+        offsets=offsets,
+        sizes=sizes,
+    )
+
+
+class MJPEGMovieData(OpenCVMovieData):
+    """Movie data class for MJPEG AVI movies, decoding frames directly from the
+    container index with cv2.imdecode.
+
+    Frames are the same as the ones read by OpenCVMovieData, up to small
+    differences between JPEG decoders (in color movies, at sharp color edges).
+    The number of frames is exact, as it comes from the index.
+
+    Args:
+        source_filename (str): Path to the movie file.
+        max_captures (int): Number of threads decoding the frames of a read, by
+            default the number of CPUs.
+        avi_index (AviIndex): Index of the movie, if already parsed.
+    """
+
+    PARALLEL_MIN_FRAMES = 8  # Minimum number of frames decoded by each thread
+
+    def __init__(
+        self,
+        source_filename,
+        timestamp_begin=None,
+        verbose=True,
+        max_captures=None,
+        avi_index=None,
+    ) -> None:
+        super().__init__(
+            source_filename,
+            timestamp_begin=timestamp_begin,
+            verbose=verbose,
+            max_captures=max_captures,
+        )
+        self.avi_index = (
+            avi_index if avi_index is not None else read_avi_index(self.source_filename)
+        )
+        if not self.avi_index.is_mjpeg:
+            raise ValueError(
+                f"{self.source_filename} is encoded with {self.avi_index.codec}, not "
+                "MJPEG: open it with OpenCVMovieData (or open_movie)."
+            )
+
+    def _init_captures(self):
+        super()._init_captures()
+        self._mmap = None
+        self._mmap_lock = threading.Lock()
+        self._decode_executor = None
+
+    def _get_mmap(self):
+        if self._mmap is None:
+            with self._mmap_lock:
+                if self._mmap is None:
+                    with open(self.source_filename, "rb") as f:
+                        self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def _decode_frame(self, idx):
+        """Decode a frame, returning None if its data is corrupted."""
+        import cv2
+
+        buffer = np.frombuffer(
+            self._get_mmap(),
+            dtype=np.uint8,
+            count=self.avi_index.sizes[idx],
+            offset=self.avi_index.offsets[idx],
+        )
+        return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+    def _read_metadata(self):
+        frame = self._decode_frame(0)
+        assert frame is not None, f"Cannot decode frames of {self.source_filename}"
+
+        return MovieMetadata(
+            width=frame.shape[1],
+            height=frame.shape[0],
+            dtype=frame.dtype,
+            bw=self._is_bw_frame(frame),
+            n_frames=self.avi_index.n_frames,
+        )
+
+    @instrumented
+    def _retrieve_and_slice_frames(self, frame_idx, row_idx, col_idx, channel_idx=None):
+        frame_indices, squeeze_n_frames = self._frame_indices(frame_idx)
+
+        new_frames = len(frame_indices)
+        frames_data = np.zeros(
+            self._sliced_shape(new_frames, row_idx, col_idx, channel_idx),
+            dtype=self.dtype,
+        )
+
+        def _decode_into(n_idxs):
+            n_decoded = 0
+            for n_idx in n_idxs:
+                frame = self._decode_frame(frame_indices[n_idx])
+                if frame is not None:
+                    frames_data[n_idx, ...] = self._slice_frame(
+                        frame, row_idx, col_idx, channel_idx
+                    )
+                    n_decoded += 1
+            return n_decoded
+
+        # cv2.imdecode releases the GIL, so threads decode frames in parallel:
+        n_batches = min(self.max_captures, new_frames // self.PARALLEL_MIN_FRAMES)
+        if n_batches > 1:
+            batches = np.array_split(np.arange(new_frames), n_batches)
+            n_decoded = sum(self._get_decode_executor().map(_decode_into, batches))
+        else:
+            n_decoded = _decode_into(range(new_frames))
+
+        count(frames_decoded=n_decoded)
+
+        if squeeze_n_frames:
+            frames_data = np.squeeze(frames_data, axis=0)
+
+        return frames_data
+
+    def _get_decode_executor(self):
+        # Separate from the submit() executor, as reads submitted there decode here:
+        with self._mmap_lock:
+            if self._decode_executor is None:
+                self._decode_executor = ThreadPoolExecutor(
+                    max_workers=self.max_captures
+                )
+        return self._decode_executor
+
+    def close(self):
+        """Stop the background threads and unmap the movie file."""
+        super().close()
+        with self._mmap_lock:
+            decode_executor, self._decode_executor = self._decode_executor, None
+        if decode_executor is not None:
+            decode_executor.shutdown(wait=True)
+
+        with self._mmap_lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+
+    def __getstate__(self):
+        # The memory map is reopened when needed:
+        state = super().__getstate__()
+        for attr in ["_mmap", "_mmap_lock", "_decode_executor"]:
+            del state[attr]
+        return state
+
+
+def open_movie(source_filename, timestamp_begin=None, **kwargs):
+    """Open a movie with the fastest available backend: MJPEGMovieData for MJPEG
+    AVI movies with an index, OpenCVMovieData otherwise.
+
+    Args:
+        source_filename (str): Path to the movie file.
+        timestamp_begin (pd.Timestamp): Start of the session, for the timestamps.
+        **kwargs: Other arguments of OpenCVMovieData (verbose, max_captures).
+
+    Returns:
+        OpenCVMovieData: The movie.
+    """
+    try:
+        avi_index = read_avi_index(source_filename)
+    except (OSError, ValueError, struct.error):
+        avi_index = None
+
+    if avi_index is not None and avi_index.is_mjpeg:
+        return MJPEGMovieData(
+            source_filename,
+            timestamp_begin=timestamp_begin,
+            avi_index=avi_index,
+            **kwargs,
+        )
+    return OpenCVMovieData(source_filename, timestamp_begin=timestamp_begin, **kwargs)
@@ -1,16 +1,25 @@
+import operator
+import os
+import threading
 from abc import ABC, abstractmethod, abstractproperty
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from functools import cached_property
 from pathlib import Path
 
-import cv2
 import numpy as np
 import pandas as pd
-from tqdm import tqdm
 
+from bonpy.async_utils import InFlightCalls, hashable_index
+from bonpy.instrumentation import count, instrumented
 from bonpy.time_utils import inplace_time_cols_fix_and_resample
 
 
+class FrameIndexError(IndexError, ValueError):
+    """Invalid frame index. Subclass of ValueError too, the error raised for
+    out-of-range frame arrays before, so that existing handlers keep working."""
+
+
 @dataclass
 class MovieMetadata:
     width: int
@@ -33,12 +42,20 @@ class MovieData(ABC):
         n_dims (int): Number of dimensions of the movie.
         is_bw (bool): Whether the movie is black and white.
         shape (tuple): Shape of the movie.
+        gap_index (GapIndex): Mapping of times to frames accounting for drops.
 
     Methods:
         __getitem__(idx): Returns a slice of the movie.
+        iter_chunks(): Iterate over chunks of consecutive frames.
+        to_dask(chunks): Lazy dask array reading chunks of frames on demand.
+        multiscale(): Movie followed by its cached downsampled levels.
+        diagnose_timestamps(): Dropped frames, duplicates and drift of timestamps.
+        time_to_frame(times): Frames acquired at the given times.
 
     """
 
+    DEFAULT_CHUNK_FRAMES = 64  # Number of frames in each chunk of lazy arrays
+
     def __init__(self, source_filename, timestamp_begin=None) -> None:
         source_filename = Path(source_filename)
 
@@ -47,9 +64,9 @@ class MovieData(ABC):
         # Check if a timestamp file is present.
         # The convention is that timestamp file is named the same as the movie file,
         # with timestamp instead of movie and .csv extension
-        self.timestamp_filename = source_filename.parent / source_filename.name.replace(
-            "video", "timestamps"
-        )
+        self.timestamp_filename = (
+            source_filename.parent / source_filename.name.replace("video", "timestamps")
+        ).with_suffix(".csv")
 
         # Check if there is a DLC file available:
         # try:
@@ -60,6 +77,7 @@ class MovieData(ABC):
         self.source_filename = source_filename
         self.timestamp_begin = timestamp_begin
         self.verbose = True
+        self._in_flight = InFlightCalls()
 
     # @abstractclassmethod
     # def load_indexed_frame(self):
@@ -89,6 +107,43 @@ class MovieData(ABC):
         else:
             return None
 
+    def diagnose_timestamps(self, expected_dt=None):
+        """Diagnose dropped frames, duplicates and drift of the movie timestamps.
+
+        Args:
+            expected_dt (float): Nominal frame interval, by default the median one.
+
+        Returns:
+            TimestampDiagnostics: Diagnostics of the timestamps.
+        """
+        from bonpy.timestamp_diagnostics import diagnose_timestamps
+
+        assert self.has_timestamps, f"No timestamps file for {self.source_filename}"
+        return diagnose_timestamps(self.timestamps, expected_dt=expected_dt)
+
+    @cached_property
+    def gap_index(self):
+        """GapIndex mapping times to frames accounting for dropped frames, or None
+        if the movie has no timestamps."""
+        if not self.has_timestamps:
+            return None
+        return self.diagnose_timestamps().gap_index
+
+    def time_to_frame(self, times):
+        """Frame acquired at each time, or -1 if it was dropped or out of the movie.
+
+        Args:
+            times (np.ndarray): Times, in seconds.
+
+        Returns:
+            np.ndarray: Frame indexes.
+
+        Raises:
+            ValueError: If the timestamps go back in time.
+        """
+        assert self.has_timestamps, f"No timestamps file for {self.source_filename}"
+        return self.gap_index.time_to_frame(times)
+
     @property
     def dtype(self) -> np.dtype:
         return self.metadata.dtype
@@ -114,6 +169,80 @@ class MovieData(ABC):
 
         return shape
 
+    @property
+    def chunks(self) -> tuple:
+        """Shape of the chunks of lazy arrays: ranges of whole frames, as frames
+        are decoded entirely anyway."""
+        return (min(self.DEFAULT_CHUNK_FRAMES, self.metadata.n_frames),) + self.shape[
+            1:
+        ]
+
+    def __len__(self) -> int:
+        return self.metadata.n_frames
+
+    def __array__(self, dtype=None, copy=None):
+        frames = self[:]
+        return frames if dtype is None else frames.astype(dtype)
+
+    def _frames_per_chunk(self, chunks):
+        if chunks is None:
+            return self.chunks[0]
+        if isinstance(chunks, int):
+            return chunks
+
+        chunks = tuple(chunks)
+        if len(chunks) != self.ndim or any(
+            c not in (-1, n) for c, n in zip(chunks[1:], self.shape[1:])
+        ):
+            raise ValueError(
+                "Chunks can split only the frames axis, as each frame is decoded whole."
+            )
+        return chunks[0]
+
+    def to_dask(self, chunks=None):
+        """Lazy dask array of the movie. Each chunk is a range of consecutive frames,
+        read through the backend when the chunk is computed, so that the whole movie
+        is never loaded and chunks can be decoded in parallel.
+
+        Args:
+            chunks (int or tuple): Number of frames per chunk, or chunk shape with full
+                (or -1) size for all axes except the first. By default self.chunks.
+
+        Returns:
+            dask.array.Array: The lazy movie array.
+        """
+        try:
+            import dask.array as da
+            from dask.base import tokenize
+        except ImportError as e:
+            raise ImportError("MovieData.to_dask requires dask to be installed.") from e
+
+        frames_per_chunk = self._frames_per_chunk(chunks)
+        n_frames = self.metadata.n_frames
+        starts = range(0, n_frames, frames_per_chunk)
+        frame_chunks = tuple(
+            min(frames_per_chunk, n_frames - start) for start in starts
+        )
+
+        name = "moviedata-" + tokenize(
+            str(self.source_filename),
+            self.source_filename.stat().st_mtime,
+            frames_per_chunk,
+        )
+        spatial_block = (0,) * (self.ndim - 1)
+        graph = {
+            (name, chunk_n)
+            + spatial_block: (
+                operator.getitem,
+                self,
+                slice(start, start + n_chunk_frames),
+            )
+            for chunk_n, (start, n_chunk_frames) in enumerate(zip(starts, frame_chunks))
+        }
+        array_chunks = (frame_chunks,) + tuple((n,) for n in self.shape[1:])
+
+        return da.Array(graph, name, array_chunks, dtype=self.dtype)
+
     def __getitem__(self, idx):
         if isinstance(idx, tuple):
             # Extract individual indexes for frames, rows, and columns
@@ -138,10 +267,142 @@ class MovieData(ABC):
         # Retrieve and slice frames
         return self._retrieve_and_slice_frames(frame_idx, row_idx, col_idx, channel_idx)
 
+    async def aread(self, idx, executor=None):
+        """Awaitable counterpart of __getitem__, reading frames in a thread executor
+        (by default the one of bonpy.async_utils.get_default_executor).
+        Concurrent requests for the same index share a single read."""
+        return await self._in_flight.run(
+            hashable_index(idx), self.__getitem__, idx, executor=executor
+        )
+
     @abstractmethod
     def _retrieve_and_slice_frames(self, frame_idx, row_idx, col_idx, channel_idx):
         pass
 
+    def _frame_indices(self, frame_idx):
+        """Normalize a frame index to a sequence of frame numbers.
+
+        Args:
+            frame_idx: Integer, slice, or iterable of integers or booleans.
+
+        Returns:
+            tuple: (frame numbers, whether the frames axis has to be squeezed)
+
+        Raises:
+            FrameIndexError: If integer frames are out of range, or a boolean index
+                does not have one value per frame.
+        """
+        n_frames = self.metadata.n_frames
+        # Test if frame index is iterable:
+        try:
+            iter(frame_idx)
+            is_iterable = True
+        except TypeError:
+            is_iterable = False
+
+        if is_iterable:
+            frame_idx = np.asarray(frame_idx)
+            # If boolean, test if length matches number of frames and generate array
+            # with integer valid values:
+            assert frame_idx.dtype == bool or np.issubdtype(frame_idx.dtype, np.integer)
+
+            if frame_idx.dtype == bool:
+                if len(frame_idx) != n_frames:
+                    raise FrameIndexError(
+                        "Boolean frame index must have same length as number of frames."
+                    )
+                return np.flatnonzero(frame_idx), False
+
+            # check if values are valid
+            if np.any(frame_idx >= n_frames) or np.any(frame_idx < -n_frames):
+                raise FrameIndexError(
+                    "Integer frame indices must be between -n_frames and n_frames."
+                )
+            # Convert negative indices to positive, counting from the end (in a new
+            # array, not to modify the index of the caller):
+            return np.where(frame_idx < 0, frame_idx + n_frames, frame_idx), False
+
+        if isinstance(frame_idx, (int, np.integer)):
+            if not -n_frames <= frame_idx < n_frames:
+                raise FrameIndexError(f"Frame {frame_idx} out of {n_frames} frames.")
+            return [frame_idx % n_frames], True
+        if isinstance(frame_idx, slice):
+            return range(*frame_idx.indices(n_frames)), False
+
+        raise TypeError("Frame index must be an interable, an integer or a slice.")
+
+    def _sliced_shape(self, n_frames, row_idx, col_idx, channel_idx=None):
+        """Shape of n_frames frames sliced by _slice_frame."""
+        new_height = len(range(*row_idx.indices(self.metadata.height)))
+        new_width = len(range(*col_idx.indices(self.metadata.width)))
+        shape = (n_frames, new_height, new_width)
+        if not self.is_bw:
+            new_channels = (
+                len(range(*channel_idx.indices(3))) if channel_idx is not None else None
+            )
+            shape += (new_channels,)
+        return shape
+
+    def _slice_frame(self, frame, row_idx, col_idx, channel_idx=None):
+        """Slice a decoded (rows, columns, channels) frame, keeping a single channel
+        of bw movies."""
+        if channel_idx is not None:
+            sliced_frame = frame[row_idx, col_idx, channel_idx]
+        else:
+            sliced_frame = frame[row_idx, col_idx]
+        if sliced_frame.ndim == 3 and self.is_bw:
+            sliced_frame = sliced_frame[:, :, 0]
+        return sliced_frame
+
+    def multiscale(
+        self,
+        n_levels=None,
+        spatial_factor=2,
+        time_factor=1,
+        cache_dir=None,
+        rebuild=False,
+    ):
+        """Multiscale view of the movie, for interactive browsing: the movie followed
+        by progressively downsampled levels. Coarse levels are built in a single pass
+        on the first request and cached next to the movie, see bonpy.pyramid.
+
+        Args:
+            n_levels (int): Number of levels, by default down to frames of about
+                bonpy.pyramid.PYRAMID_MIN_SIZE pixels.
+            spatial_factor (int): Downsampling of rows and columns between levels.
+            time_factor (int): Downsampling of frames between levels, by default 1.
+            cache_dir (str): Folder of the cached levels, by default next to the movie.
+            rebuild (bool): Rebuild the cache even if it is up to date.
+
+        Returns:
+            list: The movie, followed by memory-mapped arrays of the coarse levels.
+        """
+        from bonpy.pyramid import multiscale
+
+        return multiscale(
+            self,
+            n_levels=n_levels,
+            spatial_factor=spatial_factor,
+            time_factor=time_factor,
+            cache_dir=cache_dir,
+            rebuild=rebuild,
+        )
+
+    def iter_chunks(self, start=0, stop=None, chunk_frames=256):
+        """Iterate sequentially over chunks of consecutive frames.
+
+        Args:
+            start (int): First frame to read.
+            stop (int): Frame after the last one to read, by default the movie end.
+            chunk_frames (int): Number of frames in each chunk.
+
+        Yields:
+            tuple: (index of the first frame of the chunk, array of chunk frames)
+        """
+        stop = self.metadata.n_frames if stop is None else stop
+        for chunk_start in range(start, stop, chunk_frames):
+            yield chunk_start, self[chunk_start : min(chunk_start + chunk_frames, stop)]
+
 
 class OpenCVMovieData(MovieData):
     """Movie data class using OpenCV as backend."""
@@ -151,105 +412,151 @@ class OpenCVMovieData(MovieData):
         10  # Absolute tolerance of similarity across channels for BW detection
     )
 
-    def __init__(self, source_filename, timestamp_begin=None, verbose=True) -> None:
+    def __init__(
+        self, source_filename, timestamp_begin=None, verbose=True, max_captures=None
+    ) -> None:
         super().__init__(source_filename, timestamp_begin=timestamp_begin)
 
         self.verbose = verbose
+        self.max_captures = max_captures if max_captures is not None else os.cpu_count()
+        self._init_captures()
+
+    def _init_captures(self):
+        # Captures are kept open and reused across reads, as opening a capture costs
+        # more than decoding a few frames. Each read checks out a capture from a pool
+        # of at most max_captures, so concurrent reads never share a capture:
+        self._idle_captures = []  # (capture, index of the next frame it will read)
+        self._n_captures = 0
+        self._captures_condition = threading.Condition()
+        self._metadata = None
+        self._metadata_lock = threading.Lock()
+        self._executor = None
+
+    def _checkout_capture(self, first_idx=None):
+        """Get an idle capture, preferring one already positioned at first_idx,
+        or open a new one if the pool is not full; wait otherwise."""
+        with self._captures_condition:
+            while not self._idle_captures and self._n_captures >= self.max_captures:
+                self._captures_condition.wait()
+
+            if self._idle_captures:
+                positions = [next_idx for _, next_idx in self._idle_captures]
+                pool_idx = positions.index(first_idx) if first_idx in positions else -1
+                return self._idle_captures.pop(pool_idx)
+
+            self._n_captures += 1
+
+        import cv2
+
+        return cv2.VideoCapture(str(self.source_filename)), 0
+
+    def _checkin_capture(self, capture, next_idx):
+        with self._captures_condition:
+            self._idle_captures.append((capture, next_idx))
+            self._captures_condition.notify()
+
+    def submit(self, idx):
+        """Read frames in a background thread.
+
+        Args:
+            idx: Any index accepted by __getitem__.
+
+        Returns:
+            concurrent.futures.Future: Future of the array of frames.
+        """
+        with self._captures_condition:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_captures)
+        return self._executor.submit(self.__getitem__, idx)
+
+    def close(self):
+        """Stop the background reading threads and release the idle captures.
+        Captures in use by ongoing reads are kept, and reused by later reads."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+        self._release_idle_captures()
+
+    def _release_idle_captures(self):
+        with self._captures_condition:
+            for capture, _ in self._idle_captures:
+                capture.release()
+            self._n_captures -= len(self._idle_captures)
+            self._idle_captures = []
+
+    def __getstate__(self):
+        # Captures and threads cannot be pickled, they are reopened when needed:
+        state = self.__dict__.copy()
+        for attr in [
+            "_idle_captures",
+            "_n_captures",
+            "_captures_condition",
+            "_metadata_lock",
+            "_executor",
+        ]:
+            del state[attr]
+        return state
+
+    def __setstate__(self, state):
+        metadata = state.pop("_metadata")
+        self.__dict__.update(state)
+        self._init_captures()
+        self._metadata = metadata
 
-    @cached_property
+    @property
     def metadata(self):
+        if self._metadata is None:
+            with self._metadata_lock:
+                if self._metadata is None:
+                    self._metadata = self._read_metadata()
+        return self._metadata
+
+    @classmethod
+    def _is_bw_frame(cls, frame):
+        # bw if all frames very similar across channels:
+        return np.allclose(
+            frame[:, :, 0], frame[:, :, 1], atol=cls.BW_DEFAULT_ATOL
+        ) and np.allclose(frame[:, :, 0], frame[:, :, 2], atol=cls.BW_DEFAULT_ATOL)
+
+    def _read_metadata(self):
         # We need to read frames independently from _retrieve_and_slice_frames to
         # avoid circularity and read the metadata:
-        cap = cv2.VideoCapture(str(self.source_filename))
-        ret, frame = cap.read()
+        import cv2
 
-        # bw if all frames very similar across channels:
-        bw = np.allclose(
-            frame[:, :, 0], frame[:, :, 1], atol=self.BW_DEFAULT_ATOL
-        ) and np.allclose(frame[:, :, 0], frame[:, :, 2], atol=self.BW_DEFAULT_ATOL)
+        cap, _ = self._checkout_capture()
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        ret, frame = cap.read()
 
         metadata = MovieMetadata(
             width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
             height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
             dtype=frame.dtype,
-            bw=bw,
+            bw=self._is_bw_frame(frame),
             n_frames=int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
         )
 
-        cap.release()
+        self._checkin_capture(cap, 1)
 
         return metadata
 
+    @instrumented
     def _retrieve_and_slice_frames(self, frame_idx, row_idx, col_idx, channel_idx=None):
         # On my machine, a single frame of size (634, 548) takes approx. 0.015 seconds to retrieve;
         # 100 frames take approx. 0.25 seconds to retrieve (2.3 ms/frame + 15 ms overhead).
 
-        # Open the video file
-        cap = cv2.VideoCapture(str(self.source_filename))
-        squeeze_n_frames = False
-        # Test if frame index is iterable:
-        try:
-            iter(frame_idx)
-            is_iterable = True
-        except TypeError:
-            is_iterable = False
-
-        if is_iterable:
-            frame_idx = np.array(frame_idx)
-            # If so, check if boolean or integer values, If boolean, test if length matches number of frames,
-            # and generate array with integer valid values:
-            # print(frame_idx, frame_idx.dtype)
-            assert frame_idx.dtype in [bool, int, np.int32, np.int64]
-
-            if frame_idx.dtype == bool:
-                if len(frame_idx) != self.length:
-                    raise ValueError(
-                        "Boolean frame index must have same length as number of frames."
-                    )
-                frame_indices = np.where(frame_idx)[0]
-
-            elif frame_idx.dtype == int:
-                # check if values are valid
-                if np.any(np.array(frame_idx) >= self.metadata.n_frames):
-                    raise ValueError(
-                        "Integer frame indices must be between 0 and number of frames."
-                    )
-                # Convert negative indices to positive, conting from the end:
-                frame_idx[frame_idx < 0] += self.metadata.n_frames
-
-            frame_indices = frame_idx
-
-        else:
-            # Determine frame indices
-            if (
-                isinstance(frame_idx, int)
-                or isinstance(frame_idx, np.int32)
-                or isinstance(frame_idx, np.int64)
-            ):
-                frame_indices = [frame_idx]
-                squeeze_n_frames = True
-            elif isinstance(frame_idx, slice):
-                frame_indices = range(*frame_idx.indices(self.metadata.n_frames))
+        import cv2
+        from tqdm import tqdm
 
-            else:
-                raise TypeError(
-                    "Frame index must be an interable, an integer or a slice."
-                )
+        frame_indices, squeeze_n_frames = self._frame_indices(frame_idx)
 
         # Compute the size of the retrieved frames:
         new_frames = len(frame_indices)
-        new_height = len(range(*row_idx.indices(self.metadata.height)))
-        new_width = len(range(*col_idx.indices(self.metadata.width)))
-        new_channels = (
-            len(range(*channel_idx.indices(3))) if channel_idx is not None else None
+        frames_data = np.zeros(
+            self._sliced_shape(new_frames, row_idx, col_idx, channel_idx),
+            dtype=self.dtype,
         )
 
-        output_data_shape = (new_frames, new_height, new_width)
-        if not self.is_bw:
-            output_data_shape += (new_channels,)
-
-        frames_data = np.zeros(output_data_shape, dtype=self.dtype)
-
         # Show bar only if verbose and more than VERBOSE_DEFAULT_NFRAMES frames:
         wrapper = (
             tqdm
@@ -257,22 +564,31 @@ class OpenCVMovieData(MovieData):
             else lambda x: x
         )
 
-        for n_idx, idx in enumerate(wrapper(frame_indices)):
-            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-            ret, frame = cap.read()
-            if ret:
-                # Slice the frame immediately:
-                if channel_idx is not None:
-                    sliced_frame = frame[row_idx, col_idx, channel_idx]
+        n_seeks, n_decoded = 0, 0
+        cap, next_idx = self._checkout_capture(
+            first_idx=frame_indices[0] if new_frames > 0 else None
+        )
+        try:
+            for n_idx, idx in enumerate(wrapper(frame_indices)):
+                # Seek only if frames are not read sequentially:
+                if idx != next_idx:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+                    n_seeks += 1
+                next_idx = idx + 1
+                ret, frame = cap.read()
+                if ret:
+                    n_decoded += 1
+                    # Slice the frame immediately:
+                    frames_data[n_idx, ...] = self._slice_frame(
+                        frame, row_idx, col_idx, channel_idx
+                    )
                 else:
-                    sliced_frame = frame[row_idx, col_idx]
-                if sliced_frame.ndim == 3 and self.is_bw:
-                    sliced_frame = sliced_frame[:, :, 0]
-                frames_data[n_idx, ...] = sliced_frame
-            else:
-                break
+                    next_idx = None  # position unknown after a failed read
+                    break
+        finally:
+            self._checkin_capture(cap, next_idx)
 
-        cap.release()
+        count(frames_decoded=n_decoded, seeks=n_seeks)
 
         if squeeze_n_frames:
             frames_data = np.squeeze(frames_data, axis=0)
@@ -302,5 +618,7 @@ if __name__ == "__main__":
     # import napari
 
     # v = napari.Viewer()
-    # v.add_image(m, name="test", contrast_limits=(0, 255), multiscale=False)
+    # v.add_image(
+    #     m.multiscale(), name="test", contrast_limits=(0, 255), multiscale=True
+    # )
     # napari.run()
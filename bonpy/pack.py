@@ -0,0 +1,297 @@
+"""Consolidated session packs: all parsed tabular streams of an Experiment
+(logs, timestamps, DLC tracking and the trials table) in a single compressed HDF5
+file, with a JSON manifest in the root attributes.
+
+Packed streams are stored in PyTables table format, which is chunked and allows
+reading row ranges and column subsets without loading the whole stream.
+Non tabular streams (movies, raw h5 files) are not copied: the manifest keeps a
+reference to their source file, which is loaded with the usual loaders if needed.
+"""
+
+import json
+import re
+import threading
+from collections import UserDict
+from dataclasses import asdict
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+
+import pandas as pd
+import tables
+
+from bonpy.async_utils import InFlightCalls
+from bonpy.data_dict import preload
+from bonpy.data_parsers import LOADER_DICT, MOUSE_LOADER_DICT
+
+PACK_FORMAT_VERSION = 1
+MANIFEST_ATTR = "bonpy_manifest"
+STREAMS_GROUP = "streams"
+TRIALS_KEY = "trials"
+COLUMN_LEVELS_SEP = "|"  # separator of the levels of flattened MultiIndex columns
+
+# Loader categories of non tabular streams, referenced in the manifest but not
+# packed; all other known categories are loaded as DataFrames and packed:
+EXTERNAL_CATEGORIES = ("avi", "h5")
+UNKNOWN_CATEGORY = "-"  # files with no loader, see LazyDataDict
+
+_HDF_LOCK = threading.Lock()  # PyTables is not thread safe
+
+DEFAULT_COMPLIB = "blosc:lz4"
+DEFAULT_COMPLEVEL = 5
+
+
+def _node_name(key):
+    """HDF5 node name for a stream key (keys like eye-cam_video are not valid
+    python identifiers, which PyTables warns about)."""
+    return f"{STREAMS_GROUP}/" + re.sub(r"\W", "_", key)
+
+
+def _flatten_columns(df):
+    """Return a copy of df with string columns, and the description of the original
+    columns needed to restore them."""
+    columns = dict(names=list(df.columns.names), index_name=df.index.name)
+    if isinstance(df.columns, pd.MultiIndex):
+        columns["values"] = [list(map(str, col)) for col in df.columns]
+        flat_columns = [COLUMN_LEVELS_SEP.join(col) for col in columns["values"]]
+    else:
+        columns["values"] = [str(col) for col in df.columns]
+        flat_columns = columns["values"]
+
+    df = df.copy()
+    df.columns = flat_columns
+    return df, columns
+
+
+def _restore_columns(df, columns):
+    if len(columns["names"]) > 1:
+        df.columns = pd.MultiIndex.from_tuples(
+            [tuple(col.split(COLUMN_LEVELS_SEP)) for col in df.columns],
+            names=columns["names"],
+        )
+    df.index.name = columns["index_name"]
+    return df
+
+
+def _flat_column_names(columns):
+    """Flattened names of a column selection, given in the original format."""
+    if columns is None:
+        return None
+    return [
+        COLUMN_LEVELS_SEP.join(col) if isinstance(col, tuple) else col
+        for col in columns
+    ]
+
+
+def write_pack(
+    experiment,
+    path,
+    keys=None,
+    complib=DEFAULT_COMPLIB,
+    complevel=DEFAULT_COMPLEVEL,
+):
+    """Write all tabular streams of an experiment in a single HDF5 pack.
+
+    Parameters
+    ----------
+    experiment : Experiment
+        Experiment to pack.
+    path : str or Path
+        Pack filename; overwritten if it exists.
+    keys : list of str, optional
+        Keys of the data dict to pack, by default all of them.
+    complib : str, optional
+        Compression library, by default "blosc:lz4".
+    complevel : int, optional
+        Compression level, by default 5.
+
+    Returns
+    -------
+    dict
+        The manifest of the pack.
+    """
+    path = Path(path)
+    data_dict = experiment.data_dict
+    keys = data_dict.keys() if keys is None else keys
+
+    metadata = asdict(experiment.metadata)
+    metadata["timestamp"] = metadata["timestamp"].isoformat()
+    manifest = dict(
+        format_version=PACK_FORMAT_VERSION,
+        created=datetime.now().isoformat(),
+        root_path=str(experiment.root_path),
+        metadata=metadata,
+        streams=dict(),
+        external=dict(),
+    )
+
+    with pd.HDFStore(path, mode="w", complib=complib, complevel=complevel) as store:
+        # Choose the streams from their loader category, loading only the packed ones:
+        to_pack = []
+        for key in keys:
+            file_info = data_dict.files_dict[key]
+            category = file_info["category"]
+            if category in EXTERNAL_CATEGORIES:
+                manifest["external"][key] = dict(
+                    category=category, file=str(Path(file_info["file"]).resolve())
+                )
+            elif category != UNKNOWN_CATEGORY:
+                to_pack.append((key, category, data_dict[key]))
+        try:
+            to_pack.append((TRIALS_KEY, None, experiment.trials_df))
+        except KeyError:
+            pass  # no laser or cube logs in this session
+
+        for key, category, data in to_pack:
+            flat_df, columns = _flatten_columns(data)
+            store.put(_node_name(key), flat_df, format="table")
+            manifest["streams"][key] = dict(
+                node=_node_name(key),
+                category=category,
+                n_rows=len(flat_df),
+                columns=columns,
+            )
+
+    with tables.open_file(path, mode="a") as h5file:
+        h5file.root._v_attrs[MANIFEST_ATTR] = json.dumps(manifest)
+
+    return manifest
+
+
+def read_manifest(path):
+    with tables.open_file(path, mode="r") as h5file:
+        return json.loads(h5file.root._v_attrs[MANIFEST_ATTR])
+
+
+def _read_stream(path, stream, columns=None, start=None, stop=None):
+    with _HDF_LOCK:
+        df = pd.read_hdf(
+            path,
+            stream["node"],
+            columns=_flat_column_names(columns),
+            start=start,
+            stop=stop,
+        )
+    return _restore_columns(df, stream["columns"])
+
+
+def _load_stream(path, _=None, precision=None, stream=None):
+    """Loader of a packed stream, with the signature of the data_parsers loaders.
+    Module-level, so that it can be pickled when preloading with processes."""
+    return _read_stream(path, stream)
+
+
+class PackedDataDict(UserDict):
+    """Lazy dictionary of the streams of a session pack, with the same interface
+    of LazyDataDict. Streams are read from the pack on first access; parts of a
+    stream can be read without loading it whole with select().
+    Keys that were not packed (e.g. movies) are loaded from their source file,
+    with the global precision at loading time (see bonpy.precision).
+    """
+
+    def __init__(self, path, timestamp_begin=None, mouse_id=None):
+        super().__init__()
+        self.path = Path(path)
+        self.timestamp_begin = timestamp_begin
+        self.precision = None  # packed streams keep the dtypes they were packed with
+        self.manifest = read_manifest(self.path)
+
+        if mouse_id is None:
+            mouse_id = self.manifest["metadata"]["animal_id"]
+        self.loader_dict = MOUSE_LOADER_DICT.get(mouse_id, LOADER_DICT["v00"])
+        self._in_flight = InFlightCalls()
+
+    @property
+    def streams(self):
+        return self.manifest["streams"]
+
+    def keys(self):
+        return [key for key in self.streams if key != TRIALS_KEY] + list(
+            self.manifest["external"].keys()
+        )
+
+    @property
+    def files_dict(self):
+        """File and loader category of each key, as in LazyDataDict; the file of
+        packed streams is the pack itself."""
+        files_dict = {
+            key: dict(file=self.path, category=self.streams[key]["category"])
+            for key in self.keys()
+            if key in self.streams
+        }
+        for key, source in self.manifest["external"].items():
+            files_dict[key] = dict(
+                file=Path(source["file"]), category=source["category"]
+            )
+        return files_dict
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __repr__(self) -> str:
+        return f"PackedDataDict from {self.path} with keys: {self.keys()}"
+
+    def _loader(self, key):
+        if key in self.streams:
+            return partial(_load_stream, stream=self.streams[key])
+        return self.loader_dict[self.manifest["external"][key]["category"]]
+
+    def __getitem__(self, key):
+        if key not in self.data:
+            if key in self.streams:
+                self.data[key] = self.select(key)
+            else:
+                source = self.manifest["external"][key]
+                self.data[key] = self._loader(key)(source["file"], self.timestamp_begin)
+
+        return self.data[key]
+
+    async def aget(self, key, executor=None):
+        """Awaitable counterpart of __getitem__, see LazyDataDict.aget. The executor
+        must be thread based."""
+        if key not in self.data:
+            await self._in_flight.run(key, self.__getitem__, key, executor=executor)
+        return self.data[key]
+
+    def _loading_tasks(self, keys=None):
+        """List (key, loader, file) for all the keys to load that are not loaded yet."""
+        keys = self.keys() if keys is None else keys
+        files_dict = self.files_dict
+        return [
+            (key, self._loader(key), files_dict[key]["file"])
+            for key in keys
+            if key not in self.data
+        ]
+
+    def preload(self, keys=None, workers=None, executor="thread"):
+        """Load eagerly and in parallel the data for multiple keys, see
+        LazyDataDict.preload."""
+        return preload([self], keys=keys, workers=workers, executor=executor)[0]
+
+    def select(self, key, columns=None, start=None, stop=None):
+        """Read a packed stream, or a range of rows and subset of its columns.
+
+        Parameters
+        ----------
+        key : str
+            Stream key.
+        columns : list, optional
+            Columns to read (tuples for MultiIndex columns), by default all.
+        start, stop : int, optional
+            Range of rows to read, by default all.
+
+        Returns
+        -------
+        pd.DataFrame
+            The selected data.
+        """
+        return _read_stream(
+            self.path, self.streams[key], columns=columns, start=start, stop=stop
+        )
+
+    @property
+    def has_trials(self):
+        return TRIALS_KEY in self.streams
+
+    def load_trials(self):
+        return self.select(TRIALS_KEY)
@@ -0,0 +1,125 @@
+"""Precision policy of loaded data.
+
+With the default "full" precision loaders return the dtypes parsed by pandas
+(float64 and int64 columns), and parsed logs keep a timedelta64 "timedelta" column
+next to the float "time" index. With "compact" precision:
+
+- integer data columns are downcast to the smallest integer type holding their
+  values (e.g. int16 for ball counts), which is lossless;
+- float data columns are stored as float32;
+- the redundant "timedelta" column is not created;
+- crops of float data are float32.
+
+Time (indexes, timestamps, timebases and time-valued columns such as the cube
+"hold_time") is always kept in float64, as float32 would lose sub-millisecond
+resolution after a few minutes of recording.
+
+The policy can be set globally with set_precision or with the using_precision
+context manager, and overridden by the precision argument of loaders,
+LazyDataDict and crop functions.
+"""
+
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+PRECISIONS = ("full", "compact")
+
+_PRECISION = "full"
+
+
+def get_precision(precision=None):
+    """Resolve a precision argument: None gives the global precision.
+
+    Parameters
+    ----------
+    precision : str, optional
+        Either "full" or "compact", by default the global precision.
+
+    Returns
+    -------
+    str
+        The resolved precision.
+    """
+    if precision is None:
+        return _PRECISION
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision {precision}; options are {PRECISIONS}")
+    return precision
+
+
+def set_precision(precision):
+    """Set the global precision, used when no precision argument is passed."""
+    global _PRECISION
+    _PRECISION = get_precision(precision)
+
+
+@contextmanager
+def using_precision(precision):
+    """Temporarily set the global precision.
+
+    Examples
+    --------
+    >>> with using_precision("compact"):
+    ...     ball_df = data_dict["ball-log_ball"]
+    """
+    previous = _PRECISION
+    set_precision(precision)
+    try:
+        yield
+    finally:
+        set_precision(previous)
+
+
+def is_compact(precision=None):
+    return get_precision(precision) == "compact"
+
+
+def float_dtype(dtype, precision=None):
+    """Dtype to use for float results computed from data of the given dtype:
+    float64 becomes float32 with compact precision, other dtypes are left as they are.
+    """
+    dtype = np.dtype(dtype)
+    if is_compact(precision) and dtype == np.float64:
+        return np.dtype(np.float32)
+    return dtype
+
+
+def _is_time_column(column):
+    """Columns derived from timestamps are recognized by name (e.g. "time",
+    "hold_time")."""
+    return "time" in str(column).lower()
+
+
+def compact_dtypes(df, precision=None):
+    """Downcast in place the numeric columns of a DataFrame, if precision is compact.
+
+    Integer columns are downcast to the smallest type holding their values, float64
+    columns to float32. The index (time), time-valued columns (with "time" in their
+    name) and non numeric columns are not changed.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe to downcast.
+    precision : str, optional
+        Either "full" or "compact", by default the global precision.
+
+    Returns
+    -------
+    pd.DataFrame
+        The same dataframe.
+    """
+    if not is_compact(precision):
+        return df
+
+    for column, dtype in df.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype) or _is_time_column(column):
+            continue
+        if pd.api.types.is_integer_dtype(dtype):
+            df[column] = pd.to_numeric(df[column], downcast="integer")
+        elif dtype == np.float64:
+            df[column] = df[column].astype(np.float32)
+
+    return df
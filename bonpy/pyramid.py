@@ -0,0 +1,205 @@
+"""Multiscale (pyramid) representation of movies, for interactive browsing.
+
+Each level downsamples the previous one in space (averaging square pixel blocks)
+and optionally in time (averaging consecutive frames). Coarse levels are built
+once, in a single streaming pass over the movie, and cached as .npy files in a
+folder next to it; later requests memory-map the cached levels, so browsing them
+never decodes the movie again. Level 0 is the movie itself.
+"""
+
+import json
+import math
+import os
+from pathlib import Path
+
+import numpy as np
+
+from bonpy.derive import _bin_frames
+
+PYRAMID_SUFFIX = ".pyramid"  # cache folder: <movie name>.pyramid next to the movie
+PYRAMID_MANIFEST = "pyramid.json"
+PYRAMID_MIN_SIZE = 32  # levels are added while the frame side is at least this
+PYRAMID_CHUNK_FRAMES = 256
+
+
+def _default_n_levels(shape, spatial_factor, min_size=PYRAMID_MIN_SIZE):
+    n_levels = 1
+    while min(shape[1:3]) // spatial_factor**n_levels >= min_size:
+        n_levels += 1
+    return n_levels
+
+
+def _level_shape(shape, level, spatial_factor, time_factor):
+    return (
+        math.ceil(shape[0] / time_factor**level),
+        shape[1] // spatial_factor**level,
+        shape[2] // spatial_factor**level,
+    ) + tuple(shape[3:])
+
+
+def _bin_time(frames, time_factor):
+    """Average frames over blocks of time_factor frames; the last block can be
+    shorter."""
+    if time_factor == 1:
+        return frames
+    starts = np.arange(0, len(frames), time_factor)
+    sums = np.add.reduceat(frames.astype(np.float64), starts, axis=0)
+    counts = np.diff(np.append(starts, len(frames)))
+    binned = sums / counts.reshape((-1,) + (1,) * (frames.ndim - 1))
+    return np.round(binned).astype(frames.dtype)
+
+
+def _source_signature(movie):
+    stat = os.stat(movie.source_filename)
+    return dict(size=stat.st_size, mtime=stat.st_mtime)
+
+
+def build_pyramid(
+    movie,
+    n_levels=None,
+    spatial_factor=2,
+    time_factor=1,
+    cache_dir=None,
+    chunk_frames=PYRAMID_CHUNK_FRAMES,
+):
+    """Build the coarse levels of a movie pyramid in a single pass, and cache them.
+
+    Parameters
+    ----------
+    movie : MovieData
+        Movie to downsample.
+    n_levels : int, optional
+        Number of levels including the full resolution one, by default as many as
+        keep the smaller side of the frames at least PYRAMID_MIN_SIZE.
+    spatial_factor : int, optional
+        Downsampling factor of rows and columns between levels, by default 2.
+    time_factor : int, optional
+        Downsampling factor of frames between levels, by default 1 (no temporal
+        downsampling, as required e.g. by napari multiscale layers).
+    cache_dir : str or Path, optional
+        Folder of the cached levels, by default <movie name>.pyramid next to the movie.
+    chunk_frames : int, optional
+        Approximate number of frames decoded at once, by default
+        PYRAMID_CHUNK_FRAMES.
+
+    Returns
+    -------
+    list of Path
+        Cached .npy file of each coarse level (from level 1).
+    """
+    cache_dir = _cache_dir(movie, cache_dir)
+    n_levels = (
+        n_levels
+        if n_levels is not None
+        else _default_n_levels(movie.shape, spatial_factor)
+    )
+    # Chunks must cover whole time blocks of all levels:
+    coarsest_block = time_factor ** (n_levels - 1)
+    chunk_frames = max(chunk_frames // coarsest_block, 1) * coarsest_block
+
+    # Invalidate the previous cache, removing only the pyramid files:
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    (cache_dir / PYRAMID_MANIFEST).unlink(missing_ok=True)
+    for old_level_file in cache_dir.glob("level_*.npy"):
+        old_level_file.unlink()
+
+    level_files = [cache_dir / f"level_{level}.npy" for level in range(1, n_levels)]
+    level_arrays = [
+        np.lib.format.open_memmap(
+            level_file,
+            mode="w+",
+            dtype=movie.dtype,
+            shape=_level_shape(movie.shape, level, spatial_factor, time_factor),
+        )
+        for level, level_file in enumerate(level_files, start=1)
+    ]
+
+    for chunk_start, frames in movie.iter_chunks(chunk_frames=chunk_frames):
+        for level, level_array in enumerate(level_arrays, start=1):
+            # Each level is computed from the previous one:
+            frames = _bin_time(_bin_frames(frames, spatial_factor), time_factor)
+            level_start = chunk_start // time_factor**level
+            level_array[level_start : level_start + len(frames)] = frames
+
+    for level_array in level_arrays:
+        level_array.flush()
+    del level_arrays
+
+    # The manifest is written last, marking the cache as complete:
+    manifest = dict(
+        source=_source_signature(movie),
+        n_levels=n_levels,
+        spatial_factor=spatial_factor,
+        time_factor=time_factor,
+    )
+    (cache_dir / PYRAMID_MANIFEST).write_text(json.dumps(manifest))
+
+    return level_files
+
+
+def _cache_dir(movie, cache_dir=None):
+    if cache_dir is not None:
+        return Path(cache_dir)
+    source = Path(movie.source_filename)
+    return source.parent / (source.name + PYRAMID_SUFFIX)
+
+
+def _read_manifest(cache_dir):
+    try:
+        return json.loads((cache_dir / PYRAMID_MANIFEST).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def multiscale(
+    movie,
+    n_levels=None,
+    spatial_factor=2,
+    time_factor=1,
+    cache_dir=None,
+    rebuild=False,
+):
+    """Multiscale view of a movie: the movie itself, followed by its progressively
+    downsampled levels, read from the cache (built on the first request).
+
+    Parameters
+    ----------
+    movie : MovieData
+        Movie to view.
+    n_levels, spatial_factor, time_factor, cache_dir
+        See build_pyramid.
+    rebuild : bool, optional
+        If True, rebuild the cache even if it is valid, by default False. The cache
+        is rebuilt anyway if the movie or the parameters changed.
+
+    Returns
+    -------
+    list
+        The movie, followed by read-only memory-mapped arrays of the coarse levels.
+    """
+    cache_dir = _cache_dir(movie, cache_dir)
+    n_levels = (
+        n_levels
+        if n_levels is not None
+        else _default_n_levels(movie.shape, spatial_factor)
+    )
+
+    expected_manifest = dict(
+        source=_source_signature(movie),
+        n_levels=n_levels,
+        spatial_factor=spatial_factor,
+        time_factor=time_factor,
+    )
+    if rebuild or _read_manifest(cache_dir) != expected_manifest:
+        build_pyramid(
+            movie,
+            n_levels=n_levels,
+            spatial_factor=spatial_factor,
+            time_factor=time_factor,
+            cache_dir=cache_dir,
+        )
+
+    return [movie] + [
+        np.load(cache_dir / f"level_{level}.npy", mmap_mode="r")
+        for level in range(1, n_levels)
+    ]
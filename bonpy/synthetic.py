@@ -0,0 +1,318 @@
+"""Deterministic generation of fake Bonsai sessions, for load and scale testing
+without lab data. Sessions are written in the layout expected by LazyDataDict
+and Experiment.load_112023: <root>/<animal_id>/<YYYYMMDD>/<HHMMSS>/.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from bonpy.data_parsers import MOUSE_LOADER_DICT
+from bonpy.time_utils import TIMEZONE
+
+FIRST_SESSION_TIMESTAMP = datetime(2023, 12, 14, 16, 27, 20)
+FILE_TIMESTAMP_FORMAT = "%Y-%m-%dT%H_%M_%S"
+
+DLC_SCORER = "DLC_resnet50_syntheticJan1shuffle1_1000"
+EYE_BODYPARTS = (
+    [f"top-eyelid_{i}" for i in (1, 2, 3, 4)]
+    + ["bottom-eyelid_2", "bottom-eyelid_1"]
+    + [f"pupil_{i}" for i in range(1, 7)]
+)
+TOP_BODYPARTS = ["nose", "nose-l", "nose-r"]
+CAMERAS_BODYPARTS = {"eye": EYE_BODYPARTS, "top": TOP_BODYPARTS}
+
+LOW_LIKELIHOOD_FRACTION = 0.05  # fraction of DLC points with low likelihood
+LASER_MESSAGE = "30;10;6000"  # frequency; pulse width; stimulus duration
+
+
+def _bonsai_timestamps(session_timestamp, times_s):
+    """Format times from the session beginning as Bonsai timestamps
+    (e.g. 2023-12-14T16:27:20.0912384+01:00)."""
+    datetimes = (
+        pd.Timestamp(session_timestamp) + pd.to_timedelta(times_s, unit="s")
+    ).tz_localize(TIMEZONE)
+    utc_offsets = datetimes.strftime("%z")
+    return (
+        datetimes.strftime("%Y-%m-%dT%H:%M:%S.%f")
+        + "0"
+        + utc_offsets.str[:3]
+        + ":"
+        + utc_offsets.str[3:]
+    )
+
+
+class _SessionWriter:
+    """Write the files of a session sharing folder, timestamp and naming convention."""
+
+    def __init__(self, session_path, session_timestamp):
+        self.session_path = Path(session_path)
+        self.session_timestamp = session_timestamp
+        self.file_timestamp = session_timestamp.strftime(FILE_TIMESTAMP_FORMAT)
+
+    def filename(self, name, extension):
+        return self.session_path / f"{name}_{self.file_timestamp}.{extension}"
+
+    def write_csv(self, name, data_dict, times_s, timestamp_col="Timestamp"):
+        df = pd.DataFrame(data_dict, index=range(len(times_s)))
+        df[timestamp_col] = _bonsai_timestamps(self.session_timestamp, times_s)
+        df.to_csv(self.filename(name, "csv"), index=False)
+
+    def write_dlc(self, video_name, bodyparts, positions, likelihoods):
+        columns = pd.MultiIndex.from_product(
+            [[DLC_SCORER], bodyparts, ["x", "y", "likelihood"]],
+            names=["scorer", "bodyparts", "coords"],
+        )
+        values = np.stack(
+            [positions[..., 0], positions[..., 1], likelihoods], axis=-1
+        ).reshape(len(positions), -1)
+        filename = self.session_path / (
+            f"{video_name}_{self.file_timestamp}{DLC_SCORER}.h5"
+        )
+        # Same key and (chunked) table format of the files written by DLC:
+        pd.DataFrame(values, columns=columns).to_hdf(
+            filename, key="df_with_missing", mode="w", format="table"
+        )
+
+    def write_avi(self, name, fps, resolution, centers, background):
+        # Deferred import, so that sessions without movies do not need OpenCV:
+        import cv2
+
+        writer = cv2.VideoWriter(
+            str(self.filename(name, "avi")),
+            cv2.VideoWriter_fourcc(*"MJPG"),
+            fps,
+            resolution[::-1],
+        )
+        radius = max(min(resolution) // 12, 1)
+        for center in centers:
+            frame = background.copy()
+            cv2.circle(frame, (int(center[0]), int(center[1])), radius, 255, -1)
+            writer.write(cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR))
+        writer.release()
+
+
+def _pupil_trajectory(n_frames, fps, resolution, rng):
+    """Smooth random trajectory of the pupil center, in pixels."""
+    phases = rng.random(2) * 2 * np.pi
+    t = np.arange(n_frames) / fps
+    x = resolution[1] * (0.5 + 0.2 * np.sin(2 * np.pi * 0.1 * t + phases[0]))
+    y = resolution[0] * (0.5 + 0.1 * np.sin(2 * np.pi * 0.07 * t + phases[1]))
+    return np.stack([x, y], axis=1)
+
+
+def _dlc_positions(bodyparts, centers, resolution, rng):
+    """Positions of DLC bodyparts: pupil points around the pupil center,
+    other points at fixed positions, all with some noise."""
+    n_frames = len(centers)
+    positions = np.empty((n_frames, len(bodyparts), 2))
+    pupil_radius = min(resolution) / 12
+    n_pupil = sum(bodypart.startswith("pupil") for bodypart in bodyparts)
+    pupil_n = 0
+    for i, bodypart in enumerate(bodyparts):
+        if bodypart.startswith("pupil"):
+            angle = 2 * np.pi * pupil_n / n_pupil
+            positions[:, i] = centers + pupil_radius * np.array(
+                [np.cos(angle), np.sin(angle)]
+            )
+            pupil_n += 1
+        else:
+            positions[:, i] = rng.random(2) * np.array(resolution[::-1])
+    positions += rng.normal(scale=0.5, size=positions.shape)
+
+    likelihoods = 0.9 + 0.1 * rng.random((n_frames, len(bodyparts)))
+    low_likelihood = rng.random(likelihoods.shape) < LOW_LIKELIHOOD_FRACTION
+    likelihoods[low_likelihood] = 0.5 * rng.random(low_likelihood.sum())
+
+    return positions, likelihoods
+
+
+def generate_session(
+    root_path,
+    animal_id="M13",
+    session_timestamp=FIRST_SESSION_TIMESTAMP,
+    duration_s=60,
+    fps=30,
+    resolution=(240, 320),
+    ball_fs=100,
+    trial_interval_s=10,
+    write_movies=True,
+    seed=0,
+):
+    """Write all the files of a fake Bonsai session.
+
+    The session contains, for the eye and top cameras, timestamps csv, AVI movies and
+    DLC tracking; ball, laser and cube (motor for v01 animals) logs, with one trial
+    with laser stimulation every trial_interval_s seconds.
+
+    Parameters
+    ----------
+    root_path : str or Path
+        Root folder of the dataset.
+    animal_id : str, optional
+        Animal id; its loader version in MOUSE_LOADER_DICT defines the log formats.
+    session_timestamp : datetime, optional
+        Beginning of the session.
+    duration_s : float, optional
+        Duration of the session in seconds, by default 60.
+    fps : float, optional
+        Frame rate of the cameras, by default 30.
+    resolution : tuple, optional
+        (height, width) of the movies, by default (240, 320).
+    ball_fs : float, optional
+        Sampling rate of the ball log, by default 100.
+    trial_interval_s : float, optional
+        Interval between trials, by default 10.
+    write_movies : bool, optional
+        Whether to write the AVI movies (slowest part), by default True.
+    seed : int, optional
+        Seed of the random generator, by default 0.
+
+    Returns
+    -------
+    Path
+        Folder of the session.
+    """
+    session_path = (
+        Path(root_path)
+        / animal_id
+        / session_timestamp.strftime("%Y%m%d")
+        / session_timestamp.strftime("%H%M%S")
+    )
+    session_path.mkdir(parents=True, exist_ok=True)
+    writer = _SessionWriter(session_path, session_timestamp)
+    rng = np.random.default_rng(seed)
+    is_v01 = "motor_csv" in MOUSE_LOADER_DICT[animal_id]
+
+    n_frames = int(duration_s * fps)
+    frame_times = np.arange(n_frames) / fps + 0.4
+    for camera, bodyparts in CAMERAS_BODYPARTS.items():
+        centers = _pupil_trajectory(n_frames, fps, resolution, rng)
+        writer.write_csv(
+            f"{camera}-cam_timestamps",
+            dict(),
+            frame_times,
+            timestamp_col="FrameTimestamp",
+        )
+        writer.write_dlc(
+            f"{camera}-cam_video",
+            bodyparts,
+            *_dlc_positions(bodyparts, centers, resolution, rng),
+        )
+        if write_movies:
+            background = rng.integers(0, 50, resolution, dtype=np.uint8)
+            writer.write_avi(
+                f"{camera}-cam_video", fps, resolution, centers, background
+            )
+
+    ball_times = np.arange(int(duration_s * ball_fs)) / ball_fs + 0.09
+    writer.write_csv(
+        "ball-log",
+        {
+            c: 127 + rng.integers(-5, 6, len(ball_times))
+            for c in ["x0", "x1", "y0", "y1"]
+        },
+        ball_times,
+    )
+
+    # Initial centering, then alternating stimulus and reset movements:
+    trial_times = np.arange(
+        trial_interval_s / 2, duration_s - trial_interval_s / 2, trial_interval_s
+    )
+    movement_times = np.concatenate(
+        [[0.0], np.stack([trial_times, trial_times + trial_interval_s / 2], 1).ravel()]
+    )
+    writer.write_csv(
+        "motor-log" if is_v01 else "cube-positions",
+        {
+            "Value.Radius": rng.integers(3, 6, len(movement_times)),
+            "Value.Theta": rng.choice(np.linspace(0, np.pi, 6), len(movement_times)),
+            "Value.Direction": rng.integers(1, 3, len(movement_times)),
+        },
+        movement_times,
+    )
+    writer.write_csv(
+        "laser-log",
+        {("Value" if is_v01 else "LaserSerialMex"): [LASER_MESSAGE] * len(trial_times)},
+        trial_times + 0.01,
+    )
+
+    return session_path
+
+
+def _generate_session_kwargs(kwargs):
+    return generate_session(**kwargs)
+
+
+def generate_dataset(
+    root_path,
+    n_animals=1,
+    n_sessions=1,
+    animal_ids=None,
+    first_session_timestamp=FIRST_SESSION_TIMESTAMP,
+    workers=1,
+    seed=0,
+    **session_kwargs,
+):
+    """Write a dataset of fake Bonsai sessions, one per day for each animal.
+
+    Parameters
+    ----------
+    root_path : str or Path
+        Root folder of the dataset.
+    n_animals : int, optional
+        Number of animals, by default 1, at most the number of animals in
+        MOUSE_LOADER_DICT. Ignored if animal_ids is provided.
+    n_sessions : int, optional
+        Number of sessions for each animal, by default 1.
+    animal_ids : list of str, optional
+        Animal ids, by default the first n_animals of MOUSE_LOADER_DICT.
+    first_session_timestamp : datetime, optional
+        Beginning of the first session.
+    workers : int, optional
+        Number of processes writing sessions in parallel, by default 1.
+    seed : int, optional
+        Seed of the random generator, by default 0; each session gets a
+        different seed derived from it.
+    **session_kwargs
+        Other arguments of generate_session (duration_s, fps, resolution, ...).
+
+    Returns
+    -------
+    list of Path
+        Folders of all sessions.
+
+    Raises
+    ------
+    ValueError
+        If n_animals is larger than the number of animals in MOUSE_LOADER_DICT.
+    """
+    if animal_ids is None:
+        if n_animals > len(MOUSE_LOADER_DICT):
+            raise ValueError(
+                f"Cannot generate {n_animals} animals: only {len(MOUSE_LOADER_DICT)} "
+                "animal ids have a loader version in MOUSE_LOADER_DICT; pass "
+                "animal_ids explicitly."
+            )
+        animal_ids = list(MOUSE_LOADER_DICT.keys())[:n_animals]
+
+    all_kwargs = [
+        dict(
+            root_path=root_path,
+            animal_id=animal_id,
+            session_timestamp=first_session_timestamp + timedelta(days=session_n),
+            seed=seed + animal_n * n_sessions + session_n,
+            **session_kwargs,
+        )
+        for animal_n, animal_id in enumerate(animal_ids)
+        for session_n in range(n_sessions)
+    ]
+
+    if workers == 1:
+        return [generate_session(**kwargs) for kwargs in all_kwargs]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_generate_session_kwargs, all_kwargs))
@@ -2,7 +2,9 @@ import re
 
 import numpy as np
 import pandas as pd
-import pytz
+
+from bonpy.instrumentation import instrumented
+from bonpy.precision import is_compact
 
 TIMEZONE = "Europe/Rome"
 
@@ -14,7 +16,18 @@ def _is_timestamp_column(values):
     return all(re.match(timestamp_regex, str(x)) for x in values)
 
 
-def inplace_time_cols_fix_and_resample(df, timestamp_begin=None):
+def time_origin(timestamps, timestamp_begin=None):
+    """Time origin of a log: timestamp_begin localized in TIMEZONE if provided,
+    otherwise the first parsed timestamp."""
+    if timestamp_begin is None:
+        return timestamps[0]
+    return pd.to_datetime(timestamp_begin).tz_localize(TIMEZONE)
+
+
+@instrumented
+def inplace_time_cols_fix_and_resample(
+    df, timestamp_begin=None, time_offset=None, precision=None
+):
     timestamp_col = df.head().apply(_is_timestamp_column)
     timestamp_cols = timestamp_col[timestamp_col].index
 
@@ -29,16 +42,16 @@ def inplace_time_cols_fix_and_resample(df, timestamp_begin=None):
         # print(f"Found timestamp column: {timestamp_col}")
         df[timestamp_col] = pd.to_datetime(df[timestamp_col])
 
-        # Compute time offset:
-        if timestamp_begin is None:
-            time_offset = df[timestamp_col][0]
-        else:
-            time_offset = pd.to_datetime(timestamp_begin).tz_localize(
-                pytz.timezone(TIMEZONE)
-            )
+        # Compute time offset, unless it is fixed (e.g. when parsing a log in chunks):
+        if time_offset is None:
+            time_offset = time_origin(df[timestamp_col], timestamp_begin)
 
-        df["timedelta"] = df[timestamp_col] - time_offset
-        df["time"] = df["timedelta"].dt.total_seconds()
+        timedelta = df[timestamp_col] - time_offset
+        # The timedelta column duplicates the time index, and is kept only
+        # with full precision:
+        if not is_compact(precision):
+            df["timedelta"] = timedelta
+        df["time"] = timedelta.dt.total_seconds()
         df.set_index("time", inplace=True)
 
         df.drop([timestamp_col], axis=1, inplace=True)
@@ -81,3 +94,58 @@ def interpolate_df(input_df, new_timebin="10ms", from_zero=True):
     ).total_seconds()
 
     return resampled_df
+
+
+def match_events_to_intervals(event_times, starts, ends):
+    """Match events to [start, end] intervals, using np.searchsorted over the
+    sorted event times.
+
+    Intervals are matched in order of start time, each to the first event inside
+    it that was not matched to a previous interval, so that each event is matched
+    to at most one interval also when intervals overlap.
+
+    Parameters
+    ----------
+    event_times : np.ndarray
+        Times of the events. If not sorted, they will be sorted internally.
+    starts : np.ndarray
+        Start times of the intervals (inclusive).
+    ends : np.ndarray
+        End times of the intervals (inclusive).
+
+    Returns
+    -------
+    event_idxs : np.ndarray
+        For each interval, index in event_times of the event matched to it,
+        or -1 if no event is left to match in the interval.
+    n_events : np.ndarray
+        For each interval, number of events falling inside it (matched or not).
+    """
+    event_times = np.asarray(event_times)
+    starts = np.asarray(starts)
+    ends = np.asarray(ends)
+
+    sorting_idxs = None
+    if np.any(np.diff(event_times) < 0):
+        sorting_idxs = np.argsort(event_times, kind="stable")
+        event_times = event_times[sorting_idxs]
+
+    first_idxs = np.searchsorted(event_times, starts, side="left")
+    last_idxs = np.searchsorted(event_times, ends, side="right")
+    n_events = np.maximum(last_idxs - first_idxs, 0)
+
+    # Going through intervals by start time, all events between the start of the
+    # current interval and the last matched event are already matched, so the
+    # first free event is the one after the last matched, if inside the interval:
+    event_idxs = np.full(len(starts), -1)
+    last_matched = -1
+    for interval_idx in np.argsort(starts, kind="stable"):
+        event_idx = max(first_idxs[interval_idx], last_matched + 1)
+        if event_idx < last_idxs[interval_idx]:
+            event_idxs[interval_idx] = last_matched = event_idx
+
+    if sorting_idxs is not None:
+        has_event = event_idxs >= 0
+        event_idxs[has_event] = sorting_idxs[event_idxs[has_event]]
+
+    return event_idxs, n_events
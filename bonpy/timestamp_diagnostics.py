@@ -0,0 +1,323 @@
+"""Diagnostics of camera timestamps: inter-frame interval distribution, dropped
+frames, duplicate timestamps and clock drift.
+
+Frames are assigned to slots of a regular clock: consecutive frames normally take
+consecutive slots, a dropped-frames run leaves empty slots, and a duplicate
+timestamp shares the slot of the previous frame. The GapIndex stores only the
+frames where this mapping breaks, and can be used to map times to frames correctly
+in presence of drops (see MovieData.gap_index and the gap_index argument of
+smart_crop and crop_movie).
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from bonpy.crop_utils import _closest_idxs
+from bonpy.data_dict import EXECUTORS_DICT
+from bonpy.data_parsers import _load_csv
+
+# Intervals longer than GAP_THRESHOLD sampling intervals are runs of dropped frames:
+GAP_THRESHOLD = 1.5
+# Intervals shorter than DUPLICATE_THRESHOLD sampling intervals are duplicates:
+DUPLICATE_THRESHOLD = 0.1
+INTERVAL_PERCENTILES = (1, 5, 50, 95, 99)
+
+
+@dataclass
+class GapIndex:
+    """Compact mapping between frames and slots of the regular frame clock.
+
+    Times are mapped to slots relative to the closest frame, so that jitter and
+    drift of the timestamps do not accumulate over the session. This needs sorted
+    timestamps: for timestamps going back in time only the mapping between frames
+    and slots is available, and mapping times raises a ValueError.
+
+    Attributes
+    ----------
+    dt : float
+        Interval between slots, fit on the timestamps.
+    timestamps : np.ndarray
+        Time of each frame (not copied from the diagnosed array).
+    break_frames : np.ndarray
+        Frames not falling in the slot after the one of the previous frame
+        (first frame after a drop, or duplicate frame), sorted.
+    slot_offsets : np.ndarray
+        Offset between slot and frame index from each break frame on.
+    is_monotonic : bool
+        Whether the timestamps never go back in time.
+    """
+
+    dt: float
+    timestamps: np.ndarray
+    break_frames: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=int))
+    slot_offsets: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=int))
+    is_monotonic: bool = True
+
+    def __len__(self):
+        return len(self.break_frames)
+
+    @property
+    def n_frames(self):
+        return len(self.timestamps)
+
+    @property
+    def n_slots(self):
+        return self.n_frames + (int(self.slot_offsets[-1]) if len(self) else 0)
+
+    def _offsets(self, break_n):
+        """Slot offset after break_n breaks."""
+        return np.concatenate([[0], self.slot_offsets])[break_n]
+
+    def frame_to_slot(self, frames):
+        frames = np.asarray(frames)
+        return frames + self._offsets(
+            np.searchsorted(self.break_frames, frames, side="right")
+        )
+
+    def slot_to_frame(self, slots):
+        """Frame in each slot, or -1 for empty or out of range slots. If duplicate
+        frames share a slot, the last one is returned."""
+        slots = np.asarray(slots)
+        break_slots = self.break_frames + self.slot_offsets
+        break_n = np.searchsorted(break_slots, slots, side="right")
+        frames = slots - self._offsets(break_n)
+
+        # Frames computed for empty slots overflow onto the next break frame:
+        next_break = np.concatenate([self.break_frames, [self.n_frames]])[break_n]
+        valid = (slots >= 0) & (frames >= 0) & (frames < next_break)
+        return np.where(valid, frames, -1)
+
+    def time_to_slot(self, times):
+        if not self.is_monotonic:
+            raise ValueError(
+                "Timestamps go back in time, so times cannot be mapped to frames; "
+                "see TimestampDiagnostics.n_non_monotonic."
+            )
+        times = np.asarray(times)
+        closest_frames = _closest_idxs(self.timestamps, times)
+        return self.frame_to_slot(closest_frames) + np.round(
+            (times - self.timestamps[closest_frames]) / self.dt
+        ).astype(int)
+
+    def time_to_frame(self, times):
+        """Frame acquired at each time, or -1 if it was dropped or out of range."""
+        return self.slot_to_frame(self.time_to_slot(times))
+
+    def window_frames(self, times, window):
+        """Frames of windows around times, with -1 for dropped or out of range frames.
+
+        Parameters
+        ----------
+        times : np.ndarray
+            Times of the events, in seconds.
+        window : tuple
+            Window around the events, in seconds.
+
+        Returns
+        -------
+        window_pts : np.ndarray
+            Window in slots.
+        frames_mat : np.ndarray
+            Frames with shape (window, events).
+        """
+        window_pts = np.round(np.array(window) / self.dt).astype(int)
+        slots_mat = (
+            self.time_to_slot(times)
+            + np.arange(window_pts[0], window_pts[1])[:, np.newaxis]
+        )
+        return window_pts, self.slot_to_frame(slots_mat)
+
+
+@dataclass
+class TimestampDiagnostics:
+    """Results of diagnose_timestamps.
+
+    Attributes
+    ----------
+    n_frames : int
+        Number of timestamps.
+    nominal_dt : float
+        Expected sampling interval (median interval, if not specified).
+    fit_dt : float
+        Sampling interval of the linear fit of timestamps over clock slots.
+    drift_ppm : float
+        Difference between the fit and nominal intervals, in parts per million.
+    max_residual_s : float
+        Maximum deviation of timestamps from the linear fit.
+    interval_percentiles : dict
+        Percentiles of the inter-frame intervals.
+    n_duplicates : int
+        Number of timestamps closer than DUPLICATE_THRESHOLD intervals to the
+        previous one (including those going back in time).
+    n_non_monotonic : int
+        Number of timestamps earlier than the previous one.
+    n_gaps : int
+        Number of runs of dropped frames.
+    n_dropped : int
+        Total number of dropped frames.
+    longest_gap : int
+        Number of frames dropped in the longest run.
+    gap_index : GapIndex
+        Mapping between frames and clock slots.
+    """
+
+    n_frames: int
+    nominal_dt: float
+    fit_dt: float
+    drift_ppm: float
+    max_residual_s: float
+    interval_percentiles: dict
+    n_duplicates: int
+    n_non_monotonic: int
+    n_gaps: int
+    n_dropped: int
+    longest_gap: int
+    gap_index: GapIndex
+
+    def summary(self):
+        """Scalar diagnostics, as a dictionary (e.g. a row of a QC report)."""
+        summary = {
+            key: value
+            for key, value in self.__dict__.items()
+            if key not in ["interval_percentiles", "gap_index"]
+        }
+        for percentile, value in self.interval_percentiles.items():
+            summary[f"interval_p{percentile}"] = value
+        return summary
+
+    def dropped_runs(self):
+        """Runs of dropped frames.
+
+        Returns
+        -------
+        pd.DataFrame
+            For each run, the frame after it ("frame") and the number of frames
+            dropped before it ("n_dropped").
+        """
+        gap_index = self.gap_index
+        steps = np.diff(np.concatenate([[0], gap_index.slot_offsets]))
+        is_gap = steps > 0
+        return pd.DataFrame(
+            dict(frame=gap_index.break_frames[is_gap], n_dropped=steps[is_gap])
+        )
+
+
+def diagnose_timestamps(timestamps, expected_dt=None):
+    """Diagnose a timestamp array in a single vectorized pass.
+
+    Parameters
+    ----------
+    timestamps : np.ndarray or pd.DataFrame
+        Times of the frames, in seconds, or a timestamps dataframe indexed by time.
+    expected_dt : float, optional
+        Nominal sampling interval, by default the median interval.
+
+    Returns
+    -------
+    TimestampDiagnostics
+        Interval distribution, dropped runs, duplicates, clock drift and gap index.
+    """
+    if isinstance(timestamps, (pd.DataFrame, pd.Series)):
+        timestamps = timestamps.index.values
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    n_frames = len(timestamps)
+    assert n_frames > 1, "At least two timestamps are needed"
+
+    intervals = np.diff(timestamps)
+    nominal_dt = float(expected_dt if expected_dt is not None else np.median(intervals))
+
+    # Number of clock slots between consecutive frames:
+    is_duplicate = intervals < DUPLICATE_THRESHOLD * nominal_dt
+    is_gap = intervals > GAP_THRESHOLD * nominal_dt
+    steps = np.ones(n_frames - 1, dtype=np.int64)
+    steps[is_duplicate] = 0
+    steps[is_gap] = np.round(intervals[is_gap] / nominal_dt).astype(np.int64)
+
+    break_idxs = np.flatnonzero(steps != 1)
+    slot_offsets = np.cumsum(steps - 1)
+
+    # Linear fit of the timestamps over the slots, for drift and residual jitter:
+    slots = np.arange(n_frames) + np.concatenate([[0], slot_offsets])
+    fit_dt, t0 = np.polyfit(slots, timestamps, 1)
+    residuals = timestamps - (t0 + fit_dt * slots)
+
+    gap_index = GapIndex(
+        dt=float(fit_dt),
+        timestamps=timestamps,
+        break_frames=break_idxs + 1,
+        slot_offsets=slot_offsets[break_idxs],
+        is_monotonic=not (intervals < 0).any(),
+    )
+    dropped = steps[is_gap] - 1
+
+    return TimestampDiagnostics(
+        n_frames=n_frames,
+        nominal_dt=nominal_dt,
+        fit_dt=float(fit_dt),
+        drift_ppm=float((fit_dt / nominal_dt - 1) * 1e6),
+        max_residual_s=float(np.abs(residuals).max()),
+        interval_percentiles=dict(
+            zip(INTERVAL_PERCENTILES, np.percentile(intervals, INTERVAL_PERCENTILES))
+        ),
+        n_duplicates=int(is_duplicate.sum()),
+        n_non_monotonic=int((intervals < 0).sum()),
+        n_gaps=int(is_gap.sum()),
+        n_dropped=int(dropped.sum()),
+        longest_gap=int(dropped.max()) if len(dropped) else 0,
+        gap_index=gap_index,
+    )
+
+
+def _diagnose_timestamps_file(file, expected_dt=None):
+    """Diagnose a timestamps csv file. Module-level to be usable in a process pool."""
+    timestamps_df = _load_csv(file, precision="compact")
+    return diagnose_timestamps(timestamps_df, expected_dt=expected_dt).summary()
+
+
+def _to_timestamp_files(files):
+    """Normalize the files specification to a list of timestamps csv files."""
+    if isinstance(files, pd.DataFrame):
+        # Results of a Catalog files query:
+        files = files.loc[files["key"].str.endswith("timestamps"), "path"]
+    return [Path(f) for f in files]
+
+
+def timestamps_qc(files, expected_dt=None, workers=None, executor="process"):
+    """Diagnose many timestamps files in parallel, for QC reports.
+
+    Parameters
+    ----------
+    files : list or pd.DataFrame
+        Timestamps csv files, or the result of Catalog.files (in which case the
+        files with keys ending in "timestamps" are used).
+    expected_dt : float, optional
+        Nominal sampling interval, by default the median interval of each file.
+    workers : int, optional
+        Number of parallel workers, by default the executor default.
+    executor : str, optional
+        Either "process" or "thread", by default "process".
+
+    Returns
+    -------
+    report_df : pd.DataFrame
+        One row per file, with the TimestampDiagnostics summary.
+    failures : dict
+        Error message for each file that could not be diagnosed.
+    """
+    files = _to_timestamp_files(files)
+
+    rows, failures = [], dict()
+    with EXECUTORS_DICT[executor](max_workers=workers) as pool:
+        futures = [
+            pool.submit(_diagnose_timestamps_file, file, expected_dt) for file in files
+        ]
+        for file, future in zip(files, futures):
+            try:
+                rows.append(dict(path=str(file), **future.result()))
+            except Exception as e:
+                failures[file] = f"{type(e).__name__}: {e}"
+
+    return pd.DataFrame(rows), failures
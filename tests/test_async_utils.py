@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bonpy.async_utils import InFlightCalls, hashable_index
+from bonpy.data_dict import LazyDataDict
+from bonpy.experiment import Experiment
+from bonpy.moviedata import OpenCVMovieData
+
+
+class _CountingLoader:
+    def __init__(self, loader, delay_s=0.05):
+        self.loader = loader
+        self.delay_s = delay_s
+        self.n_calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            self.n_calls += 1
+        time.sleep(self.delay_s)
+        return self.loader(*args, **kwargs)
+
+
+def test_in_flight_calls_deduplication():
+    in_flight = InFlightCalls()
+    loader = _CountingLoader(lambda x: x * 2)
+
+    async def _run():
+        return await asyncio.gather(
+            *[in_flight.run("key", loader, 21) for _ in range(5)],
+            in_flight.run("other_key", loader, 1),
+        )
+
+    assert asyncio.run(_run()) == [42] * 5 + [2]
+    assert loader.n_calls == 2
+    assert len(in_flight) == 0
+
+
+def test_in_flight_cancelled_client():
+    in_flight = InFlightCalls()
+
+    async def _run():
+        cancelled = asyncio.ensure_future(in_flight.run("key", time.sleep, 0.05))
+        waiting = asyncio.ensure_future(in_flight.run("key", time.sleep, 0.05))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        return await waiting
+
+    assert asyncio.run(_run()) is None
+
+
+def test_aget(asset_moviedata_folder):
+    data_dict = LazyDataDict(asset_moviedata_folder)
+    loader = _CountingLoader(data_dict.loader_dict["ball_csv"])
+    data_dict.loader_dict["ball_csv"] = loader
+
+    async def _run():
+        return await asyncio.gather(
+            *[data_dict.aget("ball-log_ball") for _ in range(4)]
+        )
+
+    results = asyncio.run(_run())
+    assert loader.n_calls == 1
+    assert all(result is data_dict.data["ball-log_ball"] for result in results)
+    assert asyncio.run(data_dict.aget("ball-log_ball")) is results[0]
+
+
+def test_aget_executor(asset_moviedata_folder):
+    data_dict = LazyDataDict(asset_moviedata_folder)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        laser_df = asyncio.run(data_dict.aget("laser-log_laser", executor=executor))
+
+    pd.testing.assert_frame_equal(
+        laser_df, LazyDataDict(asset_moviedata_folder)["laser-log_laser"]
+    )
+
+
+def test_atrials_df(asset_moviedata_folder):
+    exp = Experiment.load_112023(asset_moviedata_folder)
+
+    async def _run():
+        return await asyncio.gather(exp.atrials_df(), exp.atrials_df())
+
+    trials_dfs = asyncio.run(_run())
+    assert trials_dfs[0] is trials_dfs[1]
+    pd.testing.assert_frame_equal(
+        trials_dfs[0], Experiment.load_112023(asset_moviedata_folder).trials_df
+    )
+
+
+def test_aread(asset_moviedata_file):
+    mdata = OpenCVMovieData(asset_moviedata_file)
+
+    async def _run():
+        return await asyncio.gather(
+            mdata.aread(slice(10, 20)), mdata.aread(slice(10, 20)), mdata.aread([3, 4])
+        )
+
+    frames = asyncio.run(_run())
+    assert frames[0] is frames[1]
+    assert np.array_equal(frames[0], mdata[10:20])
+    assert np.array_equal(frames[2], mdata[[3, 4]])
+
+
+@pytest.mark.parametrize(
+    "idx_a, idx_b, same",
+    [
+        (slice(0, 10), slice(0, 10), True),
+        (slice(0, 10), slice(0, 11), False),
+        ([1, 2], np.array([1, 2]), True),
+        (([1, 2], slice(None), slice(0, 5)), ([1, 2], slice(None), slice(0, 5)), True),
+        (3, np.int64(3), True),
+    ],
+)
+def test_hashable_index(idx_a, idx_b, same):
+    assert (hashable_index(idx_a) == hashable_index(idx_b)) == same
+    hash(hashable_index(idx_a))
@@ -0,0 +1,44 @@
+import shutil
+
+import pytest
+
+from bonpy.batch import load_trials_batch
+from bonpy.catalog import Catalog
+from bonpy.experiment import Experiment
+
+
+@pytest.mark.parametrize("executor", ["process", "thread"])
+def test_load_trials_batch(asset_moviedata_folder, tmp_path, executor):
+    missing_session = tmp_path / "M13" / "20231215" / "101010"
+
+    trials_df, failures = load_trials_batch(
+        [asset_moviedata_folder, missing_session, asset_moviedata_folder],
+        workers=2,
+        max_pending=1,
+        executor=executor,
+    )
+
+    assert trials_df.shape == (2 * 144, 15)
+    assert trials_df["animal_id"].unique().tolist() == ["M13"]
+    assert trials_df["session_id"].unique().tolist() == ["20231214/162720"]
+    assert (trials_df["time"].values[:144] == trials_df["time"].values[144:]).all()
+    assert list(failures.keys()) == [missing_session]
+    assert "FileNotFoundError" in failures[missing_session]
+
+
+def test_load_trials_batch_sources(asset_moviedata_folder, tmp_path):
+    dataset_root = tmp_path / "test_dataset"
+    shutil.copytree(asset_moviedata_folder.parent.parent.parent, dataset_root)
+
+    with Catalog(dataset_root) as catalog:
+        catalog.scan()
+        from_catalog, failures = load_trials_batch(
+            catalog.sessions(), executor="thread"
+        )
+    assert failures == dict()
+
+    from_experiments, _ = load_trials_batch(
+        [Experiment.load_112023(asset_moviedata_folder)], executor="thread"
+    )
+
+    assert from_catalog.equals(from_experiments)
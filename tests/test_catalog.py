@@ -0,0 +1,93 @@
+import shutil
+
+import pytest
+
+from bonpy.catalog import Catalog, default_index_path
+from bonpy.experiment import Experiment
+
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch):
+    # Keep the default index files out of the user cache folder:
+    cache_home = tmp_path / "cache"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache_home))
+    return cache_home
+
+
+@pytest.fixture
+def dataset_root(asset_moviedata_folder, tmp_path):
+    # Copy the test dataset adding a second session, to test queries:
+    dataset_root = tmp_path / "test_dataset"
+    shutil.copytree(asset_moviedata_folder.parent.parent.parent, dataset_root)
+    session_2 = dataset_root / "M13" / "20231215" / "101010"
+    shutil.copytree(asset_moviedata_folder, session_2)
+    (session_2 / "eye-cam_timestamps_2023-12-14T16_27_20.csv").write_text(
+        "FrameTimestamp\n2023-12-15T10:10:10.4273024+01:00\n"
+    )
+    return dataset_root
+
+
+def test_catalog_scan(dataset_root):
+    with Catalog(dataset_root) as catalog:
+        result = catalog.scan()
+        assert result == dict(updated=20, removed=0)
+        assert len(catalog) == 2
+
+        # Rescanning does not re-read unchanged files:
+        assert catalog.scan() == dict(updated=0, removed=0)
+
+        session_path = dataset_root / "M13" / "20231215" / "101010"
+        (session_path / "random_format.vsc").unlink()
+        (session_path / "ball-log_2023-12-14T16_27_20.csv").write_text("x0,Timestamp\n")
+        assert catalog.scan() == dict(updated=1, removed=1)
+
+
+def test_catalog_index_persistence(dataset_root, cache_home, tmp_path):
+    with Catalog(dataset_root) as catalog:
+        catalog.scan()
+        # The index is saved locally, not in the data root:
+        assert catalog.index_path == default_index_path(dataset_root)
+        assert catalog.index_path.is_relative_to(cache_home)
+        assert not any(path.suffix == ".sqlite" for path in dataset_root.iterdir())
+
+    with Catalog(dataset_root) as catalog:
+        assert len(catalog) == 2
+        assert catalog.scan() == dict(updated=0, removed=0)
+
+    index_path = tmp_path / "custom" / "catalog.sqlite"
+    with Catalog(dataset_root, index_path=index_path) as catalog:
+        assert len(catalog) == 0
+        catalog.scan()
+    assert index_path.exists()
+
+
+def test_catalog_queries(dataset_root):
+    with Catalog(dataset_root) as catalog:
+        catalog.scan()
+
+        files_df = catalog.files(dates=("20231214", "20231214"))
+        assert len(files_df) == 10
+        timestamps = files_df.set_index("key").loc["eye-cam_timestamps"]
+        assert timestamps["category"] == "csv"
+        assert timestamps["n_rows"] == 500
+
+        assert len(catalog.sessions(animals=["M13", "M14"])) == 2
+        assert len(catalog.sessions(animals="M21")) == 0
+        assert len(catalog.sessions(has_categories=["eye_DLC_h5"])) == 2
+        assert len(catalog.sessions(has_keys=["not-a-key"])) == 0
+
+        assert len(catalog.sessions(dates=("20231215", "20231231"))) == 1
+        for dates in ["20231214", ("20231214",)]:
+            with pytest.raises(ValueError):
+                catalog.sessions(dates=dates)
+
+        sessions_df = catalog.sessions(
+            has_categories=["eye_DLC_h5"], min_rows={"eye-cam_timestamps": 100}
+        )
+        assert sessions_df["session"].tolist() == ["162720"]
+
+        experiments = catalog.experiments(min_rows={"eye-cam_timestamps": 100})
+        assert len(experiments) == 1
+        assert isinstance(experiments[0], Experiment)
+        assert experiments[0].metadata.session_id == "20231214/162720"
+        assert experiments[0].metadata.paradigm_id == "test_dataset"
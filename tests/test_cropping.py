@@ -2,7 +2,14 @@ import numpy as np
 import pandas as pd
 import pytest
 
-from bonpy.crop_utils import crop_around_idxs, smart_crop
+from bonpy import crop_utils
+from bonpy.crop_utils import (
+    crop_around_idxs,
+    crop_movie,
+    event_average,
+    smart_crop,
+)
+from bonpy.moviedata import OpenCVMovieData
 
 
 @pytest.mark.parametrize("filling", [np.nan, -1])
@@ -169,3 +176,244 @@ def test_jitter_issues():
         )
 
     assert "jitter" in str(e.value)
+
+
+@pytest.mark.parametrize(
+    "idxs", [np.array([2, 20, 38]), np.array([5, 20, 29]), np.array([1, 20, 99])]
+)
+@pytest.mark.parametrize("tocrop", [np.arange(100), np.arange(200).reshape(100, 2)])
+def test_crop_around_idxs_view(idxs, tocrop):
+    copy_crop = crop_around_idxs(tocrop, idxs, [-2, 2])
+    view_crop = crop_around_idxs(tocrop, idxs, [-2, 2], view=True)
+
+    assert view_crop.shape == copy_crop.shape
+    assert np.allclose(view_crop, copy_crop, equal_nan=True)
+
+
+def test_crop_around_idxs_view_no_copy():
+    tocrop = np.arange(200).reshape(100, 2)
+
+    # Evenly spaced windows in range are a read-only view:
+    cropped = crop_around_idxs(tocrop, np.array([2, 20, 38]), [-2, 2], view=True)
+    assert np.shares_memory(cropped, tocrop)
+    assert not cropped.flags.writeable
+    assert cropped.dtype == tocrop.dtype
+
+    # Unevenly spaced windows are copied, without casting:
+    cropped = crop_around_idxs(tocrop, np.array([5, 20, 29]), [-2, 2], view=True)
+    assert not np.shares_memory(cropped, tocrop)
+    assert cropped.dtype == tocrop.dtype
+
+    # Windows out of range are filled:
+    cropped = crop_around_idxs(tocrop, np.array([1, 20]), [-2, 2], view=True)
+    assert cropped.dtype == float
+    assert np.isnan(cropped[0, 0]).all()
+
+
+def test_time_crop_df_view():
+    test_2d_df = pd.DataFrame(
+        data=np.arange(len(x_arr) * 2).reshape(-1, len_2nd_dim),
+        columns=columns,
+        index=x_arr,
+    )
+
+    timebase, cropped_dict = smart_crop(
+        test_2d_df, crop_events=crop_events, window=window
+    )
+    _, cropped_data = smart_crop(
+        test_2d_df, crop_events=crop_events, window=window, view=True
+    )
+
+    assert cropped_data.shape == (len(timebase), len(crop_events), len_2nd_dim)
+    for i, column in enumerate(columns):
+        assert np.allclose(cropped_data[..., i], cropped_dict[column], equal_nan=True)
+
+
+@pytest.mark.parametrize("memmap", [False, True])
+def test_crop_movie(asset_moviedata_file, tmp_path, memmap):
+    movie = OpenCVMovieData(asset_moviedata_file)
+    time_arr = movie.timestamps.index.values
+    events = time_arr[[1, 100, 110, 498]] + 0.001
+
+    memmap_filename = tmp_path / "clips.npy" if memmap else None
+    timebase, clips = crop_movie(
+        movie, events, (-0.1, 0.1), memmap_filename=memmap_filename
+    )
+
+    assert clips.shape == (len(timebase), len(events), 240, 320)
+    assert timebase[0] < 0 < timebase[-1]
+
+    zero_idx = np.argmin(np.abs(timebase))
+    assert np.array_equal(clips[zero_idx], movie[[1, 100, 110, 498]])
+    assert np.array_equal(clips[zero_idx + 1, :3], movie[[2, 101, 111]])
+
+    # Out of range frames are filled:
+    assert (clips[0, 0] == 0).all()
+    assert (clips[-1, -1] == 0).all()
+
+    if memmap:
+        assert np.array_equal(np.load(memmap_filename), clips)
+
+
+def test_crop_movie_drop(asset_moviedata_file):
+    movie = OpenCVMovieData(asset_moviedata_file)
+    time_arr = movie.timestamps.index.values
+
+    _, clips = crop_movie(
+        movie, time_arr[[1, 100, 498]], (-0.1, 0.1), out_of_range_drop=True
+    )
+    assert clips.shape[1] == 1
+
+
+@pytest.mark.parametrize("chunk_events", [1, 2, 64])
+def test_event_average(chunk_events):
+    np.random.seed(42)
+    test_data = np.random.rand(len(x_arr), 2)
+    test_data[np.random.rand(len(x_arr)) > 0.9, 0] = np.nan
+    events = np.array([0.05, 2, 3.5, 5, 9.95])
+
+    timebase, cropped = smart_crop(test_data, crop_events=events, window=window, dt=dt)
+    _, event_stats = event_average(
+        test_data, events, window, dt=dt, chunk_events=chunk_events
+    )
+
+    assert set(event_stats.keys()) == {"mean", "std", "sem", "n"}
+    assert event_stats["mean"].shape == (len(timebase), 2)
+    assert np.allclose(event_stats["mean"], np.nanmean(cropped, axis=1))
+    assert np.allclose(event_stats["std"], np.nanstd(cropped, axis=1, ddof=1))
+    n = np.sum(~np.isnan(cropped), axis=1)
+    assert np.array_equal(event_stats["n"], n)
+    assert np.allclose(
+        event_stats["sem"], np.nanstd(cropped, axis=1, ddof=1) / np.sqrt(n)
+    )
+
+
+def test_event_average_df():
+    test_2d_df = pd.DataFrame(
+        data=np.arange(len(x_arr) * 2).reshape(-1, len_2nd_dim),
+        columns=columns,
+        index=x_arr,
+    )
+
+    timebase, event_stats = event_average(
+        test_2d_df, crop_events, window, stats=("mean",)
+    )
+
+    assert list(event_stats.keys()) == ["mean"]
+    assert list(event_stats["mean"].columns) == columns
+    assert np.allclose(event_stats["mean"].index, timebase)
+    _, cropped = smart_crop(test_2d_df, crop_events=crop_events, window=window)
+    assert np.allclose(
+        event_stats["mean"][columns[0]], np.nanmean(cropped[columns[0]], axis=1)
+    )
+
+
+def test_event_average_movie(asset_moviedata_file):
+    movie = OpenCVMovieData(asset_moviedata_file)
+    events = movie.timestamps.index.values[[1, 100, 110, 498]]
+
+    timebase, clips = crop_movie(movie, events, (-0.1, 0.1))
+    _, event_stats = event_average(movie, events, (-0.1, 0.1), chunk_frames=7)
+
+    # Out of range frames are excluded:
+    frame_offsets = np.round(timebase / np.mean(np.diff(movie.timestamps.index)))
+    clips = clips.astype(float)
+    clips[frame_offsets < -1, 0] = np.nan
+    clips[frame_offsets > 1, -1] = np.nan
+    assert event_stats["mean"].shape == clips[:, 0].shape
+    assert np.allclose(event_stats["mean"], np.nanmean(clips, axis=1))
+    assert np.allclose(event_stats["std"], np.nanstd(clips, axis=1, ddof=1))
+
+
+@pytest.mark.parametrize("out_of_range_drop", [False, True])
+def test_interpolated_crop(out_of_range_drop):
+    np.random.seed(42)
+    # Very jittery time array, that would fail the jitter check:
+    time_arr = np.sort(np.random.rand(2000) * 10)
+    test_df = pd.DataFrame(
+        data=np.stack([2 * time_arr + 1, -time_arr], axis=1),
+        columns=columns,
+        index=time_arr,
+    )
+
+    timebase, cropped_data = smart_crop(
+        test_df,
+        crop_events=crop_events,
+        window=window,
+        dt=dt,
+        interpolate=True,
+        out_of_range_drop=out_of_range_drop,
+    )
+
+    assert np.allclose(timebase, np.arange(*window, dt))
+    expected_events = crop_events[1:] if out_of_range_drop else crop_events
+    expected_times = expected_events + timebase[:, np.newaxis]
+    expected = 2 * expected_times + 1
+    expected[expected_times < time_arr[0]] = np.nan
+
+    assert cropped_data[columns[0]].shape == (len(timebase), len(expected_events))
+    assert np.allclose(cropped_data[columns[0]], expected, equal_nan=True)
+    assert np.allclose(cropped_data[columns[1]], (1 - expected) / 2, equal_nan=True)
+
+
+def test_interpolated_crop_array():
+    test_2d_arr = np.arange(len(x_arr) * 2).reshape(-1, len_2nd_dim)
+
+    timebase, cropped_data = smart_crop(
+        test_2d_arr, crop_events=crop_events, window=window, dt=dt, interpolate=True
+    )
+    _, expected = smart_crop(test_2d_arr, crop_events=crop_events, window=window, dt=dt)
+
+    assert cropped_data.shape == (len(timebase), len(crop_events), len_2nd_dim)
+    # Events are on the sampling grid:
+    assert np.allclose(cropped_data, expected, equal_nan=True)
+
+
+@pytest.mark.parametrize("interpolate", [False, True])
+def test_multi_crop(interpolate, monkeypatch):
+    fast_time = np.arange(0, 10, dt / 10)
+    slow_time = np.arange(0, 10, dt * 3)
+    fast_df = pd.DataFrame(
+        data=np.stack([fast_time, 2 * fast_time], axis=1),
+        columns=columns,
+        index=fast_time,
+    )
+    fast_series = pd.Series(-fast_time, index=fast_time)
+
+    # Count how many time bases are mapped:
+    mapper = "_interp_weights" if interpolate else "_closest_idxs"
+    n_mappings = []
+    original_mapper = getattr(crop_utils, mapper)
+    monkeypatch.setattr(
+        crop_utils,
+        mapper,
+        lambda *args: n_mappings.append(1) or original_mapper(*args),
+    )
+
+    timebase, cropped = crop_utils.multi_crop(
+        dict(fast=fast_df, fast_series=fast_series, slow=(slow_time, slow_time.copy())),
+        crop_events,
+        window,
+        dt=dt,
+        interpolate=interpolate,
+    )
+
+    assert len(n_mappings) == 2
+    assert np.allclose(timebase, np.arange(*window, dt))
+    assert set(cropped.keys()) == {"fast", "fast_series", "slow"}
+    assert set(cropped["fast"].keys()) == set(columns)
+
+    target_times = crop_events + timebase[:, np.newaxis]
+    expected = np.where(target_times < 0, np.nan, target_times)
+    assert np.allclose(cropped["fast"][columns[0]], expected, equal_nan=True)
+    assert np.allclose(cropped["fast"][columns[1]], 2 * expected, equal_nan=True)
+    assert np.allclose(cropped["fast_series"], -expected, equal_nan=True)
+
+    # Slow stream is sampled on the shared timebase:
+    assert cropped["slow"].shape == (len(timebase), len(crop_events))
+    if interpolate:
+        assert np.allclose(cropped["slow"], expected, equal_nan=True)
+    else:
+        # Closest samples are valid up to half sampling interval out of the range:
+        expected = np.where(target_times < -dt * 3 / 2, np.nan, target_times)
+        assert np.allclose(cropped["slow"], expected, atol=dt * 3 / 2, equal_nan=True)
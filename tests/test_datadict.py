@@ -1,3 +1,5 @@
+import pytest
+
 from bonpy.data_dict import LazyDataDict
 
 
@@ -30,3 +32,28 @@ def test_lazy_loading(asset_moviedata_folder):
 
     for key in data_dict.keys():
         assert key in data_dict.data
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_preload(asset_moviedata_folder, executor):
+    data_dict = LazyDataDict(asset_moviedata_folder)
+
+    timings = data_dict.preload(workers=2, executor=executor)
+
+    assert set(timings.keys()) == set(data_dict.keys())
+    assert all(t >= 0 for t in timings.values())
+    for key in data_dict.keys():
+        assert key in data_dict.data
+    assert data_dict["ball-log_ball"].shape == (1000, 5)
+
+    # Already loaded keys are not loaded again:
+    assert data_dict.preload(executor=executor) == dict()
+
+
+def test_preload_keys(asset_moviedata_folder):
+    data_dict = LazyDataDict(asset_moviedata_folder)
+
+    timings = data_dict.preload(keys=["ball-log_ball", "laser-log_laser"])
+
+    assert set(timings.keys()) == {"ball-log_ball", "laser-log_laser"}
+    assert set(data_dict.data.keys()) == {"ball-log_ball", "laser-log_laser"}
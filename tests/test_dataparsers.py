@@ -1,7 +1,9 @@
 import numpy as np
 import pandas as pd
+import pytest
 
 from bonpy.data_parsers import (
+    PUPIL_FEATURES,
     _load_avi,
     _load_ball_log_csv,
     _load_csv,
@@ -10,6 +12,12 @@ from bonpy.data_parsers import (
     _load_laser_log_csv,
     _load_pupil_dlc_h5,
     load_dlc_h5,
+    load_pupil_dlc_h5_streaming,
+)
+from bonpy.synthetic import (
+    EYE_BODYPARTS,
+    FIRST_SESSION_TIMESTAMP,
+    _SessionWriter,
 )
 
 
@@ -142,3 +150,41 @@ def test_pupil_dlc_loading(asset_moviedata_folder):
         names=["bodyparts", "coords"],
     )
     assert all(pupil_dlc.columns == cols)
+
+
+def _pupil_features_reference(file):
+    pupil_dlc = _load_pupil_dlc_h5(file)
+    reference_df = pupil_dlc[[(c, "") for c in PUPIL_FEATURES]]
+    reference_df.columns = PUPIL_FEATURES
+    return reference_df
+
+
+@pytest.mark.parametrize("block_rows", [1, 64, 499, 10000])
+def test_pupil_dlc_streaming_loading(asset_moviedata_folder, block_rows):
+    file = (
+        asset_moviedata_folder
+        / "eye-cam_video_2023-12-14T16_27_20DLC_resnet50_eye-pupilDec16shuffle1_15000.h5"
+    )
+    pupil_df = load_pupil_dlc_h5_streaming(file, block_rows=block_rows)
+
+    assert pupil_df.columns.tolist() == PUPIL_FEATURES
+    pd.testing.assert_frame_equal(pupil_df, _pupil_features_reference(file))
+
+
+@pytest.mark.parametrize("block_rows", [3, 50, 1000])
+def test_pupil_dlc_streaming_missing_points(tmp_path, block_rows):
+    n_frames = 300
+    rng = np.random.default_rng(0)
+    positions = 100 + 10 * rng.random((n_frames, len(EYE_BODYPARTS), 2))
+    likelihoods = rng.random((n_frames, len(EYE_BODYPARTS)))
+    likelihoods[:20, 0] = 0  # leading missing values
+    likelihoods[90:210, 6] = 0  # missing values across blocks
+    likelihoods[250:, 7] = 0  # trailing missing values
+    likelihoods[140:160, :] = 0  # frames with no valid point
+
+    writer = _SessionWriter(tmp_path, FIRST_SESSION_TIMESTAMP)
+    writer.write_dlc("eye-cam_video", EYE_BODYPARTS, positions, likelihoods)
+    file = next(tmp_path.glob("*.h5"))
+
+    pupil_df = load_pupil_dlc_h5_streaming(file, block_rows=block_rows)
+    pd.testing.assert_frame_equal(pupil_df, _pupil_features_reference(file))
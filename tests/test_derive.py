@@ -0,0 +1,88 @@
+import cv2
+import numpy as np
+import pytest
+
+from bonpy.derive import (
+    DERIVED_FOLDER,
+    _bin_frames,
+    derive_movie,
+    derive_movies,
+)
+from bonpy.moviedata import OpenCVMovieData
+
+# Mean absolute difference allowed for the JPEG compression of derived movies:
+COMPRESSION_ATOL = 5
+
+
+def test_bin_frames():
+    frames = np.arange(2 * 5 * 4, dtype=np.uint8).reshape(2, 5, 4)
+    binned = _bin_frames(frames, 2)
+    assert binned.shape == (2, 2, 2)
+    assert binned.dtype == np.uint8
+    assert binned[0, 0, 0] == np.round(np.mean([0, 1, 4, 5]))
+
+    color_frames = np.stack([frames] * 3, axis=-1)
+    assert _bin_frames(color_frames, 2).shape == (2, 2, 2, 3)
+    assert _bin_frames(frames, 1) is frames
+
+
+def test_derive_movie(asset_moviedata_file, tmp_path):
+    source = OpenCVMovieData(asset_moviedata_file)
+    out = tmp_path / asset_moviedata_file.name
+
+    derived = derive_movie(
+        asset_moviedata_file, rows=(20, 120), cols=(40, 200), binning=2, out=out
+    )
+    assert isinstance(derived, OpenCVMovieData)
+    assert derived.source_filename == out
+    assert derived.shape == (source.shape[0], 50, 80)
+    assert derived.is_bw
+
+    expected = _bin_frames(source[:, 20:120, 40:200], 2)
+    difference = np.abs(derived[:].astype(float) - expected)
+    assert difference.mean() < COMPRESSION_ATOL
+
+    # Timestamps are copied following the naming convention:
+    assert derived.has_timestamps
+    assert derived.timestamp_filename.parent == tmp_path
+    np.testing.assert_array_equal(
+        derived.timestamps.index.values, source.timestamps.index.values
+    )
+
+
+def test_derive_movie_grayscale(tmp_path):
+    source_file = tmp_path / "color_video.avi"
+    writer = cv2.VideoWriter(
+        str(source_file), cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48)
+    )
+    rng = np.random.default_rng(0)
+    for _ in range(10):
+        frame = np.zeros((48, 64, 3), dtype=np.uint8)
+        frame[..., 2] = rng.integers(100, 200)  # red, varying across frames
+        writer.write(frame)
+    writer.release()
+    assert not OpenCVMovieData(source_file).is_bw
+
+    derived = derive_movie(source_file, grayscale=True)
+    assert derived.source_filename == tmp_path / DERIVED_FOLDER / "color_video.avi"
+    assert derived.is_bw
+    assert derived.shape == (10, 48, 64)
+    assert not derived.has_timestamps
+
+    with pytest.raises(AssertionError):
+        derive_movie(source_file, out=source_file)
+
+
+def test_derive_movies(asset_moviedata_file, tmp_path):
+    missing_file = tmp_path / "missing_video.avi"
+    derived, failures = derive_movies(
+        [asset_moviedata_file, missing_file],
+        out_folder=tmp_path / "derived",
+        executor="thread",
+        binning=4,
+    )
+    assert derived == {
+        asset_moviedata_file: tmp_path / "derived" / asset_moviedata_file.name
+    }
+    assert OpenCVMovieData(derived[asset_moviedata_file]).shape == (500, 60, 80)
+    assert list(failures.keys()) == [missing_file]
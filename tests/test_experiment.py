@@ -1,6 +1,9 @@
 from datetime import datetime
 
-from bonpy.experiment import Experiment
+import numpy as np
+import pandas as pd
+
+from bonpy.experiment import Experiment, preload_experiments
 
 # filepath = "/Users/vigji/code/bonpy/tests/assets/test_dataset/M1/20231201/095001"
 
@@ -14,3 +17,37 @@ def test_experiment_loading_112023(asset_moviedata_folder):
     assert exp.metadata.paradigm_id == "test_dataset"
     assert exp.metadata.session_id == "20231214/162720"
     assert exp.size_gb >= 0.0011
+
+
+def test_preload_experiments(asset_moviedata_folder):
+    exps = [Experiment.load_112023(asset_moviedata_folder) for _ in range(2)]
+
+    timings = preload_experiments(exps, keys=["laser-log_laser", "cube-positions_cube"])
+
+    assert len(timings) == 2
+    for exp, exp_timings in zip(exps, timings):
+        assert set(exp_timings.keys()) == {"laser-log_laser", "cube-positions_cube"}
+        assert "laser-log_laser" in exp.data_dict.data
+
+
+def test_trials_df(asset_moviedata_folder):
+    exp = Experiment.load_112023(asset_moviedata_folder)
+    trials_df = exp.trials_df
+
+    assert trials_df.shape == (144, 10)
+    assert trials_df["laser"].all()
+    assert np.allclose(trials_df["laser_off_t"] - trials_df["laser_on_t"], 6)
+    assert np.allclose(trials_df["frequency"], 30)
+    assert np.all(trials_df["laser_on_t"] >= trials_df.index - 2)
+
+    # With windows overlapping previous trials, each laser event is still
+    # assigned to a single trial:
+    overlapping_df = exp.compute_trials_df(laser_pad_s=(1000, 0))
+    assert overlapping_df["laser_on_t"].is_unique
+    pd.testing.assert_frame_equal(overlapping_df, trials_df)
+
+    # Laser in the test data comes shortly after trial start, so it is missed
+    # if the window starts later:
+    trials_df = exp.compute_trials_df(laser_pad_s=(-1, 0))
+    assert not trials_df["laser"].any()
+    assert trials_df["laser_on_t"].isna().all()
@@ -0,0 +1,48 @@
+import subprocess
+import sys
+
+import pytest
+
+import bonpy
+
+
+def _imported_modules_after(code):
+    check = f"import sys\n{code}\nprint(' '.join(sys.modules))"
+    output = subprocess.run(
+        [sys.executable, "-c", check], capture_output=True, text=True, check=True
+    ).stdout
+    return set(output.split())
+
+
+def test_import_bonpy_is_lightweight():
+    modules = _imported_modules_after("import bonpy")
+    for module in ["cv2", "pandas", "flammkuchen", "tqdm", "matplotlib", "tkinter"]:
+        assert module not in modules
+
+
+def test_tabular_loading_does_not_import_opencv(asset_moviedata_folder):
+    modules = _imported_modules_after(
+        "from bonpy import Experiment\n"
+        f"exp = Experiment.load_112023(r'{asset_moviedata_folder}')\n"
+        "exp.trials_df"
+    )
+    assert "pandas" in modules
+    for module in ["cv2", "flammkuchen", "tqdm", "matplotlib", "tkinter"]:
+        assert module not in modules
+
+
+def test_synthetic_sessions_without_movies_do_not_import_opencv(tmp_path):
+    modules = _imported_modules_after(
+        "from bonpy.synthetic import generate_session\n"
+        f"generate_session(r'{tmp_path}', duration_s=5, write_movies=False)"
+    )
+    assert "cv2" not in modules
+
+
+def test_lazy_public_api():
+    from bonpy.moviedata import OpenCVMovieData
+
+    assert bonpy.OpenCVMovieData is OpenCVMovieData
+    assert "Experiment" in dir(bonpy)
+    with pytest.raises(AttributeError):
+        bonpy.not_an_attribute
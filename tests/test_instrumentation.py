@@ -0,0 +1,111 @@
+import json
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bonpy import instrumentation
+from bonpy.data_dict import LazyDataDict
+from bonpy.data_parsers import LOADER_DICT
+from bonpy.instrumentation import instrument
+from bonpy.moviedata import OpenCVMovieData
+
+
+def test_disabled_by_default(asset_moviedata_folder):
+    assert not instrumentation.is_enabled()
+
+    data_dict = LazyDataDict(asset_moviedata_folder)
+    data_dict["ball-log_ball"]
+    assert len(instrumentation.STATS) == 0
+
+
+def test_instrument_data_dict(asset_moviedata_folder):
+    data_dict = LazyDataDict(asset_moviedata_folder)
+    with instrument() as stats:
+        data_dict["ball-log_ball"]
+        data_dict["ball-log_ball"]  # already loaded, not recorded
+    assert not instrumentation.is_enabled()
+
+    records_df = stats.to_dataframe()
+    assert list(records_df["name"]) == [
+        "inplace_time_cols_fix_and_resample",
+        "_load_csv",
+        "_load_ball_log_csv",
+        "LazyDataDict.__getitem__",
+    ]
+    assert list(records_df["depth"]) == [3, 2, 1, 0]
+
+    getitem_record = records_df.iloc[-1]
+    assert getitem_record["key"] == "ball-log_ball"
+    assert getitem_record["wall_time_s"] >= records_df.iloc[-2]["wall_time_s"]
+
+    loader_record = records_df.iloc[2]
+    assert (
+        loader_record["bytes_read"]
+        == data_dict.files_dict["ball-log_ball"]["file"].stat().st_size
+    )
+    assert loader_record["rows"] == len(data_dict["ball-log_ball"])
+
+
+def test_instrument_movie_reads(asset_moviedata_file):
+    moviedata = OpenCVMovieData(asset_moviedata_file)
+    with instrument() as stats:
+        moviedata[:5]
+        moviedata[[10, 20, 21]]
+
+    records_df = stats.to_dataframe()
+    assert list(records_df["frames_decoded"]) == [5, 3]
+    assert list(records_df["seeks"]) == [1, 2]
+
+
+def test_instrumented_keyword_only_calls():
+    @instrumentation.instrumented
+    def fill(df=None, path=None):
+        df["filled"] = 1
+
+    df = pd.DataFrame(dict(x=[1, 2, 3]))
+    with instrument() as stats:
+        fill(df=df, path="not_a_file.csv")
+        fill(df, "not_a_file.csv")
+    assert "filled" in df.columns
+
+    records_df = stats.to_dataframe()
+    assert records_df["rows"].tolist()[1] == 3  # rows of the first argument
+    assert records_df["rows"].isna().tolist()[0]
+    assert records_df["bytes_read"].isna().all()
+
+
+def test_instrument_memory(asset_moviedata_folder):
+    data_dict = LazyDataDict(asset_moviedata_folder)
+    with instrument(trace_memory=True) as stats:
+        data_dict["eye-cam_video_eye"]
+
+    records_df = stats.to_dataframe()
+    assert np.all(records_df["peak_alloc_bytes"] > 0)
+    # Outer calls peak at least as high as the calls they contain:
+    outer, inner = records_df.iloc[-1], records_df.iloc[-2]
+    assert outer["peak_alloc_bytes"] >= inner["peak_alloc_bytes"]
+
+
+def test_stats_summary_and_json(asset_moviedata_folder, tmp_path):
+    data_dict = LazyDataDict(asset_moviedata_folder)
+    with instrument() as stats:
+        data_dict["laser-log_laser"]
+        data_dict["cube-positions_cube"]
+
+    summary_df = stats.summary()
+    assert summary_df.loc["_load_csv", "n_calls"] == 2
+    assert summary_df.loc["LazyDataDict.__getitem__", "n_calls"] == 2
+
+    report_file = tmp_path / "report.json"
+    stats.to_json(report_file)
+    report = json.loads(report_file.read_text())
+    assert len(report) == len(stats)
+    assert report[0]["name"] == "inplace_time_cols_fix_and_resample"
+
+
+@pytest.mark.parametrize("category", ["csv", "avi", "eye_DLC_h5"])
+def test_instrumented_loaders_picklable(category):
+    loader = LOADER_DICT["v00"][category]
+    assert pickle.loads(pickle.dumps(loader)) is loader
@@ -0,0 +1,205 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bonpy.data_parsers import (
+    _load_ball_log_csv,
+    _load_csv,
+    _load_laser_log_csv,
+)
+from bonpy.instrumentation import instrument
+from bonpy.live import LiveMovieData, LogFollower, _GrowableBuffer, tail
+from bonpy.moviedata import OpenCVMovieData
+from bonpy.synthetic import generate_session
+
+
+def _grow_file(source_file, target_file, follower, seed=0):
+    """Copy a file in random size chunks, polling the follower after each one."""
+    content = source_file.read_bytes()
+    rng = np.random.default_rng(seed)
+    position = 0
+    while position < len(content):
+        step = int(rng.integers(1, 3000))
+        with open(target_file, "ab") as f:
+            f.write(content[position : position + step])
+        position += step
+        follower.poll()
+
+
+@pytest.mark.parametrize(
+    "filename, loader, kwargs",
+    [
+        ("ball-log_2023-12-14T16_27_20.csv", _load_ball_log_csv, dict()),
+        ("ball-log_2023-12-14T16_27_20.csv", _load_ball_log_csv, dict(smooth_wnd=50)),
+        ("laser-log_2023-12-14T16_27_20.csv", _load_laser_log_csv, dict()),
+        ("eye-cam_timestamps_2023-12-14T16_27_20.csv", _load_csv, dict()),
+    ],
+)
+@pytest.mark.parametrize("precision", ["full", "compact"])
+def test_tail_matches_loader(
+    asset_moviedata_folder, tmp_path, filename, loader, kwargs, precision
+):
+    source_file = asset_moviedata_folder / filename
+    target_file = tmp_path / filename
+    target_file.touch()
+
+    follower = LogFollower(
+        target_file, loader, initial_capacity=16, precision=precision, **kwargs
+    )
+    _grow_file(source_file, target_file, follower)
+
+    assert follower.offset == source_file.stat().st_size
+    pd.testing.assert_frame_equal(
+        follower.data, loader(source_file, precision=precision, **kwargs)
+    )
+
+
+def test_tail_incomplete_lines(asset_moviedata_folder, tmp_path):
+    lines = (
+        (asset_moviedata_folder / "ball-log_2023-12-14T16_27_20.csv")
+        .read_text()
+        .splitlines(keepends=True)
+    )
+    target_file = tmp_path / "ball-log.csv"
+    target_file.write_text("".join(lines[:11]) + lines[11][:10])
+
+    follower = tail(target_file, "ball_csv")
+    new_df = follower.poll()
+    assert len(new_df) == 10
+    assert follower.poll().empty
+
+    with open(target_file, "a") as f:
+        f.write(lines[11][10:])
+    assert len(follower.poll()) == 1
+    assert follower.n_rows == 11
+    # Time origin is kept from the first poll:
+    assert follower.data.index[0] == 0
+
+
+def test_tail_smoothing_lag(asset_moviedata_folder, tmp_path):
+    source_file = asset_moviedata_folder / "ball-log_2023-12-14T16_27_20.csv"
+    target_file = tmp_path / "ball-log.csv"
+    target_file.write_text("".join(source_file.read_text().splitlines(True)[:101]))
+
+    follower = tail(target_file, "ball_csv", smooth_wnd=20)
+    follower.poll()
+    smoothed_df = follower.data
+    # Rows whose smoothing window is not complete yet are NaN:
+    assert smoothed_df["x0"].iloc[:10].isna().all()
+    assert smoothed_df["x0"].iloc[10:91].notna().all()
+    assert smoothed_df["x0"].iloc[91:].isna().all()
+
+
+def test_tail_upcasts_columns(tmp_path):
+    log_file = tmp_path / "log.csv"
+    log_file.write_text(
+        "Timestamp,value\n"
+        "2023-12-14T16:27:20.0+01:00,1\n"
+        "2023-12-14T16:27:20.1+01:00,2\n"
+    )
+    follower = tail(log_file)
+    follower.poll()
+    assert follower.data["value"].dtype == np.int64
+
+    # Floats and missing values in later rows are kept, not cast to integers:
+    with open(log_file, "a") as f:
+        f.write("2023-12-14T16:27:20.2+01:00,2.7\n2023-12-14T16:27:20.3+01:00,\n")
+    follower.poll()
+    np.testing.assert_array_equal(follower.data["value"], [1, 2, 2.7, np.nan])
+    np.testing.assert_allclose(follower.data.index, [0, 0.1, 0.2, 0.3])
+
+
+def test_growable_buffer_columns():
+    buffer = _GrowableBuffer(capacity=2)
+    buffer.append(pd.DataFrame(dict(a=[1, 2]), index=[0.0, 1.0]))
+    buffer.append(pd.DataFrame(dict(b=["x"]), index=[2.0]))
+
+    df = buffer.to_dataframe()
+    np.testing.assert_array_equal(df["a"], [1, 2, np.nan])
+    assert list(df["b"]) == [None, None, "x"]
+
+
+def test_tail_unsupported_loader(tmp_path):
+    with pytest.raises(ValueError):
+        tail(tmp_path / "cube-positions.csv", "cube_csv")
+
+
+@pytest.fixture
+def recording_session(tmp_path):
+    """Synthetic movie and timestamps, with copies to grow as during recording."""
+    session_path = generate_session(
+        tmp_path / "source", duration_s=4, fps=30, resolution=(60, 80), seed=1
+    )
+    movie_file = next(session_path.glob("eye-cam_video*.avi"))
+    timestamps_file = next(session_path.glob("eye-cam_timestamps*.csv"))
+
+    live_path = tmp_path / "live"
+    live_path.mkdir()
+    live_movie_file = live_path / movie_file.name
+    live_timestamps_file = live_path / timestamps_file.name
+
+    movie_bytes = movie_file.read_bytes()
+    timestamps_lines = timestamps_file.read_text().splitlines(keepends=True)
+
+    def _record(fraction, n_frames):
+        live_movie_file.write_bytes(movie_bytes[: int(len(movie_bytes) * fraction)])
+        live_timestamps_file.write_text("".join(timestamps_lines[: n_frames + 1]))
+
+    _record(0.1, 0)
+    return OpenCVMovieData(movie_file), live_movie_file, _record
+
+
+def test_live_movie_latest(recording_session):
+    movie, live_movie_file, record = recording_session
+
+    live_movie = LiveMovieData(live_movie_file, max_latest=10)
+    times, frames = live_movie.latest(3)
+    assert len(times) == 0 and len(frames) == 0
+
+    record(0.5, 40)
+    times, frames = live_movie.latest(5)
+    assert np.array_equal(frames, movie[35:40])
+    assert np.allclose(times, live_movie.timestamps.index.values[35:40])
+    assert live_movie.shape == (40, 60, 80)
+
+    record(1, 120)
+    with instrument() as stats:
+        times, frames = live_movie.latest(10)
+    assert np.array_equal(frames, movie[110:120])
+    # Decoding restarts after the frames that would not be kept:
+    assert stats.to_dataframe()["frames_decoded"].sum() == 10
+
+    for n in [0, 11]:
+        with pytest.raises(ValueError):
+            live_movie.latest(n)
+    live_movie.close()
+
+
+def test_live_movie_latest_frames_not_written(recording_session):
+    movie, live_movie_file, record = recording_session
+
+    # Timestamps more than max_latest rows ahead of the frames in the movie:
+    record(0.1, 100)
+    live_movie = LiveMovieData(live_movie_file, max_latest=10)
+    times, frames = live_movie.latest(5)
+    assert times.shape == (0,)
+    assert frames.shape == (0, 60, 80)
+
+    # The capture that reached the end of the file is reopened for new frames:
+    record(1, 120)
+    times, frames = live_movie.latest(5)
+    assert np.array_equal(frames, movie[115:120])
+    live_movie.close()
+
+
+def test_live_movie_refresh(recording_session):
+    movie, live_movie_file, record = recording_session
+    record(0.5, 40)
+    live_movie = LiveMovieData(live_movie_file)
+    assert live_movie.metadata.n_frames == 40
+
+    record(1, 120)
+    assert live_movie.refresh() == 80
+    assert live_movie.refresh() == 0
+    assert len(live_movie) == 120
+    assert np.array_equal(live_movie[[10, 100]], movie[[10, 100]])
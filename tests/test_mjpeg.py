@@ -0,0 +1,183 @@
+import pickle
+import struct
+
+import cv2
+import numpy as np
+import pytest
+
+from bonpy.mjpeg import MJPEGMovieData, open_movie, read_avi_index
+from bonpy.moviedata import OpenCVMovieData
+
+N_FRAMES = 20
+# Mean absolute difference allowed between frames decoded by OpenCV and
+# cv2.imdecode, which upsample the color channels differently:
+DECODER_ATOL = 1
+
+
+def _test_frames(n_frames=N_FRAMES, shape=(48, 64, 3)):
+    rng = np.random.default_rng(0)
+    frames = np.zeros((n_frames,) + shape, dtype=np.uint8)
+    for n, frame in enumerate(frames):
+        frame[:, : 3 * n + 2] = rng.integers(50, 200, size=3)  # varying across frames
+    return frames
+
+
+@pytest.fixture
+def mjpeg_file(tmp_path):
+    filename = tmp_path / "color_video.avi"
+    writer = cv2.VideoWriter(
+        str(filename), cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48)
+    )
+    for frame in _test_frames():
+        writer.write(frame)
+    writer.release()
+    return filename
+
+
+def _chunk(chunk_id, data):
+    return chunk_id + struct.pack("<I", len(data)) + data + b"\x00" * (len(data) % 2)
+
+
+def _write_opendml_avi(filename, jpegs):
+    """Minimal AVI with an OpenDML index (indx and ix00 chunks) and no idx1."""
+    strh = b"vidsMJPG" + bytes(48)
+    strf = struct.pack("<IiiHH4s", 40, 64, 48, 1, 24, b"MJPG") + bytes(20)
+    indx_size = 24 + 16  # header and a single super index entry
+    strl_size = 4 + 8 + len(strh) + 8 + len(strf) + 8 + indx_size
+    hdrl_size = 4 + 8 + strl_size
+    movi_pos = 12 + 8 + hdrl_size
+
+    frame_chunks, ix_entries, pos = b"", b"", movi_pos + 12
+    for jpeg in jpegs:
+        ix_entries += struct.pack("<II", pos + 8 - movi_pos, len(jpeg))
+        frame_chunks += _chunk(b"00dc", jpeg)
+        pos = movi_pos + 12 + len(frame_chunks)
+    ix_pos = pos
+    ix00 = _chunk(
+        b"ix00",
+        struct.pack("<HBBI4sQI", 2, 0, 1, len(jpegs), b"00dc", movi_pos, 0)
+        + ix_entries,
+    )
+    indx = _chunk(
+        b"indx",
+        struct.pack("<HBBI4s12s", 4, 0, 0, 1, b"00dc", bytes(12))
+        + struct.pack("<QII", ix_pos, len(ix00), len(jpegs)),
+    )
+
+    strl = _chunk(
+        b"LIST", b"strl" + _chunk(b"strh", strh) + _chunk(b"strf", strf) + indx
+    )
+    hdrl = _chunk(b"LIST", b"hdrl" + strl)
+    movi = _chunk(b"LIST", b"movi" + frame_chunks + ix00)
+    filename.write_bytes(_chunk(b"RIFF", b"AVI " + hdrl + movi))
+
+
+def test_read_avi_index(mjpeg_file, asset_moviedata_file):
+    avi_index = read_avi_index(mjpeg_file)
+    assert avi_index.codec == "MJPG" and avi_index.is_mjpeg
+    assert avi_index.n_frames == N_FRAMES
+
+    data = mjpeg_file.read_bytes()
+    for offset, size in zip(avi_index.offsets, avi_index.sizes):
+        # Each frame is a whole JPEG image:
+        assert data[offset : offset + 2] == b"\xff\xd8"
+        assert data[offset : offset + size].rstrip(b"\x00").endswith(b"\xff\xd9")
+
+    avi_index = read_avi_index(asset_moviedata_file)
+    assert avi_index.codec == "FMP4" and not avi_index.is_mjpeg
+    assert avi_index.n_frames == 500
+
+
+def test_read_avi_index_opendml(tmp_path):
+    jpegs = [cv2.imencode(".jpg", frame)[1].tobytes() for frame in _test_frames(3)]
+    filename = tmp_path / "opendml_video.avi"
+    # The empty chunk is a frame repeated by the recording software:
+    _write_opendml_avi(filename, [jpegs[0], jpegs[1], b"", jpegs[2]])
+
+    avi_index = read_avi_index(filename)
+    assert avi_index.is_mjpeg
+    assert avi_index.n_frames == 4
+    assert avi_index.offsets[2] == avi_index.offsets[1]
+
+    movie = MJPEGMovieData(filename)
+    assert movie.shape == (4, 48, 64, 3)
+    np.testing.assert_array_equal(movie[2], movie[1])
+    assert np.abs(movie[3].astype(int) - _test_frames(3)[2]).max() < 10
+
+
+def test_read_avi_index_errors(tmp_path):
+    not_avi = tmp_path / "not_video.avi"
+    not_avi.write_bytes(b"RIFF\x04\x00\x00\x00WAVE")
+    with pytest.raises(ValueError):
+        read_avi_index(not_avi)
+
+    # An empty first frame cannot repeat a previous one:
+    jpeg = cv2.imencode(".jpg", _test_frames(1)[0])[1].tobytes()
+    empty_first = tmp_path / "empty_first_video.avi"
+    _write_opendml_avi(empty_first, [b"", jpeg])
+    with pytest.raises(ValueError, match="first frame"):
+        read_avi_index(empty_first)
+    assert type(open_movie(empty_first)) is OpenCVMovieData
+
+
+@pytest.mark.parametrize(
+    "slicer",
+    [
+        1,
+        -1,
+        [3, 1, 15],
+        np.arange(N_FRAMES) % 3 == 0,
+        slice(2, 18, 4),
+        ([1, 2, 3], slice(0, 10), slice(5, 10)),
+        (slice(None), slice(0, -10), slice(5, 10), slice(0, 2)),
+    ],
+)
+def test_mjpeg_moviedata_data(mjpeg_file, slicer):
+    movie = MJPEGMovieData(mjpeg_file)
+    expected = OpenCVMovieData(mjpeg_file)[slicer]
+
+    frames = movie[slicer]
+    assert frames.shape == expected.shape
+    assert np.abs(frames.astype(float) - expected).mean() < DECODER_ATOL
+
+
+def test_mjpeg_moviedata_metadata(mjpeg_file, asset_moviedata_file):
+    movie = MJPEGMovieData(mjpeg_file)
+    assert movie.shape == (N_FRAMES, 48, 64, 3)
+    assert movie.metadata == OpenCVMovieData(mjpeg_file).metadata
+
+    with pytest.raises(ValueError):
+        MJPEGMovieData(asset_moviedata_file)
+
+
+def test_mjpeg_moviedata_parallel_decoding(mjpeg_file):
+    sequential = MJPEGMovieData(mjpeg_file, max_captures=1)
+    parallel = MJPEGMovieData(mjpeg_file, max_captures=2)
+
+    frame_idxs = np.random.default_rng(0).permutation(N_FRAMES)
+    np.testing.assert_array_equal(parallel[frame_idxs], sequential[frame_idxs])
+    assert parallel._decode_executor is not None
+    assert sequential._decode_executor is None
+
+    np.testing.assert_array_equal(parallel.submit(slice(None)).result(), sequential[:])
+    parallel.close()
+    assert parallel._mmap is None
+    np.testing.assert_array_equal(parallel[5], sequential[5])  # reopened on demand
+
+
+def test_mjpeg_moviedata_pickle(mjpeg_file):
+    movie = MJPEGMovieData(mjpeg_file)
+    frames = movie[:5]
+
+    unpickled = pickle.loads(pickle.dumps(movie))
+    np.testing.assert_array_equal(unpickled[:5], frames)
+
+
+def test_open_movie(mjpeg_file, asset_moviedata_file):
+    assert type(open_movie(mjpeg_file)) is MJPEGMovieData
+
+    # Inter-frame codecs fall back on OpenCV:
+    movie = open_movie(asset_moviedata_file, verbose=False)
+    assert type(movie) is OpenCVMovieData
+    assert movie.shape == (500, 240, 320)
+    assert movie.has_timestamps
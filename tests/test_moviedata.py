@@ -1,10 +1,13 @@
 # Test classes in bonpy/moviedata.py using the asset folder as fixture:
+import pickle
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
 import pytest
 from numpy import dtype
 
-from bonpy.moviedata import OpenCVMovieData
+from bonpy.moviedata import FrameIndexError, OpenCVMovieData
 
 # from tests.conftest import asset_moviedata_file
 
@@ -53,6 +56,138 @@ def test_opencvmoviedata_data(asset_moviedata_file, slicer, expected_shape):
     assert mdata[slicer].shape == expected_shape
 
 
+def test_opencvmoviedata_frame_indices(asset_moviedata_file):
+    mdata = OpenCVMovieData(asset_moviedata_file)
+
+    frame_idxs = np.array([-1, 0, 2], dtype=np.int32)
+    frames = mdata[frame_idxs]
+    np.testing.assert_array_equal(frame_idxs, [-1, 0, 2])  # index is not modified
+    assert np.array_equal(frames[0], mdata[499])
+
+    mask = np.zeros(500, dtype=bool)
+    mask[[3, 7]] = True
+    assert np.array_equal(mdata[mask], mdata[[3, 7]])
+
+    for out_of_range in [500, -501, [0, 500], np.zeros(10, dtype=bool)]:
+        with pytest.raises(FrameIndexError) as error:
+            mdata[out_of_range]
+        # Also caught by handlers of both IndexError and ValueError:
+        assert isinstance(error.value, IndexError)
+        assert isinstance(error.value, ValueError)
+
+
+def test_opencvmoviedata_timestamps(asset_moviedata_file):
+    mdata = OpenCVMovieData(asset_moviedata_file)
+
+    assert mdata.has_timestamps
+    assert mdata.timestamps.shape == (500, 1)
+
+
+def test_opencvmoviedata_iter_chunks(asset_moviedata_file):
+    mdata = OpenCVMovieData(asset_moviedata_file)
+
+    chunks = list(mdata.iter_chunks(10, 45, chunk_frames=10))
+    assert [chunk_start for chunk_start, _ in chunks] == [10, 20, 30, 40]
+    assert [len(frames) for _, frames in chunks] == [10, 10, 10, 5]
+
+    # Sequential reads match random access:
+    assert np.array_equal(np.concatenate([f for _, f in chunks]), mdata[range(10, 45)])
+    assert np.array_equal(chunks[-1][1][-1], mdata[44])
+
+
+def test_opencvmoviedata_array_protocol(asset_moviedata_file):
+    mdata = OpenCVMovieData(asset_moviedata_file)
+
+    assert len(mdata) == 500
+    assert mdata.chunks == (64, 240, 320)
+
+    movie_array = np.asarray(mdata, dtype=float)
+    assert movie_array.shape == mdata.shape
+    assert np.array_equal(movie_array[:5], mdata[:5])
+
+
+def test_opencvmoviedata_reuses_captures(asset_moviedata_file):
+    mdata = OpenCVMovieData(asset_moviedata_file)
+
+    first_frames = mdata[:10]
+    mdata[[100, 200]]
+    assert mdata._n_captures == 1
+
+    # Reads after random access and after closing are still correct:
+    assert np.array_equal(mdata[:10], first_frames)
+    mdata.close()
+    assert np.array_equal(mdata[5:10], first_frames[5:])
+
+
+def test_opencvmoviedata_pickle(asset_moviedata_file):
+    mdata = OpenCVMovieData(asset_moviedata_file)
+    first_frame = mdata[0]
+
+    unpickled_mdata = pickle.loads(pickle.dumps(mdata))
+    assert np.array_equal(unpickled_mdata[0], first_frame)
+
+
+def test_opencvmoviedata_to_dask(asset_moviedata_file):
+    da = pytest.importorskip("dask.array")
+    mdata = OpenCVMovieData(asset_moviedata_file)
+
+    lazy_movie = mdata.to_dask(chunks=(100, -1, -1))
+    assert isinstance(lazy_movie, da.Array)
+    assert lazy_movie.shape == mdata.shape
+    assert lazy_movie.chunks[0] == (100,) * 5
+
+    assert np.array_equal(lazy_movie[95:105].compute(), mdata[95:105])
+    assert np.allclose(
+        lazy_movie[:, :10, :10].mean(axis=(1, 2)).compute(),
+        mdata[:, :10, :10].mean(axis=(1, 2)),
+    )
+
+
+def test_opencvmoviedata_to_dask_spatial_chunks(asset_moviedata_file):
+    pytest.importorskip("dask.array")
+    mdata = OpenCVMovieData(asset_moviedata_file)
+
+    with pytest.raises(ValueError):
+        mdata.to_dask(chunks=(100, 120, -1))
+
+
+def test_opencvmoviedata_concurrent_reads(asset_moviedata_file):
+    mdata = OpenCVMovieData(asset_moviedata_file, max_captures=3)
+    frame_ranges = [slice(start, start + 20) for start in range(0, 200, 20)]
+    expected = [mdata[frame_range] for frame_range in frame_ranges]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(mdata.__getitem__, frame_ranges * 3))
+
+    for n, frames in enumerate(results):
+        assert np.array_equal(frames, expected[n % len(frame_ranges)])
+    assert mdata._n_captures <= 3
+
+
+def test_opencvmoviedata_concurrent_metadata(asset_moviedata_file):
+    mdata = OpenCVMovieData(asset_moviedata_file)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        all_metadata = list(pool.map(lambda _: mdata.metadata, range(8)))
+
+    assert all(metadata is all_metadata[0] for metadata in all_metadata)
+    assert mdata._n_captures == 1
+
+
+def test_opencvmoviedata_submit(asset_moviedata_file):
+    mdata = OpenCVMovieData(asset_moviedata_file, max_captures=2)
+
+    futures = [mdata.submit(idx) for idx in [5, [10, 12], slice(30, 35)]]
+    assert np.array_equal(futures[0].result(), mdata[5])
+    assert futures[1].result().shape == (2, 240, 320)
+    assert np.array_equal(futures[2].result(), mdata[30:35])
+
+    mdata.close()
+    assert mdata._executor is None
+    assert np.array_equal(mdata.submit(5).result(), futures[0].result())
+    mdata.close()
+
+
 if __name__ == "__main__":
     asset_moviedata_file = (
         Path(__file__).parent
@@ -0,0 +1,94 @@
+import pandas as pd
+import pytest
+
+from bonpy.experiment import Experiment
+from bonpy.moviedata import OpenCVMovieData
+from bonpy.pack import PackedDataDict, read_manifest
+
+
+@pytest.fixture
+def experiment(asset_moviedata_folder):
+    return Experiment.load_112023(asset_moviedata_folder)
+
+
+@pytest.fixture
+def pack_file(experiment, tmp_path):
+    pack_file = tmp_path / "session.h5"
+    experiment.pack(pack_file)
+    return pack_file
+
+
+def test_pack_manifest(experiment, pack_file):
+    manifest = read_manifest(pack_file)
+
+    assert manifest["metadata"]["animal_id"] == "M13"
+    assert manifest["streams"]["ball-log_ball"]["n_rows"] == 1000
+    assert manifest["streams"]["trials"]["n_rows"] == 144
+    assert manifest["external"]["eye-cam_video"]["category"] == "avi"
+    assert "random_format" not in manifest["external"]
+
+
+def test_from_pack(experiment, pack_file):
+    packed_exp = Experiment.from_pack(pack_file)
+
+    assert packed_exp.metadata == experiment.metadata
+    assert isinstance(packed_exp.data_dict, PackedDataDict)
+    assert set(packed_exp.data_dict.keys()) == set(experiment.data_dict.keys()) - {
+        "random_format"
+    }
+
+    for key in ["laser-log_laser", "ball-log_ball", "eye-cam_video_eye"]:
+        assert key not in packed_exp.data_dict.data
+        pd.testing.assert_frame_equal(
+            packed_exp.data_dict[key], experiment.data_dict[key]
+        )
+    pd.testing.assert_frame_equal(packed_exp.trials_df, experiment.trials_df)
+
+    # Movies are opened from the original files:
+    assert isinstance(packed_exp.data_dict["eye-cam_video"], OpenCVMovieData)
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_from_pack_preload(experiment, pack_file, executor):
+    packed_exp = Experiment.from_pack(pack_file)
+
+    timings = packed_exp.preload(
+        keys=["ball-log_ball", "eye-cam_video"], executor=executor
+    )
+    assert set(timings.keys()) == {"ball-log_ball", "eye-cam_video"}
+    assert set(packed_exp.data_dict.data.keys()) == {"ball-log_ball", "eye-cam_video"}
+    pd.testing.assert_frame_equal(
+        packed_exp.data_dict["ball-log_ball"], experiment.data_dict["ball-log_ball"]
+    )
+    assert isinstance(packed_exp.data_dict["eye-cam_video"], OpenCVMovieData)
+
+    # All the remaining keys:
+    assert set(packed_exp.preload().keys()) == set(packed_exp.data_dict.keys()) - {
+        "ball-log_ball",
+        "eye-cam_video",
+    }
+
+
+def test_pack_without_loading_external(experiment, tmp_path):
+    experiment.pack(tmp_path / "session.h5")
+    # Movies and unknown files are not loaded to be packed:
+    assert "eye-cam_video" not in experiment.data_dict.data
+    assert "random_format" not in experiment.data_dict.data
+
+
+def test_packed_select(experiment, pack_file):
+    data_dict = PackedDataDict(pack_file)
+    columns = [("pupil_1", "x"), ("avg_pupil_diameter", "")]
+
+    selected_df = data_dict.select(
+        "eye-cam_video_eye", columns=columns, start=100, stop=150
+    )
+    pd.testing.assert_frame_equal(
+        selected_df, experiment.data_dict["eye-cam_video_eye"][columns].iloc[100:150]
+    )
+    assert "eye-cam_video_eye" not in data_dict.data
+
+
+def test_pack_keys_subset(experiment, tmp_path):
+    manifest = experiment.pack(tmp_path / "session.h5", keys=["ball-log_ball"])
+    assert set(manifest["streams"].keys()) == {"ball-log_ball", "trials"}
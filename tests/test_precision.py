@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bonpy import precision
+from bonpy.crop_utils import event_average, multi_crop, smart_crop
+from bonpy.data_dict import LazyDataDict
+from bonpy.data_parsers import (
+    _load_ball_log_csv,
+    _load_cube_log_csv,
+    _load_pupil_dlc_h5,
+    load_dlc_h5,
+    load_pupil_dlc_h5_streaming,
+)
+from bonpy.precision import compact_dtypes, get_precision, using_precision
+
+
+def test_precision_policy():
+    assert get_precision() == "full"
+    assert get_precision("compact") == "compact"
+    with using_precision("compact"):
+        assert get_precision() == "compact"
+        assert get_precision("full") == "full"
+    assert get_precision() == "full"
+
+    with pytest.raises(ValueError):
+        get_precision("half")
+    with pytest.raises(ValueError):
+        precision.set_precision("half")
+    assert get_precision() == "full"
+
+
+def test_compact_dtypes():
+    df = pd.DataFrame(
+        dict(
+            small_int=[0, 1, -3],
+            large_int=[0, 2**20, 1],
+            floats=[0.5, np.nan, 1.0],
+            flags=[True, False, True],
+            labels=["a", "b", "c"],
+            hold_time=[1000.0001, 2.5, 3.0],
+        ),
+        index=pd.Index([0.0, 0.1, 0.2], name="time"),
+    )
+    full_df = df.copy()
+    assert compact_dtypes(df, precision="full").equals(full_df)
+
+    compact_dtypes(df, precision="compact")
+    assert df["small_int"].dtype == np.int8
+    assert df["large_int"].dtype == np.int32
+    assert df["floats"].dtype == np.float32
+    assert df["flags"].dtype == bool
+    assert df["labels"].dtype == object
+    assert df["hold_time"].dtype == np.float64  # time-valued columns are kept
+    assert df.index.dtype == np.float64
+    pd.testing.assert_frame_equal(df, full_df, check_dtype=False)
+
+
+def test_compact_cube_log_keeps_time(asset_moviedata_folder):
+    cube_file = asset_moviedata_folder / "cube-positions_2023-12-14T16_27_20.csv"
+    full_df = _load_cube_log_csv(cube_file)
+    compact_df = _load_cube_log_csv(cube_file, precision="compact")
+
+    assert compact_df["hold_time"].dtype == np.float64
+    pd.testing.assert_series_equal(compact_df["hold_time"], full_df["hold_time"])
+
+
+@pytest.mark.parametrize("smooth_wnd", [None, 50])
+def test_compact_ball_log(asset_moviedata_folder, smooth_wnd):
+    ball_file = asset_moviedata_folder / "ball-log_2023-12-14T16_27_20.csv"
+    full_df = _load_ball_log_csv(ball_file, smooth_wnd=smooth_wnd)
+    compact_df = _load_ball_log_csv(
+        ball_file, smooth_wnd=smooth_wnd, precision="compact"
+    )
+
+    assert "timedelta" in full_df.columns
+    assert "timedelta" not in compact_df.columns
+    assert compact_df.index.dtype == np.float64
+    expected_dtype = np.int16 if smooth_wnd is None else np.float32
+    assert all(compact_df.dtypes == expected_dtype)
+    assert compact_df.memory_usage(index=False).sum() < (
+        full_df.memory_usage(index=False).sum() / 2
+    )
+
+    pd.testing.assert_frame_equal(
+        compact_df, full_df.drop(columns="timedelta"), check_dtype=False
+    )
+
+
+@pytest.mark.parametrize(
+    "loader", [load_dlc_h5, _load_pupil_dlc_h5, load_pupil_dlc_h5_streaming]
+)
+def test_compact_dlc(asset_moviedata_folder, loader):
+    dlc_file = next(asset_moviedata_folder.glob("*DLC*.h5"))
+    full_df = loader(dlc_file)
+    compact_df = loader(dlc_file, precision="compact")
+
+    assert all(compact_df.dtypes == np.float32)
+    np.testing.assert_array_equal(compact_df.index.values, full_df.index.values)
+    np.testing.assert_allclose(
+        compact_df.values, full_df.values, rtol=1e-6, equal_nan=True
+    )
+
+
+def test_data_dict_precision(asset_moviedata_folder):
+    with using_precision("compact"):
+        global_dict = LazyDataDict(asset_moviedata_folder)
+        assert global_dict["ball-log_ball"]["x0"].dtype == np.int16
+
+        full_dict = LazyDataDict(asset_moviedata_folder, precision="full")
+        assert full_dict["ball-log_ball"]["x0"].dtype == np.int64
+
+    compact_dict = LazyDataDict(asset_moviedata_folder, precision="compact")
+    compact_dict.preload(["cube-positions_cube"], executor="process")
+    assert "timedelta" not in compact_dict["cube-positions_cube"].columns
+    assert compact_dict["cube-positions_cube"].index.dtype == np.float64
+
+
+def test_compact_crops():
+    time_arr = np.arange(1000) * 0.01
+    data = pd.DataFrame(
+        dict(a=np.arange(1000, dtype=np.int16), b=np.sin(time_arr)), index=time_arr
+    )
+    events = np.array([0.05, 3.0, 9.95])
+
+    for interpolate in [False, True]:
+        timebase, full_crop = smart_crop(
+            data, events, (-0.1, 0.1), interpolate=interpolate
+        )
+        _, compact_crop = smart_crop(
+            data, events, (-0.1, 0.1), interpolate=interpolate, precision="compact"
+        )
+        assert timebase.dtype == np.float64
+        for column in data.columns:
+            assert full_crop[column].dtype == np.float64
+            assert compact_crop[column].dtype == np.float32
+            np.testing.assert_allclose(
+                compact_crop[column], full_crop[column], rtol=1e-6, equal_nan=True
+            )
+
+    _, cropped_streams = multi_crop(
+        dict(data=data), events, (-0.1, 0.1), precision="compact"
+    )
+    assert cropped_streams["data"]["b"].dtype == np.float32
+
+    _, event_stats = event_average(
+        data.values[:, 1], events, (-0.1, 0.1), dt=0.01, precision="compact"
+    )
+    assert event_stats["mean"].dtype == np.float32
+    assert event_stats["n"].dtype == np.int64
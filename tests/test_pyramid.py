@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from bonpy.derive import _bin_frames
+from bonpy.instrumentation import instrument
+from bonpy.moviedata import OpenCVMovieData
+from bonpy.pyramid import PYRAMID_SUFFIX, _bin_time, build_pyramid, multiscale
+
+
+@pytest.fixture
+def moviedata(asset_moviedata_file):
+    return OpenCVMovieData(asset_moviedata_file, verbose=False)
+
+
+def test_bin_time():
+    frames = np.arange(7 * 2 * 2, dtype=np.uint8).reshape(7, 2, 2)
+    binned = _bin_time(frames, 3)
+    assert binned.shape == (3, 2, 2)
+    assert binned.dtype == np.uint8
+    np.testing.assert_array_equal(binned[0], frames[:3].mean(axis=0))
+    np.testing.assert_array_equal(binned[-1], frames[-1])
+
+
+def test_multiscale(moviedata, tmp_path):
+    levels = multiscale(moviedata, cache_dir=tmp_path / "pyramid")
+    assert levels[0] is moviedata
+    assert [level.shape for level in levels] == [
+        (500, 240, 320),
+        (500, 120, 160),
+        (500, 60, 80),
+    ]
+
+    full_frames = moviedata[:]
+    np.testing.assert_array_equal(levels[1], _bin_frames(full_frames, 2))
+    np.testing.assert_array_equal(levels[2], _bin_frames(levels[1], 2))
+
+
+def test_multiscale_time_factor(moviedata, tmp_path):
+    # Chunks not multiple of the time blocks are enlarged to whole blocks:
+    build_pyramid(
+        moviedata, n_levels=3, time_factor=3, cache_dir=tmp_path, chunk_frames=100
+    )
+    levels = multiscale(moviedata, n_levels=3, time_factor=3, cache_dir=tmp_path)
+    assert [level.shape[0] for level in levels] == [500, 167, 56]
+
+    expected = _bin_time(_bin_frames(moviedata[:], 2), 3)
+    np.testing.assert_array_equal(levels[1], expected)
+    np.testing.assert_array_equal(levels[2], _bin_time(_bin_frames(expected, 2), 3))
+
+
+def test_multiscale_cache(moviedata, asset_moviedata_file, tmp_path):
+    cache_dir = tmp_path / "pyramid"
+    with instrument() as stats:
+        multiscale(moviedata, cache_dir=cache_dir)
+    assert stats.to_dataframe()["frames_decoded"].sum() == 500
+
+    # Cached levels are read without decoding the movie:
+    with instrument() as stats:
+        levels = multiscale(moviedata, cache_dir=cache_dir)
+    assert len(stats) == 0
+    assert isinstance(levels[1], np.memmap)
+
+    # Changing parameters rebuilds the cache:
+    levels = multiscale(moviedata, n_levels=2, cache_dir=cache_dir)
+    assert len(levels) == 2
+    assert sorted(p.name for p in cache_dir.iterdir()) == [
+        "level_1.npy",
+        "pyramid.json",
+    ]
+
+    # Default cache next to the movie, from the MovieData method:
+    movie_copy = tmp_path / asset_moviedata_file.name
+    movie_copy.write_bytes(asset_moviedata_file.read_bytes())
+    levels = OpenCVMovieData(movie_copy).multiscale(n_levels=2)
+    assert (tmp_path / (movie_copy.name + PYRAMID_SUFFIX) / "level_1.npy").exists()
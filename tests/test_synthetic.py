@@ -0,0 +1,99 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bonpy.catalog import Catalog
+from bonpy.data_dict import LazyDataDict
+from bonpy.data_parsers import MOUSE_LOADER_DICT
+from bonpy.experiment import Experiment
+from bonpy.synthetic import generate_dataset, generate_session
+
+
+def test_generate_session(tmp_path):
+    session_path = generate_session(
+        tmp_path, duration_s=40, fps=20, resolution=(60, 80), seed=1
+    )
+    assert session_path == tmp_path / "M13" / "20231214" / "162720"
+
+    exp = Experiment.load_112023(session_path)
+    assert set(exp.data_dict.keys()) == {
+        "eye-cam_timestamps",
+        "eye-cam_video",
+        "eye-cam_video_eye",
+        "top-cam_timestamps",
+        "top-cam_video",
+        "top-cam_video_top",
+        "ball-log_ball",
+        "cube-positions_cube",
+        "laser-log_laser",
+    }
+    exp.preload()
+
+    assert exp.data_dict["eye-cam_video"].shape == (800, 60, 80)
+    assert exp.data_dict["eye-cam_timestamps"].shape == (800, 1)
+    assert exp.data_dict["eye-cam_video_eye"].shape == (800, 42)
+    assert exp.data_dict["ball-log_ball"].shape == (4000, 5)
+    assert np.allclose(exp.data_dict["eye-cam_timestamps"].index[:2], [0.4, 0.45])
+
+    trials_df = exp.trials_df
+    assert len(trials_df) == 3
+    assert trials_df["laser"].all()
+    assert np.allclose(trials_df.index, [5, 15, 25])
+
+
+def test_generate_session_v01(tmp_path):
+    session_path = generate_session(
+        tmp_path, animal_id="M21", duration_s=30, write_movies=False
+    )
+    data_dict = LazyDataDict(session_path)
+    data_dict.preload()
+
+    assert "motor-log_motor" in data_dict.keys()
+    assert "eye-cam_video" not in data_dict.keys()
+    assert data_dict["laser-log_laser"]["frequency"].tolist() == ["30"] * 2
+
+
+def test_generate_dataset(tmp_path):
+    session_paths = generate_dataset(
+        tmp_path,
+        n_animals=2,
+        n_sessions=3,
+        first_session_timestamp=datetime(2024, 3, 30, 10, 0, 0),
+        duration_s=10,
+        write_movies=False,
+        workers=2,
+    )
+    assert len(session_paths) == 6
+
+    with Catalog(tmp_path) as catalog:
+        catalog.scan()
+        sessions_df = catalog.sessions()
+    assert sessions_df["animal_id"].tolist() == ["M13"] * 3 + ["M14"] * 3
+    assert sessions_df["date"].tolist() == ["20240330", "20240331", "20240401"] * 2
+
+    # Timestamps are in local time across daylight saving change:
+    for session_path in session_paths[:2]:
+        exp = Experiment.load_112023(session_path)
+        assert np.isclose(exp.data_dict["ball-log_ball"].index[0], 0.09)
+
+
+def test_generate_dataset_too_many_animals(tmp_path):
+    with pytest.raises(ValueError):
+        generate_dataset(tmp_path, n_animals=len(MOUSE_LOADER_DICT) + 1)
+    assert not any(tmp_path.iterdir())
+
+
+def test_generate_deterministic(tmp_path):
+    paths = [
+        generate_session(tmp_path / str(i), duration_s=10, write_movies=False)
+        for i in range(2)
+    ]
+    for filename in paths[0].glob("*.csv"):
+        assert filename.read_bytes() == (paths[1] / filename.name).read_bytes()
+    for filename in paths[0].glob("*.h5"):
+        assert pd.read_hdf(filename).equals(pd.read_hdf(paths[1] / filename.name))
+        # DLC files are written in table format, as by DLC:
+        with pd.HDFStore(filename, mode="r") as store:
+            assert store.get_storer("df_with_missing").is_table
@@ -0,0 +1,160 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from bonpy.catalog import Catalog
+from bonpy.crop_utils import crop_movie, smart_crop
+from bonpy.moviedata import OpenCVMovieData
+from bonpy.timestamp_diagnostics import diagnose_timestamps, timestamps_qc
+
+DT = 0.01
+DROPPED_FRAMES = [100, 101, 102, 500]  # frames of the regular clock that are dropped
+DUPLICATED_FRAME = 700
+
+
+@pytest.fixture
+def timestamps():
+    rng = np.random.default_rng(0)
+    clock_times = np.arange(1000) * DT + 2.0 + rng.normal(0, DT / 20, 1000)
+    kept_times = np.delete(clock_times, DROPPED_FRAMES)
+    duplicate_idx = DUPLICATED_FRAME - len(DROPPED_FRAMES)
+    return np.insert(kept_times, duplicate_idx + 1, kept_times[duplicate_idx])
+
+
+def test_diagnose_timestamps(timestamps):
+    diagnostics = diagnose_timestamps(timestamps)
+
+    assert diagnostics.n_frames == len(timestamps)
+    assert diagnostics.n_gaps == 2
+    assert diagnostics.n_dropped == 4
+    assert diagnostics.longest_gap == 3
+    assert diagnostics.n_duplicates == 1
+    assert diagnostics.n_non_monotonic == 0
+    assert diagnostics.nominal_dt == pytest.approx(DT, rel=0.01)
+    assert diagnostics.fit_dt == pytest.approx(DT, rel=1e-3)
+    assert diagnostics.max_residual_s < DT / 2
+
+    assert diagnostics.dropped_runs().to_dict("list") == dict(
+        frame=[100, 497], n_dropped=[3, 1]
+    )
+    summary = diagnostics.summary()
+    assert summary["n_dropped"] == 4
+    assert "interval_p50" in summary and "gap_index" not in summary
+
+
+def test_diagnose_timestamps_drift():
+    timestamps = np.arange(10000) * DT * (1 + 100e-6)
+    diagnostics = diagnose_timestamps(timestamps, expected_dt=DT)
+    assert diagnostics.drift_ppm == pytest.approx(100, rel=1e-3)
+    assert diagnostics.n_dropped == 0
+    assert len(diagnostics.gap_index) == 0
+
+
+def test_diagnose_non_monotonic_timestamps(timestamps):
+    timestamps = timestamps.copy()
+    timestamps[[300, 301]] = timestamps[[301, 300]]
+    diagnostics = diagnose_timestamps(timestamps)
+    assert diagnostics.n_non_monotonic == 1
+    assert diagnostics.summary()["n_frames"] == len(timestamps)
+
+    # Lookups by time would silently be wrong on unsorted timestamps:
+    gap_index = diagnostics.gap_index
+    assert not gap_index.is_monotonic
+    assert gap_index.frame_to_slot([0])[0] == 0
+    with pytest.raises(ValueError):
+        gap_index.time_to_frame(timestamps[:10])
+    with pytest.raises(ValueError):
+        smart_crop(np.arange(len(timestamps)), [2.5], (-0.1, 0.1), gap_index=gap_index)
+
+    assert diagnose_timestamps(np.sort(timestamps)).gap_index.is_monotonic
+
+
+def test_gap_index(timestamps):
+    gap_index = diagnose_timestamps(timestamps).gap_index
+    # Only the frames where the clock mapping breaks are stored:
+    assert len(gap_index) == 3
+    assert gap_index.n_slots == 1000
+
+    frames = np.arange(len(timestamps))
+    slots = gap_index.frame_to_slot(frames)
+    expected_slots = np.delete(np.arange(1000), DROPPED_FRAMES)
+    expected_slots = np.insert(expected_slots, DUPLICATED_FRAME - 3, DUPLICATED_FRAME)
+    np.testing.assert_array_equal(slots, expected_slots)
+
+    mapped_frames = gap_index.time_to_frame(timestamps)
+    duplicated = DUPLICATED_FRAME - len(DROPPED_FRAMES)
+    np.testing.assert_array_equal(
+        np.delete(mapped_frames, duplicated), np.delete(frames, duplicated)
+    )
+    assert mapped_frames[duplicated] == duplicated + 1  # last of the duplicates
+
+    dropped_times = 2.0 + np.array(DROPPED_FRAMES) * DT
+    assert np.all(gap_index.time_to_frame(dropped_times) == -1)
+    assert np.all(gap_index.slot_to_frame([-1, 1000, 5000]) == -1)
+
+
+def test_smart_crop_gap_index(timestamps):
+    gap_index = diagnose_timestamps(timestamps).gap_index
+    data = np.arange(len(timestamps))
+
+    events = 2.0 + np.array([101, 300]) * DT
+    timebase, cropped = smart_crop(data, events, (-3 * DT, 3 * DT), gap_index=gap_index)
+    assert np.allclose(timebase, np.arange(-3, 3) * gap_index.dt)
+    np.testing.assert_array_equal(cropped[:, 0], [98, 99, np.nan, np.nan, np.nan, 100])
+    np.testing.assert_array_equal(cropped[:, 1], np.arange(294, 300))
+
+    _, cropped = smart_crop(
+        data,
+        2.0 + np.array([1, 300, 998]) * DT,
+        (-3 * DT, 3 * DT),
+        gap_index=gap_index,
+        out_of_range_drop=True,
+    )
+    assert cropped.shape == (6, 1)
+
+    with pytest.raises(ValueError):
+        smart_crop(data, events, (-0.1, 0.1), gap_index=gap_index, interpolate=True)
+
+
+def test_moviedata_gap_index(asset_moviedata_file):
+    moviedata = OpenCVMovieData(asset_moviedata_file)
+    diagnostics = moviedata.diagnose_timestamps()
+    assert diagnostics.n_frames == moviedata.shape[0]
+
+    gap_index = moviedata.gap_index
+    times = moviedata.timestamps.index.values
+    np.testing.assert_array_equal(moviedata.time_to_frame(times), np.arange(len(times)))
+
+    events = times[[50, 300]]
+    window = (-0.1, 0.1)
+    _, clips = crop_movie(moviedata, events, window, gap_index=gap_index)
+    _, frames_mat = gap_index.window_frames(events, window)
+    for window_n, event_n in zip(*np.nonzero(frames_mat >= 0)):
+        np.testing.assert_array_equal(
+            clips[window_n, event_n], moviedata[frames_mat[window_n, event_n]]
+        )
+
+
+def test_timestamps_qc(asset_moviedata_folder, tmp_path):
+    dataset_root = tmp_path / "test_dataset"
+    shutil.copytree(asset_moviedata_folder.parent.parent.parent, dataset_root)
+    session_2 = dataset_root / "M13" / "20231215" / "101010"
+    shutil.copytree(asset_moviedata_folder, session_2)
+    (session_2 / "eye-cam_timestamps_2023-12-14T16_27_20.csv").write_text(
+        "FrameTimestamp\n2023-12-15T10:10:10.4273024+01:00\n"
+    )
+
+    with Catalog(dataset_root) as catalog:
+        catalog.scan()
+        report_df, failures = catalog.timestamps_qc(executor="thread")
+
+    assert list(report_df["key"]) == ["eye-cam_timestamps"]
+    assert report_df.iloc[0]["n_frames"] == 500
+    assert list(failures.keys()) == [
+        session_2 / "eye-cam_timestamps_2023-12-14T16_27_20.csv"
+    ]
+
+    files = [asset_moviedata_folder / "eye-cam_timestamps_2023-12-14T16_27_20.csv"]
+    report_df, failures = timestamps_qc(files, workers=1)
+    assert len(report_df) == 1 and len(failures) == 0
@@ -2,7 +2,7 @@ import numpy as np
 import pandas as pd
 import pytest
 
-from bonpy.time_utils import interpolate_df
+from bonpy.time_utils import interpolate_df, match_events_to_intervals
 
 
 @pytest.mark.parametrize(
@@ -17,3 +17,40 @@ def test_interpolate_df(from_zero, expected_shape):
     output_df = interpolate_df(input_df, new_timebin="10ms", from_zero=from_zero)
     print(output_df.shape)
     assert output_df.shape == expected_shape
+
+
+def test_match_events_to_intervals():
+    events = np.array([0.5, 1.0, 2.5, 2.7, 10.0])
+    starts = np.array([0.0, 2.0, 4.0, 9.0])
+    ends = np.array([1.0, 3.0, 5.0, 10.0])
+
+    first_event_idxs, n_events = match_events_to_intervals(events, starts, ends)
+
+    assert first_event_idxs.tolist() == [0, 2, -1, 4]
+    assert n_events.tolist() == [2, 2, 0, 1]
+
+
+def test_match_events_to_intervals_unsorted():
+    events = np.array([10.0, 2.7, 0.5])
+    first_event_idxs, n_events = match_events_to_intervals(
+        events, np.array([0.0, 2.0, 4.0]), np.array([1.0, 3.0, 5.0])
+    )
+
+    assert first_event_idxs.tolist() == [2, 1, -1]
+    assert n_events.tolist() == [1, 1, 0]
+
+
+def test_match_events_to_intervals_overlapping():
+    # Padded windows of consecutive trials overlap: events are matched only once.
+    events = np.array([1.5, 3.5, 8.0])
+    starts = np.array([0.0, 1.0, 3.0, 7.0, 7.5])
+    ends = np.array([2.0, 4.0, 4.0, 9.0, 9.0])
+
+    event_idxs, n_events = match_events_to_intervals(events, starts, ends)
+
+    assert event_idxs.tolist() == [0, 1, -1, 2, -1]
+    assert n_events.tolist() == [1, 2, 1, 1, 1]
+
+    # Intervals are matched in order of start time, whatever their order:
+    event_idxs, _ = match_events_to_intervals(events, starts[::-1], ends[::-1])
+    assert event_idxs.tolist() == [-1, 2, -1, 1, 0]